@@ -7,7 +7,21 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 
 from config import Config
 
-from .extensions import csrf, db, login_manager, oauth
+from .assets import init_assets
+from .cache import init_response_cache, init_user_cache
+from .compression import init_compression
+from .database import engine_options, init_sqlite_functions, init_sqlite_tuning
+from .extensions import csrf, db, login_manager
+from .instrumentation import init_instrumentation
+from .likes import init_like_buffer
+from .migrations import schema_is_current, upgrade_schema
+from .oauth import init_google_oauth
+from .passwords import init_password_hashing
+from .profiles import init_profiles
+from .rankings import init_rankings
+from .ratelimit import init_rate_limits
+from .rendering import init_rendering
+from .search import init_search
 
 
 def create_app(config_class=Config):
@@ -19,43 +33,57 @@ def create_app(config_class=Config):
     if app.config.get("TRUST_PROXY_HEADERS", False):
         app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1)
 
+    # Derived here, not in Config, so a config class that swaps the URI gets matching pool options.
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
     db.init_app(app)
+    init_sqlite_tuning(app)
+    init_sqlite_functions(app)
     login_manager.init_app(app)
     csrf.init_app(app)
-    oauth.init_app(app)
+    init_response_cache(app)
+    init_user_cache(app)
+    init_profiles(app)
+    init_rate_limits(app)
+    init_password_hashing(app)
+    init_instrumentation(app)
+    # Registered after instrumentation so it runs first and its time counts in the request latency.
+    init_compression(app)
+    init_rendering(app)
+    init_search(app)
+    init_like_buffer(app)
+    init_rankings(app)
 
     login_manager.login_view = "auth.login"  # type: ignore
     login_manager.login_message_category = "warning"
 
-    if app.config.get("GOOGLE_CLIENT_ID") and app.config.get("GOOGLE_CLIENT_SECRET"):
-        oauth.register(
-            name="google",
-            client_id=app.config["GOOGLE_CLIENT_ID"],
-            client_secret=app.config["GOOGLE_CLIENT_SECRET"],
-            server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-            client_kwargs={"scope": "openid email profile"},
-        )
+    init_google_oauth(app)
 
     from .auth.routes import bp as auth_bp
     from .blog.routes import bp as blog_bp
     from .admin.routes import bp as admin_bp
+    from .api.routes import bp as api_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(blog_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp)
+    init_assets(app)
 
     if app.config.get("AUTO_CREATE_DB", False):
         with app.app_context():
-            try:
-                db.create_all()
-            except OperationalError as exc:
-                db_uri = str(app.config.get("SQLALCHEMY_DATABASE_URI", ""))
-                message = str(exc).lower()
-                # Multiple gunicorn workers can race on SQLite CREATE TABLE checks at startup.
-                if db_uri.startswith("sqlite") and "already exists" in message:
-                    app.logger.warning("Ignoring SQLite startup DDL race: %s", exc)
-                else:
-                    raise
+            # A database whose schema_version marker is current needs no DDL, so most boots skip it.
+            if not schema_is_current(db.engine):
+                try:
+                    db.create_all()
+                    upgrade_schema(db.engine)
+                except OperationalError as exc:
+                    db_uri = str(app.config.get("SQLALCHEMY_DATABASE_URI", ""))
+                    message = str(exc).lower()
+                    # Multiple gunicorn workers can race on SQLite CREATE TABLE/ALTER TABLE checks at startup.
+                    if db_uri.startswith("sqlite") and ("already exists" in message or "duplicate column" in message):
+                        app.logger.warning("Ignoring SQLite startup DDL race: %s", exc)
+                    else:
+                        raise
 
     @app.get("/healthz")
     def healthz():
@@ -64,12 +92,14 @@ def create_app(config_class=Config):
     @app.cli.command("init-db")
     def init_db_command():
         db.create_all()
+        upgrade_schema(db.engine)
         print("Database initialized.")
 
     @app.cli.command("reset-db")
     def reset_db_command():
         db.drop_all()
         db.create_all()
+        upgrade_schema(db.engine)
         print("Database reset.")
 
     @app.cli.command("promote-admin")
@@ -83,7 +113,15 @@ def create_app(config_class=Config):
 
         user.role = ROLE_ADMIN
         db.session.commit()
-        click.echo(f"User '{user.username}' promoted to admin.")
+        # This process holds no logins; running workers reload the user once their cached copy expires.
+        click.echo(
+            f"User '{user.username}' promoted to admin. "
+            f"Running workers pick up the role within USER_CACHE_TTL ({app.config['USER_CACHE_TTL']}s)."
+        )
+
+    from .commands import register_commands
+
+    register_commands(app)
 
     @app.context_processor
     def inject_now():
@@ -1,8 +1,26 @@
-from flask import Blueprint, abort, flash, redirect, render_template, request, url_for
+from datetime import date, datetime, time, timedelta
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    flash,
+    redirect,
+    request,
+    stream_with_context,
+    url_for,
+)
 from flask_login import current_user
+from sqlalchemy import and_, update
+from sqlalchemy.orm import contains_eager, load_only
 
+from ..deletion import delete_posts, delete_users
+from ..export import EXPORT_KINDS, iter_ndjson
 from ..extensions import db
-from ..models import ROLE_ADMIN, ROLE_AUTHOR, ROLE_USER, Post, User
+from ..models import ROLE_ADMIN, ROLE_VALUES, Post, User, forget_user
+from ..pagination import paginate_desc
+from ..streaming import render_page
 
 
 bp = Blueprint("admin", __name__, url_prefix="/admin")
@@ -17,10 +35,59 @@ def enforce_admin():
         abort(403)
 
 
+def _prefix_filter(column, prefix: str):
+    # A range on the raw column can seek its index; SQLite's case-insensitive LIKE 'x%' cannot.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def _date_arg(name: str) -> date | None:
+    try:
+        return date.fromisoformat(request.args.get(name, ""))
+    except ValueError:
+        return None
+
+
+def _list_filters(*names: str) -> dict:
+    """Non-empty filter args, for pagination links and the filter form."""
+    return {name: request.args[name].strip() for name in names if request.args.get(name, "").strip()}
+
+
+def _filter_created(query, column):
+    created_from, created_to = _date_arg("created_from"), _date_arg("created_to")
+    if created_from is not None:
+        query = query.filter(column >= datetime.combine(created_from, time.min))
+    if created_to is not None:
+        query = query.filter(column < datetime.combine(created_to + timedelta(days=1), time.min))
+    return query
+
+
+def _selected_ids() -> list[int]:
+    return sorted({int(value) for value in request.form.getlist("ids") if value.isdigit()})
+
+
+def _back(endpoint: str):
+    # Return to the filtered page the form was posted from.
+    target = request.form.get("next", "")
+    if target.startswith(f"{url_for(endpoint)}?") or target == url_for(endpoint):
+        return redirect(target)
+    return redirect(url_for(endpoint))
+
+
 @bp.route("/users")
 def users():
-    users_list = User.query.order_by(User.created_at.desc()).all()
-    return render_template("admin/users.html", users=users_list)
+    filters = _list_filters("q", "role", "created_from", "created_to")
+    query = User.query.options(load_only(User.id, User.username, User.email, User.role, User.created_at))
+    if filters.get("q"):
+        query = query.filter(_prefix_filter(User.username, filters["q"]))
+    if filters.get("role") in ROLE_VALUES:
+        query = query.filter(User.role == filters["role"])
+    query = _filter_created(query, User.created_at)
+
+    page = paginate_desc(
+        query, User.created_at, User.id, request.args.get("cursor"), current_app.config["ADMIN_PAGE_SIZE"]
+    )
+    return render_page("admin/users.html", users=page, filters=filters, roles=ROLE_VALUES)
 
 
 @bp.route("/users/<int:user_id>/role", methods=["POST"])
@@ -28,18 +95,44 @@ def update_user_role(user_id: int):
     user = User.query.get_or_404(user_id)
     new_role = (request.form.get("role") or "").strip().lower()
 
-    if new_role not in (ROLE_USER, ROLE_AUTHOR, ROLE_ADMIN):
+    if new_role not in ROLE_VALUES:
         flash("Invalid role selected.", "danger")
-        return redirect(url_for("admin.users"))
+        return _back("admin.users")
 
     if user.id == current_user.id and new_role != ROLE_ADMIN:
         flash("You cannot remove your own admin role.", "warning")
-        return redirect(url_for("admin.users"))
+        return _back("admin.users")
 
     user.role = new_role
     db.session.commit()
+    forget_user(user.id)
     flash(f"Updated role for {user.username} to {new_role}.", "success")
-    return redirect(url_for("admin.users"))
+    return _back("admin.users")
+
+
+@bp.route("/users/bulk-role", methods=["POST"])
+def bulk_update_role():
+    user_ids = _selected_ids()
+    new_role = (request.form.get("role") or "").strip().lower()
+    if new_role not in ROLE_VALUES:
+        flash("Invalid role selected.", "danger")
+        return _back("admin.users")
+
+    if new_role != ROLE_ADMIN and current_user.id in user_ids:
+        user_ids.remove(current_user.id)
+        flash("You cannot remove your own admin role.", "warning")
+
+    updated = 0
+    if user_ids:
+        updated = db.session.execute(
+            update(User).where(User.id.in_(user_ids)).values(role=new_role),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        db.session.commit()
+        for user_id in user_ids:
+            forget_user(user_id)
+    flash(f"Set {updated} user(s) to {new_role}.", "success")
+    return _back("admin.users")
 
 
 @bp.route("/users/<int:user_id>/delete", methods=["POST"])
@@ -47,24 +140,75 @@ def delete_user(user_id: int):
     user = User.query.get_or_404(user_id)
     if user.id == current_user.id:
         flash("You cannot delete your own admin account.", "warning")
-        return redirect(url_for("admin.users"))
+        return _back("admin.users")
 
-    db.session.delete(user)
-    db.session.commit()
-    flash(f"Deleted user {user.username}.", "info")
-    return redirect(url_for("admin.users"))
+    username = user.username
+    delete_users([user_id])
+    flash(f"Deleted user {username}.", "info")
+    return _back("admin.users")
+
+
+@bp.route("/users/bulk-delete", methods=["POST"])
+def bulk_delete_users():
+    user_ids = _selected_ids()
+    if current_user.id in user_ids:
+        user_ids.remove(current_user.id)
+        flash("You cannot delete your own admin account.", "warning")
+
+    deleted = delete_users(user_ids)
+    flash(f"Deleted {deleted} user(s).", "info")
+    return _back("admin.users")
+
+
+@bp.get("/export.ndjson")
+def export():
+    """Stream every user, post, comment and like (or just ``?type=post`` etc.) as NDJSON."""
+    kinds = request.args.getlist("type") or EXPORT_KINDS
+    if any(kind not in EXPORT_KINDS for kind in kinds):
+        abort(400)
+    return Response(
+        stream_with_context(iter_ndjson(kinds)),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=bloxy-export.ndjson"},
+    )
+
+
+@bp.get("/stats")
+def stats():
+    user_cache = current_app.extensions.get("user_cache")
+    return {"user_cache": user_cache.stats() if user_cache is not None else None}
 
 
 @bp.route("/posts")
 def posts():
-    posts_list = Post.query.order_by(Post.created_at.desc()).all()
-    return render_template("admin/posts.html", posts=posts_list)
+    filters = _list_filters("q", "author", "created_from", "created_to")
+    query = Post.query.join(Post.author).options(
+        load_only(Post.id, Post.title, Post.created_at),
+        contains_eager(Post.author).load_only(User.id, User.username),
+    )
+    if filters.get("q"):
+        query = query.filter(_prefix_filter(Post.title, filters["q"]))
+    if filters.get("author"):
+        query = query.filter(User.username == filters["author"])
+    query = _filter_created(query, Post.created_at)
+
+    page = paginate_desc(
+        query, Post.created_at, Post.id, request.args.get("cursor"), current_app.config["ADMIN_PAGE_SIZE"]
+    )
+    return render_page("admin/posts.html", posts=page, filters=filters)
 
 
 @bp.route("/posts/<int:post_id>/delete", methods=["POST"])
 def delete_post(post_id: int):
     post = Post.query.get_or_404(post_id)
-    db.session.delete(post)
-    db.session.commit()
-    flash(f"Deleted post '{post.title}'.", "info")
-    return redirect(url_for("admin.posts"))
+    title = post.title
+    delete_posts([post_id])
+    flash(f"Deleted post '{title}'.", "info")
+    return _back("admin.posts")
+
+
+@bp.route("/posts/bulk-delete", methods=["POST"])
+def bulk_delete_posts():
+    deleted = delete_posts(_selected_ids())
+    flash(f"Deleted {deleted} post(s).", "info")
+    return _back("admin.posts")
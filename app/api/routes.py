@@ -0,0 +1,132 @@
+"""Read-only JSON API under ``/api/v1``.
+
+Lists page newest-first with the same opaque cursors as the HTML pages.
+``?fields=a,b`` picks the attributes returned (sparse fieldsets), and only
+those columns are selected. Every response carries an ETag, so clients can
+revalidate with ``If-None-Match`` and get a 304 back.
+"""
+
+from flask import Blueprint, abort, current_app, request
+from sqlalchemy import exists, select
+
+from ..cache import FEED_TAG, cache_page
+from ..export import json_value
+from ..extensions import db
+from ..models import Comment, Post, User
+from ..pagination import paginate_desc
+
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+POST_FIELDS = {
+    "id": Post.id,
+    "title": Post.title,
+    "excerpt": Post.excerpt,
+    "body": Post.body,
+    "body_html": Post.body_html,
+    "author_id": Post.author_id,
+    "author": User.username,
+    "created_at": Post.created_at,
+    "updated_at": Post.updated_at,
+    "like_count": Post.like_count,
+    "comment_count": Post.comment_count,
+}
+# Lists leave out full bodies unless asked for them.
+POST_LIST_DEFAULT = ("id", "title", "excerpt", "author", "created_at", "like_count", "comment_count")
+
+COMMENT_FIELDS = {
+    "id": Comment.id,
+    "post_id": Comment.post_id,
+    "body": Comment.body,
+    "author_id": Comment.author_id,
+    "author": User.username,
+    "created_at": Comment.created_at,
+}
+
+USER_FIELDS = {"id": User.id, "username": User.username, "role": User.role, "created_at": User.created_at}
+
+
+@bp.after_request
+def add_etag(response):
+    # Cached anonymous responses already carry one.
+    if response.status_code == 200 and response.is_json and not response.get_etag()[0]:
+        response.add_etag()
+        response = response.make_conditional(request)
+    return response
+
+
+def _fields(available: dict, default) -> list[str]:
+    requested = request.args.get("fields")
+    if not requested:
+        return list(default)
+
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        abort(400, description=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
+
+def _limit() -> int:
+    limit = request.args.get("limit", type=int) or current_app.config["API_PAGE_SIZE"]
+    return max(1, min(limit, current_app.config["API_MAX_PAGE_SIZE"]))
+
+
+def _query(available: dict, fields: list[str]):
+    # id and created_at are always selected because the cursor is built from them.
+    names = list(dict.fromkeys(["id", "created_at", *fields]))
+    query = db.session.query(*(available[name].label(name) for name in names))
+    if "author" in names:
+        query = query.select_from(available["id"].class_).join(User)
+    return query
+
+
+def _record(row, fields: list[str]) -> dict:
+    return {name: json_value(getattr(row, name)) for name in fields}
+
+
+def _list(query, model, fields: list[str]) -> dict:
+    page = paginate_desc(query, model.created_at, model.id, request.args.get("cursor"), _limit())
+    return {"data": [_record(row, fields) for row in page], "next_cursor": page.next_cursor}
+
+
+@bp.errorhandler(400)
+@bp.errorhandler(404)
+def json_error(error):
+    return {"error": error.description}, error.code
+
+
+@bp.get("/posts")
+@cache_page(FEED_TAG)
+def posts():
+    fields = _fields(POST_FIELDS, POST_LIST_DEFAULT)
+    query = _query(POST_FIELDS, fields)
+    author = request.args.get("author")
+    if author:
+        query = query.filter(Post.author_id == select(User.id).where(User.username == author).scalar_subquery())
+    return _list(query, Post, fields)
+
+
+@bp.get("/posts/<int:post_id>")
+@cache_page("post:{post_id}")
+def post(post_id: int):
+    fields = _fields(POST_FIELDS, POST_FIELDS)
+    row = _query(POST_FIELDS, fields).filter(Post.id == post_id).first()
+    if row is None:
+        abort(404, description="Post not found.")
+    return {"data": _record(row, fields)}
+
+
+@bp.get("/posts/<int:post_id>/comments")
+@cache_page("post:{post_id}")
+def post_comments(post_id: int):
+    if not db.session.scalar(select(exists().where(Post.id == post_id))):
+        abort(404, description="Post not found.")
+    fields = _fields(COMMENT_FIELDS, COMMENT_FIELDS)
+    return _list(_query(COMMENT_FIELDS, fields).filter(Comment.post_id == post_id), Comment, fields)
+
+
+@bp.get("/users")
+def users():
+    fields = _fields(USER_FIELDS, USER_FIELDS)
+    return _list(_query(USER_FIELDS, fields), User, fields)
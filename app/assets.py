@@ -0,0 +1,188 @@
+"""Fingerprinted, precompressed static assets.
+
+``flask build-assets`` minifies the CSS and SVG files under ``app/static`` and
+writes each one to ``app/static/dist`` under a content-hashed name, e.g.
+``style.3f9a1c2b7e.css``. Next to each file it writes a ``.gz`` copy and,
+when the optional ``Brotli`` package is installed, a ``.br`` copy, plus a
+``manifest.json`` that maps source names to built ones. ``url()`` references
+inside the CSS are rewritten to the hashed names too.
+
+With a manifest present, ``url_for('static', filename='style.css')`` points
+at the hashed file. The static view then serves the precompressed copy the
+client accepts, with a one-year immutable Cache-Control, so browsers stop
+revalidating and nothing is compressed per request. A source edited after
+the last build is served unhashed until ``build-assets`` runs again.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+BUILD_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+EXTENSIONS = (".svg", ".css")  # SVGs first: the CSS points at their hashed names.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Preferred first; the name is both the Content-Encoding and the file suffix.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+_CSS_URL_RE = re.compile(r"""url\(\s*(["']?)([^"')]+)\1\s*\)""")
+_SVG_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def minify_css(source: str) -> str:
+    css = _SPACE_RE.sub(" ", _CSS_COMMENT_RE.sub("", source))
+    css = _CSS_PUNCTUATION_RE.sub(r"\1", css)
+    # Space after a colon is never needed; space before one can be (".a :hover").
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_svg(source: str) -> str:
+    svg = _SVG_COMMENT_RE.sub("", source)
+    svg = re.sub(r">\s+<", "><", svg)
+    return _SPACE_RE.sub(" ", svg).strip()
+
+
+def _rewrite_urls(css: str, css_name: str, built: dict) -> str:
+    base = os.path.dirname(css_name)
+
+    def replace(match):
+        target = os.path.normpath(os.path.join(base, match.group(2))).replace(os.sep, "/")
+        entry = built.get(target)
+        if entry is None:
+            return match.group(0)
+        # Both files live under dist/, so the hashed name keeps the same relative shape.
+        return f'url("{os.path.relpath(entry["path"], os.path.join(BUILD_DIR, base)).replace(os.sep, "/")}")'
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=5).hexdigest()
+
+
+def _write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def _sources(static_folder: str):
+    for extension in EXTENSIONS:
+        for root, dirs, files in os.walk(static_folder):
+            dirs[:] = sorted(name for name in dirs if os.path.join(root, name) != os.path.join(static_folder, BUILD_DIR))
+            for name in sorted(files):
+                if name.endswith(extension):
+                    yield os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+
+
+def build_assets(static_folder: str) -> dict:
+    """Minify, fingerprint and precompress every asset; returns the manifest it wrote."""
+    built = {}
+    for name in _sources(static_folder):
+        with open(os.path.join(static_folder, name), "rb") as handle:
+            source = handle.read()
+        text = source.decode("utf-8")
+        if name.endswith(".css"):
+            data = _rewrite_urls(minify_css(text), name, built).encode("utf-8")
+        else:
+            data = minify_svg(text).encode("utf-8")
+
+        stem, extension = os.path.splitext(name)
+        path = f"{BUILD_DIR}/{stem}.{_digest(data)}{extension}"
+        target = os.path.join(static_folder, path)
+        variants = {"gzip": gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(data, quality=11)
+        _write(target, data)
+        for encoding, suffix in ENCODINGS:
+            if encoding in variants:
+                _write(target + suffix, variants[encoding])
+
+        built[name] = {
+            "path": path,
+            "source": _digest(source),
+            "encodings": [encoding for encoding, _ in ENCODINGS if encoding in variants],
+            "sizes": {"source": len(source), "minified": len(data), **{k: len(v) for k, v in variants.items()}},
+        }
+
+    _write(os.path.join(static_folder, BUILD_DIR, MANIFEST_NAME), json.dumps(built, indent=2).encode("utf-8"))
+    return built
+
+
+def load_manifest(static_folder: str) -> dict:
+    """Manifest entries whose source is unchanged since the build; {} without a build."""
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST_NAME), encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+    current = {}
+    for name, entry in manifest.items():
+        try:
+            with open(os.path.join(static_folder, name), "rb") as handle:
+                unchanged = _digest(handle.read()) == entry["source"]
+        except OSError:
+            unchanged = False
+        if unchanged:
+            current[name] = entry
+        else:
+            log.warning("%s changed since the last build-assets run; serving it unhashed", name)
+    return current
+
+
+def init_assets(app) -> None:
+    manifest = load_manifest(app.static_folder) if app.config.get("STATIC_ASSET_MANIFEST", True) else {}
+    built = {entry["path"]: entry for entry in manifest.values()}
+    app.extensions["assets"] = manifest
+    if not manifest:
+        return
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == "static":
+            entry = manifest.get(values.get("filename"))
+            if entry is not None:
+                values["filename"] = entry["path"]
+
+    default_static = app.view_functions["static"]
+
+    def static(filename):
+        entry = built.get(filename)
+        if entry is None:
+            return default_static(filename=filename)
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in ENCODINGS:
+            if encoding in entry["encodings"] and request.accept_encodings[encoding]:
+                response = send_from_directory(
+                    app.static_folder, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+                )
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.vary.add("Accept-Encoding")
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = static
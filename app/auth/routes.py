@@ -1,17 +1,23 @@
-import re
+import random
 
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy.exc import IntegrityError, OperationalError
 
-from ..extensions import db, oauth
+from ..extensions import db
 from ..forms import LoginForm, RegistrationForm
-from ..models import ROLE_AUTHOR, ROLE_USER, User
+from ..models import ROLE_AUTHOR, ROLE_USER, User, allocate_username
+from ..oauth import google_client
+from ..ratelimit import rate_limit
+
+USERNAME_ATTEMPTS = 8
 
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
 @bp.route("/register", methods=["GET", "POST"])
+@rate_limit("register")
 def register():
     if current_user.is_authenticated:
         return redirect(url_for("blog.index"))
@@ -47,6 +53,7 @@ def register():
 
 
 @bp.route("/login", methods=["GET", "POST"])
+@rate_limit("login")
 def login():
     if current_user.is_authenticated:
         return redirect(url_for("blog.index"))
@@ -58,6 +65,10 @@ def login():
             flash("Invalid email or password.", "danger")
             return render_template("auth/login.html", form=form)
 
+        if user.password_needs_rehash:
+            user.set_password(form.password.data)
+            db.session.commit()
+
         login_user(user, remember=form.remember.data)
         next_url = request.args.get("next")
         if next_url and next_url.startswith("/") and not next_url.startswith("//"):
@@ -79,7 +90,7 @@ def logout():
 
 @bp.route("/login/google")
 def login_google():
-    google = oauth.create_client("google")
+    google = google_client()
     if google is None:
         flash("Google OAuth is not configured on this server.", "warning")
         return redirect(url_for("auth.login"))
@@ -90,7 +101,7 @@ def login_google():
 
 @bp.route("/authorize/google")
 def google_authorize():
-    google = oauth.create_client("google")
+    google = google_client()
     if google is None:
         flash("Google OAuth is not configured on this server.", "warning")
         return redirect(url_for("auth.login"))
@@ -135,14 +146,10 @@ def google_authorize():
                 or (userinfo.get("email") or "").split("@")[0]
                 or f"google_{google_sub}"
             )
-            user = User(
-                username=_unique_username(base_username),
-                email=email,
-                oauth_provider="google",
-                oauth_sub=oauth_sub,
-                role=ROLE_USER,
-            )
-            db.session.add(user)
+            user = _create_google_user(base_username, email, oauth_sub)
+            if user is None:
+                flash("Google login failed. Please try again.", "danger")
+                return redirect(url_for("auth.login"))
 
         db.session.commit()
 
@@ -151,14 +158,31 @@ def google_authorize():
     return redirect(url_for("blog.index"))
 
 
-def _unique_username(base_username: str) -> str:
-    cleaned = re.sub(r"[^A-Za-z0-9_.-]", "", base_username).lower() or "user"
-    candidate = cleaned[:30]
-
-    suffix = 1
-    while User.query.filter_by(username=candidate).first():
-        suffix_text = str(suffix)
-        candidate = f"{cleaned[: 30 - len(suffix_text)]}{suffix_text}"
-        suffix += 1
-
-    return candidate
+def _create_google_user(base_username: str, email: str, oauth_sub: str, allocate=allocate_username) -> User | None:
+    # Another sign-up can take the allocated username (or finish this same
+    # callback) between the lookup and the insert. The unique constraint
+    # rejects the insert, or on SQLite the stale read snapshot cannot take the
+    # write lock, so start a fresh transaction and look again. Retries skip a
+    # growing random number of free names so racing sign-ups spread out.
+    for attempt in range(1, USERNAME_ATTEMPTS + 1):
+        user = User(
+            username=allocate(base_username, random.randrange(attempt * attempt)),
+            email=email,
+            oauth_provider="google",
+            oauth_sub=oauth_sub,
+            role=ROLE_USER,
+        )
+        db.session.add(user)
+        try:
+            db.session.flush()
+        except (IntegrityError, OperationalError):
+            db.session.rollback()
+            if attempt == USERNAME_ATTEMPTS:
+                raise
+            existing = User.query.filter_by(oauth_provider="google", oauth_sub=oauth_sub).first()
+            if existing is not None:
+                return existing
+            if User.query.filter_by(email=email).first() is not None:
+                return None
+            continue
+        return user
@@ -0,0 +1,748 @@
+"""Synthetic data and a repeatable request benchmark.
+
+``seed_database`` fills an empty database with users, posts, comments and
+likes whose comments/likes follow a Zipf-like skew, so a handful of viral
+posts collect most of the activity. ``run_benchmark`` replays a fixed mix of
+requests against the Flask test client or a running server and returns
+latency percentiles, throughput and SQL statements per request.
+``run_delete_benchmark`` times deleting one prolific user, and
+``run_ranking_benchmark`` compares the feed rankings with a GROUP BY.
+"""
+
+import itertools
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import case, event, func, insert, literal, or_, select, union_all
+from sqlalchemy.orm import contains_eager, defer, selectinload
+
+from .deletion import delete_users
+from .extensions import db
+from .models import (
+    ROLE_ADMIN,
+    ROLE_AUTHOR,
+    ROLE_USER,
+    Comment,
+    Like,
+    Post,
+    User,
+    allocate_username,
+    recount_post_range,
+    refresh_post_counts,
+)
+from .passwords import hash_password
+from .rankings import COMMENT_WEIGHT, LIKE_WEIGHT, WEEK, ranking_query, record_activity, refresh_rankings
+from .rendering import render_post
+from .search import rebuild_index
+
+BENCH_PASSWORD = "bench-password"
+BENCH_ADMIN_EMAIL = "bench-admin@example.com"
+SCENARIOS = ("index", "post_detail", "like", "comment", "login", "admin_posts")
+
+_CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def bench_email(n: int) -> str:
+    return f"bench{n}@example.com"
+
+
+def skewed_weights(count: int, exponent: float) -> list[float]:
+    """Cumulative Zipf weights: rank 1 is picked about 2**exponent times as often as rank 2."""
+    return list(itertools.accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+def _insert_batches(model, rows, batch_size: int) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+
+
+def _post_row(**values) -> dict:
+    # Bulk inserts skip Post's body validator, so render here.
+    values["body_html"], values["excerpt"] = render_post(values["body"])
+    return values
+
+
+def seed_database(
+    users: int,
+    posts: int,
+    comments: int,
+    likes: int,
+    skew: float = 1.1,
+    seed: int = 42,
+    batch_size: int = 5000,
+) -> None:
+    """Insert synthetic rows into an empty database; the same ``seed`` gives the same data."""
+    if db.session.scalar(select(func.count(User.id))):
+        raise ValueError("seed_database needs an empty database; run reset-db first.")
+
+    rng = random.Random(seed)
+    now = datetime.now(UTC).replace(tzinfo=None)
+    password_hash = hash_password(BENCH_PASSWORD)
+
+    def moment(after: datetime | None = None) -> datetime:
+        start = after or now - timedelta(days=365)
+        return start + (now - start) * rng.random()
+
+    user_rows = [
+        {
+            "username": "bench-admin",
+            "email": BENCH_ADMIN_EMAIL,
+            "password_hash": password_hash,
+            "role": ROLE_ADMIN,
+            "created_at": moment(),
+        }
+    ]
+    for n in range(1, users):
+        user_rows.append(
+            {
+                "username": f"bench{n}",
+                "email": bench_email(n),
+                "password_hash": password_hash,
+                "role": ROLE_AUTHOR if rng.random() < 0.2 else ROLE_USER,
+                "created_at": moment(),
+            }
+        )
+    _insert_batches(User, user_rows, batch_size)
+    user_ids = db.session.scalars(select(User.id).order_by(User.id)).all()
+    author_ids = db.session.scalars(select(User.id).where(User.role != ROLE_USER).order_by(User.id)).all()
+
+    post_times = sorted(moment() for _ in range(posts))
+    _insert_batches(
+        Post,
+        (
+            _post_row(
+                title=f"Synthetic post {n}",
+                body=f"Benchmark body {n}. " * rng.randint(5, 80),
+                author_id=rng.choice(author_ids),
+                created_at=created_at,
+                updated_at=created_at,
+            )
+            for n, created_at in enumerate(post_times, start=1)
+        ),
+        batch_size,
+    )
+    post_rows = db.session.execute(select(Post.id, Post.created_at).order_by(Post.id)).all()
+
+    # Shuffle which posts go viral so popularity is unrelated to id or age.
+    ranked = post_rows[:]
+    rng.shuffle(ranked)
+    weights = skewed_weights(len(ranked), skew)
+
+    def pick_posts(k: int):
+        return rng.choices(ranked, cum_weights=weights, k=k)
+
+    _insert_batches(
+        Comment,
+        (
+            {
+                "body": f"Synthetic comment {n}",
+                "author_id": rng.choice(user_ids),
+                "post_id": post.id,
+                "created_at": moment(post.created_at),
+            }
+            for n, post in enumerate(pick_posts(comments), start=1)
+        ),
+        batch_size,
+    )
+
+    # Likes are unique per (user, post); draw until enough distinct pairs exist or the space runs out.
+    likes = min(likes, len(user_ids) * len(post_rows))
+    seen = set()
+    like_rows = []
+    while len(like_rows) < likes:
+        for post in pick_posts(likes - len(like_rows)):
+            pair = (rng.choice(user_ids), post.id)
+            if pair not in seen:
+                seen.add(pair)
+                like_rows.append(
+                    {"user_id": pair[0], "post_id": pair[1], "created_at": moment(post.created_at)}
+                )
+    _insert_batches(Like, like_rows, batch_size)
+
+    for first_id in range(1, post_rows[-1].id + 1 if post_rows else 1, batch_size):
+        recount_post_range(first_id, first_id + batch_size - 1)
+    # The rows went in with bulk INSERTs, past the routes that keep the search index current.
+    rebuild_index(batch_size)
+    db.session.commit()
+
+
+class _TestClientTarget:
+    def __init__(self, app):
+        self.app = app
+        # One bench member posts far faster than any rate limit allows.
+        app.extensions["rate_limiter"] = None
+
+    def session(self):
+        return self.app.test_client()
+
+    # A request reuses an already pushed app context (and its ``g`` and DB session), as under
+    # the flask CLI, so each one gets a fresh context like it would in a real worker.
+    def get(self, client, path: str):
+        with self.app.app_context():
+            response = client.get(path)
+        return response.status_code, response.headers, response.get_data(as_text=True)
+
+    def post(self, client, path: str, data: dict):
+        with self.app.app_context():
+            response = client.post(path, data=data)
+        return response.status_code, response.headers, response.get_data(as_text=True)
+
+    def drop_idle_connections(self, client) -> None:
+        pass
+
+
+class _HTTPTarget:
+    def __init__(self, base_url: str):
+        import requests
+
+        self.requests = requests
+        self.base_url = base_url.rstrip("/")
+
+    def session(self):
+        return self.requests.Session()
+
+    def get(self, client, path: str):
+        response = client.get(self.base_url + path, allow_redirects=False)
+        return response.status_code, response.headers, response.text
+
+    def post(self, client, path: str, data: dict):
+        response = client.post(self.base_url + path, data=data, allow_redirects=False)
+        return response.status_code, response.headers, response.text
+
+    def drop_idle_connections(self, client) -> None:
+        # The server may have closed keep-alive connections left idle during setup; POSTs are not retried.
+        client.close()
+
+
+def _csrf_token(body: str) -> str:
+    match = _CSRF_RE.search(body)
+    if match is None:
+        raise RuntimeError("No CSRF token found in the page.")
+    return match.group(1)
+
+
+def _login(target, client, email: str) -> tuple[float, dict]:
+    _, _, body = target.get(client, "/auth/login")
+    started = time.perf_counter()
+    status, headers, _ = target.post(
+        client, "/auth/login", {"csrf_token": _csrf_token(body), "email": email, "password": BENCH_PASSWORD}
+    )
+    elapsed = time.perf_counter() - started
+    if status != 302:
+        raise RuntimeError(f"Login failed for {email} (HTTP {status}); was seed-bench run?")
+    return elapsed, headers
+
+
+def _member_session(target, n: int) -> tuple[object, str]:
+    client = target.session()
+    _login(target, client, bench_email(n))
+    _, _, body = target.get(client, "/")
+    return client, _csrf_token(body)
+
+
+def _summary(samples: list[tuple[float, int | None]]) -> dict:
+    latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    queries = [count for _, count in samples if count is not None]
+    return {
+        "requests": len(samples),
+        "p50_ms": round(cuts[49], 2),
+        "p95_ms": round(cuts[94], 2),
+        "p99_ms": round(cuts[98], 2),
+        # One client issuing requests back to back, so throughput is the inverse of mean latency.
+        "requests_per_s": round(len(samples) / (sum(latencies) / 1000), 1),
+        "queries_per_request": round(statistics.fmean(queries), 2) if queries else None,
+    }
+
+
+def _query_count(headers) -> int | None:
+    match = _QUERIES_RE.search(headers.get("Server-Timing", ""))
+    return int(match.group(1)) if match else None
+
+
+def run_benchmark(
+    app,
+    base_url: str | None = None,
+    requests_per_scenario: int = 200,
+    scenarios=SCENARIOS,
+    skew: float = 1.1,
+    seed: int = 7,
+) -> dict:
+    """Time each scenario against ``base_url`` if given, else against ``app``'s test client.
+
+    ``app`` is always used to read post ids from the database the target serves.
+    Queries per request come from the ``Server-Timing`` header, so the target needs
+    INSTRUMENTATION enabled for that column to be filled in.
+    """
+    target = _HTTPTarget(base_url) if base_url else _TestClientTarget(app)
+    rng = random.Random(seed)
+
+    with app.app_context():
+        post_ids = db.session.scalars(select(Post.id).order_by(Post.comment_count.desc(), Post.id)).all()
+        user_count = db.session.scalar(select(func.count(User.id))) or 0
+    if not post_ids or user_count < 2:
+        raise RuntimeError("The database has no benchmark data; run seed-bench first.")
+
+    weights = skewed_weights(len(post_ids), skew)
+
+    def pick_post() -> int:
+        return rng.choices(post_ids, cum_weights=weights)[0]
+
+    anonymous = target.session()
+    member, member_token = _member_session(target, 1)
+    admin = target.session()
+    _login(target, admin, BENCH_ADMIN_EMAIL)
+
+    def index():
+        return target.get(anonymous, "/")
+
+    def post_detail():
+        return target.get(anonymous, f"/post/{pick_post()}")
+
+    def like():
+        return target.post(member, f"/post/{pick_post()}/like", {"csrf_token": member_token})
+
+    def comment():
+        data = {"csrf_token": member_token, "body": "Benchmark comment"}
+        return target.post(member, f"/post/{pick_post()}/comment", data)
+
+    def admin_posts():
+        return target.get(admin, "/admin/posts")
+
+    actions = {
+        "index": index,
+        "post_detail": post_detail,
+        "like": like,
+        "comment": comment,
+        "admin_posts": admin_posts,
+    }
+    results = {}
+    for name in scenarios:
+        samples = []
+        for _ in range(requests_per_scenario):
+            if name == "login":
+                elapsed, headers = _login(target, target.session(), bench_email(rng.randrange(1, user_count)))
+            else:
+                started = time.perf_counter()
+                status, headers, _ = actions[name]()
+                elapsed = time.perf_counter() - started
+                if status >= 400:
+                    raise RuntimeError(f"{name} returned HTTP {status}")
+            samples.append((elapsed, _query_count(headers)))
+        results[name] = _summary(samples)
+
+    return {
+        "target": base_url or "test-client",
+        "requests_per_scenario": requests_per_scenario,
+        "scenarios": results,
+    }
+
+
+def run_like_benchmark(app, base_url: str | None = None, threads: int = 8, likes_per_thread: int = 100, skew: float = 1.1) -> dict:
+    """Toggle likes from ``threads`` logged-in members at once and report write throughput.
+
+    Every member hammers the same skewed set of posts, so the viral posts' counters are
+    contended the way they are in production.
+    """
+    target = _HTTPTarget(base_url) if base_url else _TestClientTarget(app)
+    with app.app_context():
+        post_ids = db.session.scalars(select(Post.id).order_by(Post.comment_count.desc(), Post.id)).all()
+        user_count = db.session.scalar(select(func.count(User.id))) or 0
+    if not post_ids or user_count <= threads:
+        raise RuntimeError("Not enough benchmark data for that many threads; run seed-bench first.")
+
+    weights = skewed_weights(len(post_ids), skew)
+    members = [_member_session(target, n) for n in range(1, threads + 1)]
+    latencies: list[float] = []
+    errors: list[int] = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def worker(n: int) -> None:
+        client, token = members[n]
+        rng = random.Random(n)
+        target.drop_idle_connections(client)
+        start.wait()
+        for _ in range(likes_per_thread):
+            post_id = rng.choices(post_ids, cum_weights=weights)[0]
+            started = time.perf_counter()
+            status, _, _ = target.post(client, f"/post/{post_id}/like", {"csrf_token": token})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors.append(status)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    start.wait()
+    wall_started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    wall_time = time.perf_counter() - wall_started
+
+    summary = _summary([(elapsed, None) for elapsed in latencies])
+    del summary["queries_per_request"]
+    summary["requests_per_s"] = round(len(latencies) / wall_time, 1)
+    summary["errors"] = len(errors)
+    return {"target": base_url or "test-client", "threads": threads, "likes": summary}
+
+
+def _orm_cascade_delete(user_id: int) -> None:
+    # What session.delete(user) did before passive deletes: load every child, one DELETE each.
+    user = db.session.scalars(
+        select(User)
+        .where(User.id == user_id)
+        .options(
+            selectinload(User.posts).selectinload(Post.comments),
+            selectinload(User.posts).selectinload(Post.likes),
+            selectinload(User.comments),
+            selectinload(User.likes),
+        )
+    ).one()
+    touched = {comment.post_id for comment in user.comments} | {like.post_id for like in user.likes}
+    db.session.delete(user)
+    db.session.flush()
+    refresh_post_counts(touched)
+    db.session.commit()
+
+
+def run_delete_benchmark(app, posts: int = 10000, comments: int = 100000, mode: str = "set", seed: int = 42) -> dict:
+    """Create a user with ``posts`` posts and ``comments`` comments, delete them, and time it.
+
+    ``mode="orm"`` deletes through the relationship cascade the old way, for comparison.
+    Comments land on the user's own posts and on existing ones, so both paths also fix
+    other posts' counters.
+    """
+    rng = random.Random(seed)
+    with app.app_context():
+        now = datetime.now(UTC).replace(tzinfo=None)
+        tag = f"{int(time.time())}{rng.randrange(1000)}"
+        user = User(username=f"del-{tag}"[:30], email=f"bench-delete-{tag}@example.com", role=ROLE_AUTHOR)
+        db.session.add(user)
+        db.session.flush()
+        user_id = user.id
+
+        _insert_batches(
+            Post,
+            (
+                _post_row(title=f"Doomed post {n}", body=f"Doomed body {n}.", author_id=user_id, created_at=now, updated_at=now)
+                for n in range(1, posts + 1)
+            ),
+            5000,
+        )
+        post_ids = db.session.scalars(select(Post.id)).all()
+        _insert_batches(
+            Comment,
+            (
+                {"body": f"Doomed comment {n}", "author_id": user_id, "post_id": rng.choice(post_ids), "created_at": now}
+                for n in range(1, comments + 1)
+            ),
+            5000,
+        )
+        refresh_post_counts(post_ids)
+        db.session.commit()
+        db.session.expunge_all()
+
+        statements = 0
+
+        def count(*args):
+            nonlocal statements
+            statements += 1
+
+        event.listen(db.engine, "before_cursor_execute", count)
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            if mode == "orm":
+                _orm_cascade_delete(user_id)
+            else:
+                delete_users([user_id])
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            event.remove(db.engine, "before_cursor_execute", count)
+
+        left = db.session.scalar(select(func.count(Post.id)).where(Post.author_id == user_id)) + db.session.scalar(
+            select(func.count(Comment.id)).where(Comment.author_id == user_id)
+        )
+
+    return {
+        "mode": mode,
+        "posts": posts,
+        "comments": comments,
+        "seconds": round(elapsed, 2),
+        "peak_memory_mib": round(peak / 2**20, 1),
+        "sql_statements": statements,
+        "rows_left": left,
+    }
+
+
+def _loop_username(base_username: str, skip: int = 0) -> str:
+    # The allocation sign-up used before: one lookup per taken suffix.
+    cleaned = re.sub(r"[^A-Za-z0-9_.-]", "", base_username).lower() or "user"
+    candidate = cleaned[:30]
+    suffix = 1
+    while User.query.filter_by(username=candidate).first() or skip:
+        if skip and User.query.filter_by(username=candidate).first() is None:
+            skip -= 1
+        suffix_text = str(suffix)
+        candidate = f"{cleaned[: 30 - len(suffix_text)]}{suffix_text}"
+        suffix += 1
+    return candidate
+
+
+def run_username_benchmark(
+    app, names: int = 10000, signups: int = 50, mode: str = "range", threads: int = 1, base: str = "John Smith"
+) -> dict:
+    """Sign up ``signups`` Google users called ``base`` after ``names`` users already took that name.
+
+    ``mode="loop"`` allocates with the old query-per-suffix loop. With ``threads`` > 1
+    the sign-ups race each other, and every one must still get its own username.
+    Every user the run created is deleted again at the end.
+    """
+    from .auth.routes import _create_google_user
+
+    allocate = _loop_username if mode == "loop" else allocate_username
+    with app.app_context():
+        tag = f"{int(time.time())}{random.randrange(1000)}"
+        stem = re.sub(r"[^A-Za-z0-9_.-]", "", base).lower()
+        existing = set(db.session.scalars(select(User.username).where(User.username.like(f"{stem}%"))))
+        now = datetime.now(UTC).replace(tzinfo=None)
+        _insert_batches(
+            User,
+            (
+                {"username": username, "email": f"bench-name-{tag}-{n}@example.com", "role": ROLE_USER, "created_at": now}
+                for n, username in enumerate([stem] + [f"{stem}{n}" for n in range(1, names)])
+                if username not in existing
+            ),
+            5000,
+        )
+        db.session.commit()
+
+    statements = 0
+    lock = threading.Lock()
+
+    def count(*args):
+        nonlocal statements
+        with lock:
+            statements += 1
+
+    def sign_up(n: int) -> tuple[float, str | None]:
+        started = time.perf_counter()
+        with app.app_context():
+            user = _create_google_user(base, f"bench-signup-{tag}-{n}@example.com", f"bench-{tag}-{n}", allocate)
+            username = user.username if user is not None else None
+            db.session.commit()
+        return time.perf_counter() - started, username
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(sign_up, range(signups)))
+        wall_time = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+        with app.app_context():
+            # Remove the taken names and the sign-ups, so a rerun starts from the same state.
+            bench_emails = or_(User.email.like(f"bench-name-{tag}-%"), User.email.like(f"bench-signup-{tag}-%"))
+            delete_users(db.session.scalars(select(User.id).where(bench_emails)).all())
+
+    created = [username for _, username in results if username is not None]
+    latencies = [seconds * 1000 for seconds, _ in results]
+    return {
+        "mode": mode,
+        "taken_names": names,
+        "signups": signups,
+        "threads": threads,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "max_ms": round(max(latencies), 2),
+        "signups_per_s": round(signups / wall_time, 1),
+        "sql_per_signup": round(statements / signups, 1),
+        "failed": signups - len(created),
+        "duplicates": len(created) - len(set(created)),
+    }
+
+
+_FACTORY_PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+print(json.dumps({"import_ms": (imported - started) * 1000, "factory_ms": (time.perf_counter() - imported) * 1000}))
+"""
+
+_FAST_BOOT_PROBE = """
+import json, time
+from wsgiref.util import setup_testing_defaults
+started = time.perf_counter()
+import wsgi
+
+def get(path):
+    environ = {"PATH_INFO": path}
+    setup_testing_defaults(environ)
+    status = []
+    b"".join(wsgi.app(environ, lambda code, headers, exc_info=None: status.append(code)))
+    return status[0]
+
+status = get("/healthz")
+healthz = time.perf_counter()
+get("/")
+ready = time.perf_counter()
+print(json.dumps({"healthz_ms": (healthz - started) * 1000, "ready_ms": (ready - started) * 1000, "healthz": status}))
+"""
+
+
+def _probe(source: str, root: str, env: dict, *flags: str) -> subprocess.CompletedProcess:
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", source], cwd=root, env=env, capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"startup probe failed:\n{result.stderr.strip()}")
+    return result
+
+
+def _import_costs(importtime: str, top: int) -> dict:
+    # -X importtime lines: "import time: self_us | cumulative_us | <indent>module"; sum self time per package.
+    costs: dict[str, int] = {}
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        package = name.strip().split(".")[0]
+        costs[package] = costs.get(package, 0) + int(self_us)
+    slowest = sorted(costs.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {package: round(us / 1000, 1) for package, us in slowest}
+
+
+def run_startup_benchmark(root: str, runs: int = 5, top: int = 10) -> dict:
+    """Median cold-start timings, each run in a fresh interpreter started in ``root``.
+
+    Reports the ``import app`` and ``create_app()`` times, when a FAST_BOOT worker first
+    answers ``/healthz`` and when it serves its first page, plus the packages whose
+    imports cost the most.
+    """
+    env = {**os.environ, "FAST_BOOT": "false"}
+    factory = [json.loads(_probe(_FACTORY_PROBE, root, env).stdout) for _ in range(runs)]
+    fast = [json.loads(_probe(_FAST_BOOT_PROBE, root, {**env, "FAST_BOOT": "true"}).stdout) for _ in range(runs)]
+    importtime = _probe("import app; app.create_app()", root, env, "-X", "importtime").stderr
+
+    def median(samples: list[dict], key: str) -> float:
+        return round(statistics.median(sample[key] for sample in samples), 1)
+
+    return {
+        "runs": runs,
+        "import_ms": median(factory, "import_ms"),
+        "factory_ms": median(factory, "factory_ms"),
+        "fast_boot": {
+            "healthz_ms": median(fast, "healthz_ms"),
+            "ready_ms": median(fast, "ready_ms"),
+            "healthz_status": fast[0]["healthz"],
+        },
+        "slowest_imports_ms": _import_costs(importtime, top),
+    }
+
+
+def _on_the_fly_top(kind: str, half_life: float, limit: int) -> list[int]:
+    # What the rankings replace: score every post from the whole like and comment tables.
+    events = union_all(
+        select(Like.post_id.label("post_id"), Like.created_at.label("created_at"), literal(LIKE_WEIGHT).label("weight")),
+        select(Comment.post_id, Comment.created_at, literal(COMMENT_WEIGHT)),
+    ).subquery()
+    age = (func.julianday("now") - func.julianday(events.c.created_at)) * 86400
+    if kind == "trending":
+        score = func.sum(events.c.weight * func.power(2.0, -age / half_life))
+    else:
+        score = func.sum(case((age <= WEEK, events.c.weight), else_=0.0))
+    top = (
+        select(events.c.post_id)
+        .group_by(events.c.post_id)
+        .having(score > 0)
+        .order_by(score.desc(), events.c.post_id.desc())
+        .limit(limit)
+    )
+    post_ids = db.session.scalars(top).all()
+    posts = {
+        post.id: post
+        for post in Post.query.join(Post.author)
+        .filter(Post.id.in_(post_ids))
+        .options(
+            defer(Post.body),
+            defer(Post.body_html),
+            contains_eager(Post.author).load_only(User.id, User.username),
+        )
+    }
+    return [posts[post_id].id for post_id in post_ids if post_id in posts]
+
+
+def run_ranking_benchmark(app, reads: int = 50, kind: str = "trending", limit: int = 50) -> dict:
+    """Time the top ``limit`` posts from ``post_rank`` against an on-the-fly GROUP BY.
+
+    Also times one decay pass and the per-event upsert, and reports how many of the
+    top posts both methods agree on. The GROUP BY uses SQLite date functions.
+    """
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            raise RuntimeError("bench-rankings compares against a SQLite-only GROUP BY.")
+        half_life = app.config["TRENDING_HALF_LIFE_HOURS"] * 3600
+
+        started = time.perf_counter()
+        ranked_count = refresh_rankings(force=True)
+        rebuild_ms = (time.perf_counter() - started) * 1000
+
+        def timed(read) -> tuple[list[float], list[int]]:
+            samples, result = [], []
+            for _ in range(reads):
+                db.session.expunge_all()
+                started = time.perf_counter()
+                result = read()
+                samples.append((time.perf_counter() - started) * 1000)
+            return samples, result
+
+        table_ms, table_top = timed(lambda: [post.id for post in ranking_query(kind, limit).all()])
+        group_ms, group_top = timed(lambda: _on_the_fly_top(kind, half_life, limit))
+
+        post_ids = db.session.scalars(select(Post.id).limit(1000)).all()
+        started = time.perf_counter()
+        events = 1000
+        for n in range(events):
+            record_activity([(post_ids[n % len(post_ids)], LIKE_WEIGHT, time.time())])
+        upsert_ms = (time.perf_counter() - started) * 1000 / events
+        db.session.rollback()
+
+        likes = db.session.scalar(select(func.count(Like.id)))
+        comments = db.session.scalar(select(func.count(Comment.id)))
+
+    return {
+        "kind": kind,
+        "likes": likes,
+        "comments": comments,
+        "ranked_posts": ranked_count,
+        "ranking_table_p50_ms": round(statistics.median(table_ms), 2),
+        "group_by_p50_ms": round(statistics.median(group_ms), 2),
+        "speedup": round(statistics.median(group_ms) / statistics.median(table_ms), 1),
+        "same_posts_in_top": len(set(table_top) & set(group_top)),
+        "decay_pass_ms": round(rebuild_ms, 1),
+        "upsert_per_event_ms": round(upsert_ms, 3),
+    }
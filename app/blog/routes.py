@@ -1,38 +1,128 @@
-from flask import Blueprint, abort, flash, redirect, render_template, url_for
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager, defer
 
+from ..cache import FEED_TAG, cache_page, invalidate, post_tag
+from ..deletion import delete_posts
 from ..extensions import db
 from ..forms import CommentForm, PostForm
-from ..models import Comment, Like, Post
+from ..likes import apply_like, current_like_state
+from ..models import Comment, Post, User
+from ..pagination import paginate_desc
+from ..profiles import author_summary, forget_summaries, recent_activity
+from ..rankings import COMMENT_WEIGHT, event_time, ranked_posts, record_activity
+from ..ratelimit import rate_limit
+from ..search import index_comment, index_post, search
+from ..streaming import render_page
 
 
 bp = Blueprint("blog", __name__)
 
 
 @bp.route("/")
+@cache_page(FEED_TAG)
 def index():
-    posts = Post.query.order_by(Post.created_at.desc()).all()
-    return render_template("blog/index.html", posts=posts)
+    query = Post.query.join(Post.author).options(
+        defer(Post.body),
+        defer(Post.body_html),
+        contains_eager(Post.author).load_only(User.id, User.username),
+    )
+    page = paginate_desc(
+        query,
+        Post.created_at,
+        Post.id,
+        request.args.get("cursor"),
+        current_app.config["FEED_PAGE_SIZE"],
+    )
+    return render_page("blog/index.html", posts=page)
+
+
+def _comment_page(post_id: int, cursor: str | None):
+    query = (
+        Comment.query.filter(Comment.post_id == post_id)
+        .join(Comment.author)
+        .options(contains_eager(Comment.author).load_only(User.id, User.username))
+    )
+    return paginate_desc(
+        query,
+        Comment.created_at,
+        Comment.id,
+        cursor,
+        current_app.config["COMMENTS_PAGE_SIZE"],
+    )
+
+
+@bp.route("/trending")
+@cache_page(FEED_TAG)
+def trending():
+    posts = ranked_posts("trending", current_app.config["RANKING_SIZE"])
+    return render_template("blog/ranking.html", posts=posts, heading="Trending")
+
+
+@bp.route("/top")
+@cache_page(FEED_TAG)
+def top_week():
+    posts = ranked_posts("week", current_app.config["RANKING_SIZE"])
+    return render_template("blog/ranking.html", posts=posts, heading="Top This Week")
+
+
+@bp.route("/u/<username>")
+@cache_page(FEED_TAG)
+def profile(username: str):
+    user = User.query.filter_by(username=username).first_or_404()
+    # The cards read post.author, which resolves to ``user`` from the identity map.
+    query = Post.query.filter(Post.author_id == user.id).options(defer(Post.body), defer(Post.body_html))
+    posts = paginate_desc(
+        query,
+        Post.created_at,
+        Post.id,
+        request.args.get("cursor"),
+        current_app.config["FEED_PAGE_SIZE"],
+    )
+    return render_template(
+        "blog/profile.html",
+        user=user,
+        summary=author_summary(user.id),
+        posts=posts,
+        activity=recent_activity(user.id, current_app.config["PROFILE_ACTIVITY_SIZE"]),
+    )
+
+
+@bp.route("/search")
+def search_posts():
+    query = (request.args.get("q") or "").strip()
+    results = search(query, request.args.get("cursor"), current_app.config["SEARCH_PAGE_SIZE"])
+    return render_template("blog/search.html", query=query, results=results)
 
 
 @bp.route("/post/<int:post_id>")
+@cache_page("post:{post_id}")
 def post_detail(post_id: int):
     post = Post.query.get_or_404(post_id)
+    comments = _comment_page(post.id, request.args.get("comments_cursor"))
     comment_form = CommentForm()
     liked_by_current_user = False
     if current_user.is_authenticated:
-        liked_by_current_user = (
-            Like.query.filter_by(user_id=current_user.id, post_id=post.id).first() is not None
-        )
+        liked_by_current_user = current_like_state(current_user.id, post.id)
 
-    return render_template(
+    return render_page(
         "blog/post_detail.html",
         post=post,
+        comments=comments,
         comment_form=comment_form,
         liked_by_current_user=liked_by_current_user,
     )
 
 
+@bp.route("/post/<int:post_id>/comments")
+@cache_page("post:{post_id}")
+def post_comments(post_id: int):
+    post = Post.query.get_or_404(post_id)
+    comments = _comment_page(post.id, request.args.get("cursor"))
+    return render_template("blog/_comments.html", post=post, comments=comments)
+
+
 @bp.route("/post/new", methods=["GET", "POST"])
 @login_required
 def post_create():
@@ -44,7 +134,11 @@ def post_create():
     if form.validate_on_submit():
         post = Post(title=form.title.data, body=form.body.data, author_id=current_user.id)
         db.session.add(post)
+        db.session.flush()
+        index_post(post)
         db.session.commit()
+        invalidate(FEED_TAG)
+        forget_summaries(current_user.id)
         flash("Post published.", "success")
         return redirect(url_for("blog.post_detail", post_id=post.id))
 
@@ -66,7 +160,9 @@ def post_edit(post_id: int):
     if form.validate_on_submit():
         post.title = form.title.data
         post.body = form.body.data
+        index_post(post)
         db.session.commit()
+        invalidate(FEED_TAG, post_tag(post.id))
         flash("Post updated.", "success")
         return redirect(url_for("blog.post_detail", post_id=post.id))
 
@@ -80,13 +176,15 @@ def post_delete(post_id: int):
     if post.author_id != current_user.id and not current_user.is_admin:
         abort(403)
 
-    db.session.delete(post)
-    db.session.commit()
+    author_id = post.author_id
+    delete_posts([post.id])
+    forget_summaries(author_id)
     flash("Post deleted.", "info")
     return redirect(url_for("blog.index"))
 
 
 @bp.route("/post/<int:post_id>/comment", methods=["POST"])
+@rate_limit("comment")
 @login_required
 def post_comment(post_id: int):
     post = Post.query.get_or_404(post_id)
@@ -98,7 +196,13 @@ def post_comment(post_id: int):
     if form.validate_on_submit():
         comment = Comment(body=form.body.data, author_id=current_user.id, post_id=post.id)
         db.session.add(comment)
+        post.comment_count = Post.comment_count + 1
+        db.session.flush()
+        index_comment(comment)
+        record_activity([(post.id, COMMENT_WEIGHT, event_time(comment.created_at))])
         db.session.commit()
+        invalidate(FEED_TAG, post_tag(post.id))
+        forget_summaries(current_user.id)
         flash("Comment added.", "success")
     else:
         flash("Comment could not be added. Please check the input.", "danger")
@@ -107,6 +211,7 @@ def post_comment(post_id: int):
 
 
 @bp.route("/post/<int:post_id>/like", methods=["POST"])
+@rate_limit("like")
 @login_required
 def post_like(post_id: int):
     post = Post.query.get_or_404(post_id)
@@ -114,13 +219,32 @@ def post_like(post_id: int):
         flash("Your account does not have permission to like or comment.", "warning")
         return redirect(url_for("blog.post_detail", post_id=post.id))
 
-    like = Like.query.filter_by(user_id=current_user.id, post_id=post.id).first()
-    if like:
-        db.session.delete(like)
-        flash("Like removed.", "info")
-    else:
-        db.session.add(Like(user_id=current_user.id, post_id=post.id))
+    liked, _ = apply_like(current_user.id, post.id)
+    forget_summaries(current_user.id, post.author_id)
+    if liked:
         flash("Post liked.", "success")
-
-    db.session.commit()
+    else:
+        flash("Like removed.", "info")
     return redirect(url_for("blog.post_detail", post_id=post.id))
+
+
+@bp.route("/post/<int:post_id>/like/toggle", methods=["POST"])
+@rate_limit("like")
+def post_like_toggle(post_id: int):
+    """JSON like endpoint: toggles, or sets the state when ``liked`` is sent, so retries are safe."""
+    if not current_user.is_authenticated:
+        return {"error": "Log in to like posts."}, 401
+    if not current_user.can_comment_like:
+        return {"error": "Your account does not have permission to like or comment."}, 403
+    author_id = db.session.scalar(select(Post.author_id).where(Post.id == post_id))
+    if author_id is None:
+        abort(404)
+
+    payload = request.get_json(silent=True) or request.form
+    requested = payload.get("liked")
+    if isinstance(requested, str):
+        requested = requested.strip().lower() in {"1", "true", "yes", "on"}
+
+    liked, like_count = apply_like(current_user.id, post_id, requested)
+    forget_summaries(current_user.id, author_id)
+    return {"liked": liked, "like_count": like_count}
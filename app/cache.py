@@ -0,0 +1,225 @@
+"""Response cache for anonymous page views.
+
+Pages are stored under their full request path together with a single tag
+(``feed`` or ``post:<id>``). Write routes call :func:`invalidate` with the
+tags whose data they changed, so a cached page lives until its TTL runs out
+or the data behind it changes, whichever comes first.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import NamedTuple
+
+from flask import Response, current_app, request, session
+from flask_login import current_user
+
+from .sqlite_store import SQLiteStore
+
+
+FEED_TAG = "feed"
+
+
+def post_tag(post_id: int) -> str:
+    return f"post:{post_id}"
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    mimetype: str
+    etag: str
+    modified: float
+    tag: str
+
+
+class LRUCache:
+    """Thread-safe LRU map whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate) -> None:
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class MemoryBackend:
+    """Per-process store; each gunicorn worker keeps (and invalidates) its own copy."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = LRUCache(max_entries, ttl)
+
+    def get(self, key: str) -> CachedPage | None:
+        return self._cache.get(key)
+
+    def set(self, key: str, page: CachedPage) -> None:
+        self._cache.set(key, page)
+
+    def delete_tags(self, tags) -> None:
+        tags = set(tags)
+        self._cache.delete_where(lambda page: page.tag in tags)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SQLiteBackend:
+    """Store shared by every worker on the host through a small SQLite file."""
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._store = SQLiteStore(
+            path,
+            "CREATE TABLE IF NOT EXISTS page ("
+            "key TEXT PRIMARY KEY, tag TEXT NOT NULL, body BLOB NOT NULL, mimetype TEXT NOT NULL, "
+            "etag TEXT NOT NULL, modified REAL NOT NULL, expires REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_page_tag ON page (tag)",
+        )
+
+    def get(self, key: str) -> CachedPage | None:
+        row = self._store.execute(
+            "SELECT body, mimetype, etag, modified, tag FROM page WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return CachedPage(*row) if row else None
+
+    def set(self, key: str, page: CachedPage) -> None:
+        now = time.time()
+        self._store.execute(
+            "INSERT OR REPLACE INTO page (key, tag, body, mimetype, etag, modified, expires) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, page.tag, page.body, page.mimetype, page.etag, page.modified, now + self.ttl),
+        )
+        self._store.execute("DELETE FROM page WHERE expires <= ?", (now,))
+
+    def delete_tags(self, tags) -> None:
+        tags = list(tags)
+        placeholders = ", ".join("?" for _ in tags)
+        self._store.execute(f"DELETE FROM page WHERE tag IN ({placeholders})", tags)
+
+    def clear(self) -> None:
+        self._store.execute("DELETE FROM page")
+
+
+def init_response_cache(app) -> None:
+    kind = app.config.get("RESPONSE_CACHE", "memory")
+    ttl = app.config.get("RESPONSE_CACHE_TTL", 60)
+    if kind == "memory":
+        backend = MemoryBackend(app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 512), ttl)
+    elif kind == "sqlite":
+        backend = SQLiteBackend(app.config["RESPONSE_CACHE_PATH"], ttl)
+    elif kind in ("", "none"):
+        backend = None
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE backend: {kind}")
+
+    app.extensions["response_cache"] = backend
+
+
+def init_user_cache(app) -> None:
+    ttl = app.config.get("USER_CACHE_TTL", 30)
+    app.extensions["user_cache"] = LRUCache(app.config.get("USER_CACHE_MAX_ENTRIES", 1024), ttl) if ttl > 0 else None
+
+
+def _backend():
+    return current_app.extensions.get("response_cache")
+
+
+def invalidate(*tags: str) -> None:
+    backend = _backend()
+    if backend is not None and tags:
+        backend.delete_tags(tags)
+
+
+def invalidate_all() -> None:
+    backend = _backend()
+    if backend is not None:
+        backend.clear()
+
+
+def _cacheable_request() -> bool:
+    # Flashed messages are per-visitor, so a page that would show one is rendered fresh.
+    return request.method == "GET" and not current_user.is_authenticated and "_flashes" not in session
+
+
+def _page_response(page: CachedPage) -> Response:
+    response = Response(page.body, mimetype=page.mimetype)
+    response.set_etag(page.etag)
+    response.last_modified = page.modified
+    response.vary.add("Cookie")
+    return response.make_conditional(request)
+
+
+def cache_page(tag: str):
+    """Serve the view from the response cache for anonymous GETs.
+
+    ``tag`` is formatted with the view arguments, e.g. ``"post:{post_id}"``.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            backend = _backend()
+            if backend is None or not _cacheable_request():
+                return view(**kwargs)
+
+            key = request.full_path
+            page = backend.get(key)
+            if page is None:
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code != 200 or "_flashes" in session:
+                    return response
+
+                body = response.get_data()
+                page = CachedPage(
+                    body=body,
+                    mimetype=response.mimetype,
+                    etag=hashlib.blake2b(body, digest_size=16).hexdigest(),
+                    modified=float(int(time.time())),
+                    tag=tag.format(**kwargs),
+                )
+                backend.set(key, page)
+
+            return _page_response(page)
+
+        return wrapper
+
+    return decorator
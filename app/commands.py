@@ -0,0 +1,395 @@
+import json
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+
+import click
+from flask import current_app
+from sqlalchemy import func, make_url, or_, select
+
+from .assets import build_assets
+from .cache import invalidate_all
+from .export import EXPORT_KINDS, iter_ndjson
+from .extensions import db
+from .importer import RECORD_TYPES, Importer, create_secondary_indexes, drop_secondary_indexes, read_records
+from .migrations import LATEST_VERSION, render_post_range, upgrade_schema
+from .models import Comment, Like, Post, User, recount_post_range
+from .passwords import hash_password, verify_password
+from .profiles import activity_statements, summary_statement
+from .rankings import ranking_query, refresh_rankings
+from .search import rebuild_index
+
+# Same as bench.SCENARIOS. The benchmark module is only imported by the bench
+# commands themselves, so every other command starts without loading it.
+BENCH_SCENARIOS = ("index", "post_detail", "like", "comment", "login", "admin_posts")
+
+
+def _same_database(first: str, second: str) -> bool:
+    first, second = make_url(first), make_url(second)
+    if first.get_backend_name() == second.get_backend_name() == "sqlite":
+        return bool(first.database) and os.path.realpath(first.database) == os.path.realpath(second.database or "")
+    return (first.host, first.port, first.database) == (second.host, second.port, second.database)
+
+
+def _scratch_app(database: str):
+    """An app on ``database`` for the benchmarks that write; the configured database is refused."""
+    from config import Config
+
+    from . import create_app
+
+    uri = database if "://" in database else f"sqlite:///{os.path.abspath(database)}"
+    if _same_database(uri, current_app.config["SQLALCHEMY_DATABASE_URI"]):
+        raise click.BadParameter(
+            "This benchmark writes test rows; point it at a scratch database.", param_hint="--database"
+        )
+    return create_app(type("ScratchConfig", (Config,), {"SQLALCHEMY_DATABASE_URI": uri, "AUTO_CREATE_DB": True}))
+
+
+def _hot_queries() -> dict:
+    now = datetime.now(UTC).replace(tzinfo=None)
+    return {
+        "feed": select(Post).order_by(Post.created_at.desc(), Post.id.desc()).limit(21),
+        "feed (cursor)": select(Post)
+        .where(Post.created_at <= now, or_(Post.created_at < now, Post.id < 1))
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(21),
+        "post comments": select(Comment)
+        .where(Comment.post_id == 1)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(21),
+        "post comments (cursor)": select(Comment)
+        .where(Comment.post_id == 1, Comment.created_at <= now, or_(Comment.created_at < now, Comment.id < 1))
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(21),
+        "post likes": select(func.count(Like.id)).where(Like.post_id == 1),
+        "admin users": select(User).order_by(User.created_at.desc(), User.id.desc()).limit(51),
+        "admin users by role": select(User)
+        .where(User.role == "author")
+        .order_by(User.created_at.desc(), User.id.desc())
+        .limit(51),
+        "admin posts by author": select(Post)
+        .join(Post.author)
+        .where(User.username == "x")
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(51),
+        "user delete (posts)": select(Post.id).where(Post.author_id == 1).limit(500),
+        "user delete (comments)": select(Comment.id, Comment.post_id).where(Comment.author_id == 1).limit(500),
+        "user delete (likes)": select(Like.id, Like.post_id).where(Like.user_id == 1).limit(500),
+        "google login": select(User).where(User.oauth_provider == "google", User.oauth_sub == "0"),
+        "trending": ranking_query("trending", 50).statement,
+        "top this week": ranking_query("week", 50).statement,
+        "rankings rebuild (likes)": select(Like.post_id, Like.created_at).where(Like.created_at >= now),
+        "rankings rebuild (comments)": select(Comment.post_id, Comment.created_at).where(Comment.created_at >= now),
+        "profile user": select(User).where(User.username == "x"),
+        "profile posts": select(Post).where(Post.author_id == 1).order_by(Post.created_at.desc(), Post.id.desc()).limit(21),
+        "profile summary": summary_statement(1),
+        **{f"profile activity ({kind}s)": statement for kind, statement in activity_statements(1, 10).items()},
+    }
+
+
+def _plan_problems(plan: list[str]) -> list[str]:
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN") and "INDEX" not in detail:
+            problems.append(detail)
+        elif "TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def register_commands(app):
+    @app.cli.command("migrate-db")
+    def migrate_db_command():
+        """Create missing tables and apply pending schema migrations."""
+        db.create_all()
+        applied = upgrade_schema(db.engine)
+        for line in applied:
+            click.echo(f"Applied migration {line}")
+        click.echo(f"Schema is at version {LATEST_VERSION}.")
+
+    @app.cli.command("check-indexes")
+    def check_indexes_command():
+        """Run EXPLAIN QUERY PLAN on the hot queries and fail if any needs a full scan or sort."""
+        if db.engine.dialect.name != "sqlite":
+            raise click.ClickException("check-indexes only understands SQLite query plans.")
+
+        failed = []
+        with db.engine.connect() as conn:
+            for name, statement in _hot_queries().items():
+                sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+                plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+                problems = _plan_problems(plan)
+                status = "FAIL" if problems else "ok"
+                click.echo(f"[{status}] {name}: {'; '.join(plan)}")
+                if problems:
+                    failed.append(name)
+
+        if failed:
+            raise click.ClickException(f"Queries without a usable index: {', '.join(failed)}")
+
+    @app.cli.command("reindex")
+    @click.option("--batch-size", default=5000, show_default=True, help="Rows copied per INSERT ... SELECT")
+    def reindex_command(batch_size: int):
+        """Rebuild the full-text search index from the posts and comments tables."""
+        started = time.perf_counter()
+        rebuild_index(batch_size)
+        db.session.commit()
+        click.echo(f"Search index rebuilt in {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command("recount-posts")
+    @click.option("--batch-size", default=1000, show_default=True, help="Posts recounted per transaction")
+    def recount_posts_command(batch_size: int):
+        """Rebuild Post.like_count and Post.comment_count from the like/comment tables."""
+        max_id = db.session.scalar(select(func.max(Post.id))) or 0
+        for first_id in range(1, max_id + 1, batch_size):
+            recount_post_range(first_id, first_id + batch_size - 1)
+            db.session.commit()
+
+        invalidate_all()
+        click.echo(f"Recounted posts up to id {max_id}.")
+
+    @app.cli.command("refresh-rankings")
+    def refresh_rankings_command():
+        """Rebuild the trending and top-this-week rankings from the likes and comments."""
+        started = time.perf_counter()
+        ranked = refresh_rankings(force=True)
+        click.echo(f"Ranked {ranked} posts in {time.perf_counter() - started:.2f}s.")
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Minify, fingerprint and precompress the CSS and SVG files under static/."""
+        manifest = build_assets(current_app.static_folder)
+        for name, entry in manifest.items():
+            sizes = ", ".join(f"{kind} {size:,} B" for kind, size in entry["sizes"].items())
+            click.echo(f"{name} -> {entry['path']} ({sizes})")
+        if "br" not in next(iter(manifest.values()), {"encodings": ["br"]})["encodings"]:
+            click.echo("Install the Brotli package to write .br copies as well.")
+
+    @app.cli.command("render-posts")
+    @click.option("--batch-size", default=1000, show_default=True, help="Posts rendered per transaction")
+    def render_posts_command(batch_size: int):
+        """Re-render Post.body_html and Post.excerpt, e.g. after switching POST_MARKDOWN."""
+        max_id = db.session.scalar(select(func.max(Post.id))) or 0
+        for first_id in range(1, max_id + 1, batch_size):
+            render_post_range(db.session.connection(), first_id, first_id + batch_size - 1)
+            db.session.commit()
+
+        invalidate_all()
+        click.echo(f"Rendered posts up to id {max_id}.")
+
+    @app.cli.command("export")
+    @click.option("--type", "kinds", multiple=True, type=click.Choice(EXPORT_KINDS), help="Repeatable; default all")
+    @click.option("--output", type=click.File("w", encoding="utf-8"), default="-", help="File to write (default stdout)")
+    def export_command(kinds: tuple[str, ...], output):
+        """Stream users, posts and comments as NDJSON."""
+        for line in iter_ndjson(kinds or EXPORT_KINDS):
+            output.write(line)
+
+    @app.cli.command("import")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--type", "record_type", type=click.Choice(RECORD_TYPES), help="Record type of a CSV file")
+    @click.option("--batch-size", default=20000, show_default=True, help="Rows per executemany and commit")
+    @click.option("--restart", is_flag=True, help="Ignore the saved checkpoint and read the file from the top")
+    @click.option("--defer-indexes", is_flag=True, help="Drop lookup indexes during the load (best on a new site)")
+    def import_command(path: str, record_type: str | None, batch_size: int, restart: bool, defer_indexes: bool):
+        """Bulk-load users, posts, comments and likes from NDJSON (as written by export) or CSV."""
+        if path.lower().endswith(".csv") and record_type is None:
+            raise click.BadParameter("CSV files hold one record type; pass --type.")
+        importer = Importer(os.path.abspath(path), batch_size=batch_size)
+        if restart:
+            importer.forget_checkpoint()
+        if defer_indexes:
+            drop_secondary_indexes()
+
+        started = time.perf_counter()
+        try:
+            stats = importer.run(
+                read_records(path, record_type),
+                progress=lambda stats: click.echo(f"  {stats.read} lines read", err=True),
+            )
+        except (ValueError, KeyError) as exc:
+            db.session.rollback()
+            raise click.ClickException(f"{exc} (rerun the same command to resume)") from exc
+        if defer_indexes:
+            create_secondary_indexes()
+        elapsed = time.perf_counter() - started
+
+        # Counters, the search index and cached pages are brought up to date once at the end.
+        if stats.first_post_id is not None:
+            for first_id in range(stats.first_post_id, stats.last_post_id + 1, 1000):
+                recount_post_range(first_id, first_id + 999)
+                db.session.commit()
+        rebuild_index()
+        db.session.commit()
+        refresh_rankings(force=True)
+        invalidate_all()
+
+        report = stats.as_dict()
+        report["seconds"] = round(elapsed, 2)
+        report["rows_per_s"] = round(sum(stats.written.values()) / elapsed) if elapsed else None
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("bench-hashing")
+    @click.option("--method", "methods", multiple=True, help="Werkzeug hash method; repeatable (default: configured)")
+    @click.option("--logins", default=40, show_default=True, help="Password checks per method")
+    @click.option("--threads", default=4, show_default=True, help="Concurrent request threads to simulate")
+    def bench_hashing_command(methods: tuple[str, ...], logins: int, threads: int):
+        """Report login (password check) throughput for each hashing setting."""
+        flask_app = current_app._get_current_object()
+        click.echo(f"PASSWORD_HASH_WORKERS={flask_app.config['PASSWORD_HASH_WORKERS']}, threads={threads}")
+
+        def check(stored: str) -> bool:
+            with flask_app.app_context():
+                return verify_password(stored, "benchmark-password")
+
+        for method in methods or (flask_app.config["PASSWORD_HASH_METHOD"],):
+            stored = hash_password("benchmark-password", method)
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                started = time.perf_counter()
+                results = list(pool.map(check, [stored] * logins))
+                elapsed = time.perf_counter() - started
+
+            if not all(results):
+                raise click.ClickException(f"Password check failed for {method}")
+            click.echo(f"{method}: {logins / elapsed:.1f} logins/s ({elapsed / logins * 1000:.1f} ms each)")
+
+    @app.cli.command("seed-bench")
+    @click.option("--users", default=500, show_default=True)
+    @click.option("--posts", default=2000, show_default=True)
+    @click.option("--comments", default=50000, show_default=True)
+    @click.option("--likes", default=50000, show_default=True)
+    @click.option("--skew", default=1.1, show_default=True, help="Zipf exponent; higher puts more activity on a few posts")
+    @click.option("--seed", default=42, show_default=True, help="Random seed, so runs are reproducible")
+    def seed_bench_command(users: int, posts: int, comments: int, likes: int, skew: float, seed: int):
+        """Fill an empty database with synthetic benchmark data."""
+        from .bench import seed_database
+
+        if users < 2 or posts < 1:
+            raise click.BadParameter("Need at least 2 users and 1 post.")
+
+        started = time.perf_counter()
+        try:
+            seed_database(users, posts, comments, likes, skew=skew, seed=seed)
+        except ValueError as exc:
+            raise click.ClickException(str(exc)) from exc
+        refresh_rankings(force=True)
+        invalidate_all()
+        click.echo(f"Seeded {users} users, {posts} posts, {comments} comments, {likes} likes "
+                   f"in {time.perf_counter() - started:.1f}s. Password for every account: bench-password")
+
+    @app.cli.command("bench")
+    @click.option("--url", default=None, help="Base URL of a running server (default: in-process test client)")
+    @click.option("--requests", "requests_per_scenario", default=200, show_default=True, help="Requests per scenario")
+    @click.option("--scenario", "scenarios", multiple=True, type=click.Choice(BENCH_SCENARIOS), help="Repeatable; default all")
+    @click.option("--output", type=click.Path(dir_okay=False, writable=True), help="Also write the JSON report here")
+    def bench_command(url: str | None, requests_per_scenario: int, scenarios: tuple[str, ...], output: str | None):
+        """Benchmark the main routes against seed-bench data and print a JSON report."""
+        from .bench import run_benchmark
+
+        if not url and not current_app.config.get("INSTRUMENTATION"):
+            click.echo("Note: set INSTRUMENTATION=true to get queries_per_request.", err=True)
+        logging.getLogger("bloxy.perf").setLevel(logging.WARNING)
+
+        try:
+            report = run_benchmark(
+                current_app._get_current_object(),
+                base_url=url,
+                requests_per_scenario=requests_per_scenario,
+                scenarios=scenarios or BENCH_SCENARIOS,
+            )
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=False)
+        report["commit"] = revision.stdout.strip() or None
+        text = json.dumps(report, indent=2)
+        click.echo(text)
+        if output:
+            with open(output, "w", encoding="utf-8") as handle:
+                handle.write(text + "\n")
+
+    @app.cli.command("bench-likes")
+    @click.option("--url", default=None, help="Base URL of a running server (default: in-process test client)")
+    @click.option("--threads", default=8, show_default=True, help="Members liking at the same time")
+    @click.option("--likes", "likes_per_thread", default=100, show_default=True, help="Like toggles per thread")
+    def bench_likes_command(url: str | None, threads: int, likes_per_thread: int):
+        """Measure like throughput and failed writes under concurrent post_like traffic."""
+        from .bench import run_like_benchmark
+
+        logging.getLogger("bloxy.perf").setLevel(logging.WARNING)
+        try:
+            report = run_like_benchmark(
+                current_app._get_current_object(), base_url=url, threads=threads, likes_per_thread=likes_per_thread
+            )
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+
+        report["sqlite_tuning"] = current_app.config.get("SQLITE_TUNING") if not url else None
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("bench-delete")
+    @click.option("--database", required=True, help="Scratch SQLite file or database URL (not the app's own)")
+    @click.option("--posts", default=10000, show_default=True)
+    @click.option("--comments", default=100000, show_default=True)
+    @click.option("--mode", type=click.Choice(("set", "orm")), default="set", show_default=True,
+                  help="set: app.deletion bulk deletes; orm: the old relationship cascade")
+    def bench_delete_command(database: str, posts: int, comments: int, mode: str):
+        """Time deleting a user with many posts and comments, and its peak Python memory."""
+        from .bench import run_delete_benchmark
+
+        scratch = _scratch_app(database)
+        try:
+            report = run_delete_benchmark(scratch, posts, comments, mode)
+        finally:
+            with scratch.app_context():
+                db.engine.dispose()
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("bench-rankings")
+    @click.option("--reads", default=50, show_default=True, help="Top-50 reads timed per method")
+    @click.option("--kind", type=click.Choice(("trending", "week")), default="trending", show_default=True)
+    def bench_rankings_command(reads: int, kind: str):
+        """Compare reading the top 50 from the ranking table with an on-the-fly GROUP BY."""
+        from .bench import run_ranking_benchmark
+
+        try:
+            report = run_ranking_benchmark(current_app._get_current_object(), reads, kind)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("bench-startup")
+    @click.option("--runs", default=5, show_default=True, help="Fresh interpreters per measurement")
+    @click.option("--top", default=10, show_default=True, help="Slowest imported packages to list")
+    def bench_startup_command(runs: int, top: int):
+        """Report cold import, app-factory and fast-boot /healthz times."""
+        from .bench import run_startup_benchmark
+
+        root = os.path.dirname(current_app.root_path)
+        try:
+            report = run_startup_benchmark(root, runs, top)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("bench-usernames")
+    @click.option("--database", required=True, help="Scratch SQLite file or database URL (not the app's own)")
+    @click.option("--names", default=10000, show_default=True, help="Users already holding the name or a numbered variant")
+    @click.option("--signups", default=50, show_default=True)
+    @click.option("--threads", default=1, show_default=True)
+    @click.option("--mode", type=click.Choice(("range", "loop")), default="range", show_default=True,
+                  help="range: one indexed prefix query; loop: the old query per suffix")
+    def bench_usernames_command(database: str, names: int, signups: int, threads: int, mode: str):
+        """Time Google sign-ups whose name is already taken many times over."""
+        from .bench import run_username_benchmark
+
+        scratch = _scratch_app(database)
+        try:
+            result = run_username_benchmark(scratch, names, signups, mode, threads)
+        finally:
+            with scratch.app_context():
+                db.engine.dispose()
+        click.echo(json.dumps(result, indent=2))
@@ -0,0 +1,121 @@
+"""Optional gzip/Brotli compression of dynamic responses.
+
+With RESPONSE_COMPRESSION=true, text responses are compressed for clients
+that accept it. Brotli is preferred when the optional ``Brotli`` package is
+installed; otherwise gzip is used. A buffered response is compressed only if
+its body is at least COMPRESSION_MIN_SIZE bytes.
+
+A streamed response (streamed pages, NDJSON exports) is compressed as it goes
+out. The first chunk is flushed at once, so the page head still reaches the
+browser early. After that the output is flushed about every FLUSH_BYTES of
+input, so compression keeps working across many small chunks.
+
+The following pass through untouched: responses that already have a
+Content-Encoding (the prebuilt static assets), files sent with ``send_file``,
+and anything marked ``Cache-Control: no-transform``.
+"""
+
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+}
+FLUSH_BYTES = 16 * 1024
+
+
+def _negotiate() -> str | None:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding: str, gzip_level: int, brotli_quality: int):
+    """``(compress, flush, finish)`` callables for one response body."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=brotli_quality)
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits=31 writes a gzip header and trailer around the deflate stream.
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_stream(chunks, source, compress, flush, finish):
+    pending = FLUSH_BYTES
+    try:
+        for chunk in chunks:
+            output = compress(chunk)
+            pending += len(chunk)
+            if pending >= FLUSH_BYTES:
+                output += flush()
+                pending = 0
+            if output:
+                yield output
+        yield finish()
+    finally:
+        # Closing the original body ends its stream_with_context request context.
+        close = getattr(source, "close", None)
+        if close is not None:
+            close()
+
+
+def _compressible(response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE_TYPES
+        and not response.cache_control.no_transform
+    )
+
+
+def init_compression(app) -> None:
+    if not app.config.get("RESPONSE_COMPRESSION", False):
+        return
+
+    min_size = app.config.get("COMPRESSION_MIN_SIZE", 1024)
+    gzip_level = app.config.get("COMPRESSION_GZIP_LEVEL", 6)
+    brotli_quality = app.config.get("COMPRESSION_BROTLI_QUALITY", 4)
+
+    @app.after_request
+    def compress_response(response):
+        if not _compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = _negotiate()
+        if encoding is None:
+            return response
+
+        compress, flush, finish = _compressor(encoding, gzip_level, brotli_quality)
+        if response.is_streamed:
+            source = response.response
+            response.response = _compress_stream(response.iter_encoded(), source, compress, flush, finish)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < min_size:
+                return response
+            response.set_data(compress(body) + finish())
+
+        response.content_encoding = encoding
+        # The compressed bytes are a different representation of the same page.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
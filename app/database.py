@@ -0,0 +1,84 @@
+"""SQLite connection tuning.
+
+The stock rollback journal lets one writer block every reader, so concurrent
+likes and comments from gunicorn threads queue behind each other and then
+fail with "database is locked". WAL lets readers run alongside the writer,
+and the busy timeout makes writers wait for their turn instead of failing.
+"""
+
+import math
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from .extensions import db
+
+
+def engine_options(config) -> dict:
+    """Engine options for SQLALCHEMY_DATABASE_URI, under any set in SQLALCHEMY_ENGINE_OPTIONS."""
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() != "sqlite":
+        options = {"pool_pre_ping": True, "pool_recycle": 1800}
+    elif url.database in (None, "", ":memory:") or url.query.get("mode") == "memory":
+        # In-memory databases get SQLAlchemy's single shared connection, which takes no pool sizes.
+        options = {}
+    else:
+        options = {
+            "pool_size": config["SQLITE_POOL_SIZE"],
+            "max_overflow": config["SQLITE_POOL_OVERFLOW"],
+            "pool_timeout": 10,
+            "connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000},
+        }
+    return {**options, **config.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+
+
+def _pragmas(config) -> list[str]:
+    return [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+    ]
+
+
+def init_sqlite_tuning(app) -> None:
+    if not app.config.get("SQLITE_TUNING", False):
+        return
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = _pragmas(app.config)
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _has_math_functions() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute("SELECT power(2, 1)")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def init_sqlite_functions(app) -> None:
+    """Provide power() on SQLite builds without the math functions (the rankings use it)."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite" or _has_math_functions():
+        return
+
+    @event.listens_for(engine, "connect")
+    def register_functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function("power", 2, math.pow, deterministic=True)
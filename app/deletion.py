@@ -0,0 +1,83 @@
+"""Set-based deletes for posts and users and everything hanging off them.
+
+Rows go in id chunks of DELETE ... WHERE ... IN (...) statements, and each
+chunk commits on its own, so deleting a prolific user never holds the
+SQLite write lock for long. The user row is deleted last, so an interrupted
+delete can simply be run again. These functions commit, keep the search
+index and post counters in step, and invalidate the caches themselves.
+"""
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from .cache import FEED_TAG, invalidate, invalidate_all, post_tag
+from .extensions import db
+from .models import Comment, Like, Post, PostRank, User, forget_user, refresh_post_counts
+from .search import remove_documents
+
+
+def _batch_size(batch_size: int | None) -> int:
+    return batch_size or current_app.config.get("DELETE_BATCH_SIZE", 500)
+
+
+def _execute(statement) -> int:
+    return db.session.execute(statement, execution_options={"synchronize_session": False}).rowcount
+
+
+def _delete_post_chunk(post_ids: list[int]) -> int:
+    comment_ids = db.session.scalars(select(Comment.id).where(Comment.post_id.in_(post_ids))).all()
+    remove_documents(post_ids=post_ids, comment_ids=comment_ids)
+    _execute(delete(Like).where(Like.post_id.in_(post_ids)))
+    _execute(delete(Comment).where(Comment.post_id.in_(post_ids)))
+    _execute(delete(PostRank).where(PostRank.post_id.in_(post_ids)))
+    return _execute(delete(Post).where(Post.id.in_(post_ids)))
+
+
+def delete_posts(post_ids, batch_size: int | None = None) -> int:
+    """Delete posts with their comments and likes; returns how many posts went."""
+    post_ids = sorted(set(post_ids))
+    size = _batch_size(batch_size)
+    deleted = 0
+    for start in range(0, len(post_ids), size):
+        deleted += _delete_post_chunk(post_ids[start : start + size])
+        db.session.commit()
+
+    invalidate(FEED_TAG, *(post_tag(post_id) for post_id in post_ids))
+    return deleted
+
+
+def _delete_user(user_id: int, size: int) -> int:
+    while True:
+        post_ids = db.session.scalars(select(Post.id).where(Post.author_id == user_id).limit(size)).all()
+        if not post_ids:
+            break
+        _delete_post_chunk(post_ids)
+        db.session.commit()
+
+    # Their comments and likes on other authors' posts go too, so those counters drop.
+    for model, owner in ((Comment, Comment.author_id), (Like, Like.user_id)):
+        while True:
+            rows = db.session.execute(select(model.id, model.post_id).where(owner == user_id).limit(size)).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            if model is Comment:
+                remove_documents(comment_ids=ids)
+            _execute(delete(model).where(model.id.in_(ids)))
+            refresh_post_counts({row.post_id for row in rows})
+            db.session.commit()
+
+    deleted = _execute(delete(User).where(User.id == user_id))
+    db.session.commit()
+    forget_user(user_id)
+    return deleted
+
+
+def delete_users(user_ids, batch_size: int | None = None) -> int:
+    """Delete users with their posts, comments and likes; returns how many users went."""
+    size = _batch_size(batch_size)
+    deleted = sum(_delete_user(user_id, size) for user_id in sorted(set(user_ids)))
+    if deleted:
+        # Their posts, comments and likes can appear on any page.
+        invalidate_all()
+    return deleted
@@ -0,0 +1,513 @@
+"""Bulk import of users, posts, comments and likes from NDJSON or CSV.
+
+The input is read one line at a time and written in ``batch_size`` batches
+with executemany. Each batch commits together with a checkpoint holding
+the last line it covered. After a crash, the same command skips what was
+already written and carries on. Inserts ignore rows that hit a unique
+constraint (a like pair, or a user that signed up meanwhile), so replaying
+a batch is harmless as well.
+
+Record shapes match ``flask export``: every NDJSON line has a ``type``
+(``user``, ``post``, ``comment`` or ``like``). A CSV file holds one type,
+with one column per field.
+
+Every row gets a new id, so an import never lands on an existing row.
+The ``import_id_map`` table records which local user, post or comment each
+source ``id`` became. Records find their author or liker through it by
+``author_id`` / ``user_id``, and comments and likes their post by
+``post_id``, also when those came from an earlier import. A comment or like
+whose post is not in the map is reported, not inserted. A source row that
+is already in the map is skipped, so importing the same file twice adds
+nothing.
+
+A user whose email already has an account is mapped to that account. One
+whose username is taken by someone else gets the next free name from
+``allocate_username`` (``alice`` becomes ``alice1``) and is counted under
+``renamed_users``. Records without a source ``author_id`` / ``user_id``
+name the user by ``author`` / ``user`` username instead: a user imported
+in this run under that source name, else an existing local account.
+"""
+
+import csv
+import json
+from datetime import UTC, datetime
+
+from sqlalchemy import DateTime, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .extensions import db
+from .models import ROLE_USER, ROLE_VALUES, Comment, Like, Post, User, allocate_username
+from .rendering import render_post
+
+RECORD_TYPES = ("user", "post", "comment", "like")
+
+
+# Insert column order per record type; mapped types get an allocated ``id`` in front.
+COLUMNS = {
+    "user": ("username", "email", "role", "password_hash", "created_at"),
+    "post": ("title", "body", "body_html", "excerpt", "author_id", "created_at", "updated_at"),
+    "comment": ("body", "author_id", "post_id", "created_at"),
+    "like": ("user_id", "post_id", "created_at"),
+}
+TABLES = {"user": User.__table__, "post": Post.__table__, "comment": Comment.__table__, "like": Like.__table__}
+# Record types whose source ids are mapped to new local ones in ``import_id_map``.
+MAPPED = {"user": User, "post": Post, "comment": Comment}
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.resumed_from = 0
+        self.written = dict.fromkeys(RECORD_TYPES, 0)
+        self.skipped = dict.fromkeys(RECORD_TYPES, 0)
+        # Users whose email already had an account, and users whose username was taken.
+        self.matched_users = 0
+        self.renamed_users = 0
+        # Comments and likes whose post_id is not a known source post, with a few of the ids.
+        self.unresolved = {"comment": 0, "like": 0}
+        self.unresolved_post_ids: list[int] = []
+        self.first_post_id: int | None = None
+        self.last_post_id: int | None = None
+
+    def touch_posts(self, post_ids: list[int]) -> None:
+        if post_ids:
+            low, high = min(post_ids), max(post_ids)
+            self.first_post_id = low if self.first_post_id is None else min(self.first_post_id, low)
+            self.last_post_id = high if self.last_post_id is None else max(self.last_post_id, high)
+
+    def as_dict(self) -> dict:
+        return {
+            "lines_read": self.read,
+            "resumed_from_line": self.resumed_from,
+            "written": self.written,
+            "skipped": self.skipped,
+            "matched_users": self.matched_users,
+            "renamed_users": self.renamed_users,
+            "unresolved_post_refs": self.unresolved,
+            "unresolved_post_ids_sample": self.unresolved_post_ids,
+        }
+
+
+def _insert_ignore(model):
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert(model).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql_insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with("IGNORE", dialect="mysql")
+
+
+def _secondary_indexes():
+    # Unique indexes stay: the inserts rely on them to drop duplicates.
+    for table in (Post.__table__, Comment.__table__, Like.__table__):
+        for index in table.indexes:
+            if not index.unique:
+                yield index
+
+
+def drop_secondary_indexes() -> None:
+    """Drop lookup indexes for a large load; building them once afterwards is cheaper."""
+    conn = db.session.connection()
+    for index in _secondary_indexes():
+        index.drop(conn, checkfirst=True)
+    db.session.commit()
+
+
+def create_secondary_indexes() -> None:
+    conn = db.session.connection()
+    for index in _secondary_indexes():
+        index.create(conn, checkfirst=True)
+    db.session.commit()
+
+
+class _BulkInsert:
+    """An insert-ignoring statement compiled once and run with the driver's executemany.
+
+    Rows are plain tuples in ``columns`` order. Only the columns' own bind
+    processors (e.g. SQLite's datetime formatting) run per value, which skips
+    most of SQLAlchemy's per-row parameter handling.
+    """
+
+    def __init__(self, table, columns: tuple[str, ...]):
+        dialect = db.engine.dialect
+        compiled = _insert_ignore(table).compile(dialect=dialect, column_keys=list(columns))
+        self.sql = compiled.string
+        self.positional = dialect.positional
+        self.names = compiled.positiontup if self.positional else list(compiled.binds)
+        self.plan = []
+        for name in self.names:
+            column = table.c[name]
+            process = column.type.bind_processor(dialect)
+            if dialect.name == "sqlite" and isinstance(column.type, DateTime):
+                # Same text SQLAlchemy's SQLite DateTime stores, from C instead of a format dict.
+                process = _sqlite_datetime
+            if name in columns:
+                self.plan.append((columns.index(name), None, process))
+            else:
+                # Columns the rows leave out, like the post counters, take their scalar default.
+                default = column.default.arg
+                self.plan.append((None, process(default) if process else default, None))
+
+    def execute(self, rows: list[tuple]) -> int:
+        plan = self.plan
+        params = [
+            tuple(constant if i is None else process(row[i]) if process else row[i] for i, constant, process in plan)
+            for row in rows
+        ]
+        if not self.positional:
+            params = [dict(zip(self.names, values)) for values in params]
+        return db.session.connection().exec_driver_sql(self.sql, params).rowcount
+
+
+def _sqlite_datetime(value: datetime) -> str:
+    return value.isoformat(" ", "microseconds")
+
+
+def _timestamp(value, default: datetime) -> datetime:
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value)
+    # Stored as naive UTC.
+    return parsed.astimezone(UTC).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def _int(value) -> int | None:
+    return int(value) if value not in (None, "") else None
+
+
+def read_records(path: str, record_type: str | None = None):
+    """Yield ``(line_number, record)`` pairs from an NDJSON or CSV file."""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.lower().endswith(".csv"):
+            if record_type is None:
+                raise ValueError("CSV imports need a record type (--type).")
+            # Line 1 is the header.
+            for number, row in enumerate(csv.DictReader(handle), start=2):
+                yield number, {"type": record_type, **row}
+            return
+
+        for number, line in enumerate(handle, start=1):
+            if line.strip():
+                record = json.loads(line)
+                if record_type is not None:
+                    record.setdefault("type", record_type)
+                yield number, record
+
+
+class Importer:
+    def __init__(self, source: str, batch_size: int = 20000):
+        self.source = source
+        self.batch_size = batch_size
+        self.now = datetime.now(UTC).replace(tzinfo=None)
+        self.stats = ImportStats()
+        # Local accounts by username, and users imported in this run by their source username.
+        self.user_ids: dict[str, int] = {}
+        self.imported_names: dict[str, int] = {}
+        # Per mapped type: source id -> local id, for this and every earlier import.
+        self.source_ids: dict[str, dict[int, int]] = {kind: {} for kind in MAPPED}
+        # Posts and comments are ``(source_id, row)`` pairs; comments and likes hold the source post_id.
+        self.pending: dict[str, list] = {kind: [] for kind in RECORD_TYPES}
+        self.pending_usernames: set[str] = set()
+        self.pending_sources: dict[str, set[int]] = {kind: set() for kind in MAPPED}
+        self.statements: dict[str, _BulkInsert] = {}
+
+    # -- checkpoints -------------------------------------------------------
+
+    def _checkpoint(self) -> int:
+        conn = db.session.connection()
+        conn.execute(
+            text("CREATE TABLE IF NOT EXISTS import_checkpoint (source TEXT PRIMARY KEY, line INTEGER NOT NULL)")
+        )
+        line = conn.execute(text("SELECT line FROM import_checkpoint WHERE source = :s"), {"s": self.source}).scalar()
+        db.session.commit()
+        return line or 0
+
+    def _save_checkpoint(self, line: int) -> None:
+        params = {"s": self.source, "line": line}
+        conn = db.session.connection()
+        if not conn.execute(text("UPDATE import_checkpoint SET line = :line WHERE source = :s"), params).rowcount:
+            conn.execute(text("INSERT INTO import_checkpoint (source, line) VALUES (:s, :line)"), params)
+
+    def _load_source_ids(self) -> None:
+        conn = db.session.connection()
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS import_id_map (kind VARCHAR(16) NOT NULL, source_id INTEGER NOT NULL, "
+                "local_id INTEGER NOT NULL, PRIMARY KEY (kind, source_id))"
+            )
+        )
+        for kind, source_id, local_id in conn.execute(text("SELECT kind, source_id, local_id FROM import_id_map")):
+            self.source_ids[kind][source_id] = local_id
+        db.session.commit()
+
+    def forget_checkpoint(self) -> None:
+        self._checkpoint()
+        db.session.execute(text("DELETE FROM import_checkpoint WHERE source = :s"), {"s": self.source})
+        db.session.commit()
+
+    # -- user resolution ---------------------------------------------------
+
+    def _load_user_ids(self) -> None:
+        self.user_ids = dict(db.session.execute(select(User.username, User.id)).all())
+
+    def _user_id(self, record: dict, name_key: str, id_key: str) -> int | None:
+        source_id = _int(record.get(id_key))
+        if source_id is not None:
+            return self.source_ids["user"].get(source_id)
+        username = record.get(name_key)
+        return self.imported_names.get(username) or self.user_ids.get(username)
+
+    def _references_pending_user(self, record: dict, name_key: str, id_key: str) -> bool:
+        source_id = _int(record.get(id_key))
+        if source_id is not None:
+            return source_id in self.pending_sources["user"]
+        return record.get(name_key) in self.pending_usernames
+
+    # -- rows --------------------------------------------------------------
+
+    def _user_row(self, record: dict) -> tuple | None:
+        username = (record.get("username") or "").strip()[:30]
+        email = (record.get("email") or "").strip().lower()
+        if not username or not email:
+            return None
+        source_id = _int(record.get("id"))
+        if not self._claim_source("user", source_id):
+            return None
+        self.pending_usernames.add(username)
+        role = record.get("role") if record.get("role") in ROLE_VALUES else ROLE_USER
+        return source_id, (
+            username,
+            email,
+            role,
+            record.get("password_hash") or None,
+            _timestamp(record.get("created_at"), self.now),
+        )
+
+    def _post_row(self, record: dict) -> tuple | None:
+        author_id = self._user_id(record, "author", "author_id")
+        if author_id is None or not record.get("title") or not record.get("body"):
+            return None
+        created_at = _timestamp(record.get("created_at"), self.now)
+        source_id = _int(record.get("id"))
+        if not self._claim_source("post", source_id):
+            return None
+        body_html, excerpt = render_post(record["body"])
+        return source_id, (
+            record["title"][:140],
+            record["body"],
+            body_html,
+            excerpt,
+            author_id,
+            created_at,
+            _timestamp(record.get("updated_at"), created_at),
+        )
+
+    def _comment_row(self, record: dict) -> tuple | None:
+        author_id = self._user_id(record, "author", "author_id")
+        post_id = _int(record.get("post_id"))
+        if author_id is None or post_id is None or not record.get("body"):
+            return None
+        source_id = _int(record.get("id"))
+        if not self._claim_source("comment", source_id):
+            return None
+        return source_id, (
+            record["body"],
+            author_id,
+            post_id,
+            _timestamp(record.get("created_at"), self.now),
+        )
+
+    def _like_row(self, record: dict) -> tuple | None:
+        user_id = self._user_id(record, "user", "user_id")
+        post_id = _int(record.get("post_id"))
+        if user_id is None or post_id is None:
+            return None
+        return user_id, post_id, _timestamp(record.get("created_at"), self.now)
+
+    def _claim_source(self, kind: str, source_id: int | None) -> bool:
+        """False if this source row was imported before or is already pending."""
+        if source_id is None:
+            return True
+        if source_id in self.source_ids[kind] or source_id in self.pending_sources[kind]:
+            return False
+        self.pending_sources[kind].add(source_id)
+        return True
+
+    # -- batches -----------------------------------------------------------
+
+    def _statement(self, kind: str) -> _BulkInsert:
+        if kind not in self.statements:
+            columns = ("id", *COLUMNS[kind]) if kind in MAPPED else COLUMNS[kind]
+            self.statements[kind] = _BulkInsert(TABLES[kind], columns)
+        return self.statements[kind]
+
+    def _allocate_ids(self, kind: str, count: int) -> list[int]:
+        model = MAPPED[kind]
+        conn = db.session.connection()
+        if conn.dialect.name == "postgresql":
+            # Drawing from the sequence keeps it ahead of every id used here.
+            return list(
+                conn.execute(
+                    text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+                    # Quoted where needed: "user" is a reserved word.
+                    {"table": conn.dialect.identifier_preparer.format_table(model.__table__), "n": count},
+                ).scalars()
+            )
+        # SQLite and MySQL continue from MAX(id). The checkpoint write at the start of the
+        # batch holds SQLite's write lock; MySQL locks the end of the index with FOR UPDATE.
+        statement = select(func.max(model.id))
+        if conn.dialect.name == "mysql":
+            statement = statement.with_for_update()
+        start = conn.execute(statement).scalar() or 0
+        return list(range(start + 1, start + 1 + count))
+
+    def _insert(self, kind: str, rows: list) -> None:
+        if rows:
+            written = self._statement(kind).execute(rows)
+            self.stats.written[kind] += written
+            self.stats.skipped[kind] += len(rows) - written
+
+    def _insert_mapped(self, kind: str, pending: list) -> list[int]:
+        """Insert ``(source_id, row)`` pairs under new ids and record them in the map."""
+        ids = self._allocate_ids(kind, len(pending))
+        self._insert(kind, [(local_id, *row) for local_id, (_, row) in zip(ids, pending)])
+        self._map_sources(kind, [(source_id, local_id) for local_id, (source_id, _) in zip(ids, pending)])
+        return ids
+
+    def _map_sources(self, kind: str, pairs: list) -> None:
+        mapped = [
+            {"kind": kind, "source_id": source_id, "local_id": local_id}
+            for source_id, local_id in pairs
+            if source_id is not None
+        ]
+        if mapped:
+            db.session.execute(
+                text("INSERT INTO import_id_map (kind, source_id, local_id) VALUES (:kind, :source_id, :local_id)"),
+                mapped,
+            )
+            self.source_ids[kind].update((row["source_id"], row["local_id"]) for row in mapped)
+
+    def _free_username(self, username: str, taken: set[str]) -> str:
+        # allocate_username only sees committed names; skip the ones this batch has claimed.
+        skip = 0
+        while (candidate := allocate_username(username, skip)) in taken:
+            skip += 1
+        return candidate
+
+    def _insert_users(self, pending: list) -> None:
+        """Map users to the account holding their email, else insert them under a free username."""
+        emails = list({row[1] for _, row in pending})
+        usernames = list({row[0] for _, row in pending})
+        owners, taken = {}, set()
+        for start in range(0, len(pending), 500):
+            chunk = emails[start : start + 500]
+            owners.update(db.session.execute(select(User.email, User.id).where(User.email.in_(chunk))).all())
+            chunk = usernames[start : start + 500]
+            taken.update(db.session.scalars(select(User.username).where(User.username.in_(chunk))))
+
+        ids = iter(self._allocate_ids("user", len(pending)))
+        rows, pairs = [], []
+        for source_id, (username, email, *rest) in pending:
+            local_id = owners.get(email)
+            if local_id is not None:
+                self.stats.matched_users += 1
+            else:
+                local_id = owners[email] = next(ids)
+                name = username
+                if name in taken:
+                    name = self._free_username(username, taken)
+                    self.stats.renamed_users += 1
+                taken.add(name)
+                rows.append((local_id, name, email, *rest))
+            pairs.append((source_id, local_id))
+            self.imported_names[username] = local_id
+        self._insert("user", rows)
+        self._map_sources("user", pairs)
+
+    def _resolve_post(self, kind: str, row: tuple) -> tuple | None:
+        """The row with its source post_id swapped for the local one, or None if the post is unknown."""
+        index = COLUMNS[kind].index("post_id")
+        post_id = self.source_ids["post"].get(row[index])
+        if post_id is None:
+            self.stats.unresolved[kind] += 1
+            sample = self.stats.unresolved_post_ids
+            if len(sample) < 20 and row[index] not in sample:
+                sample.append(row[index])
+            return None
+        return (*row[:index], post_id, *row[index + 1 :])
+
+    def _flush(self, line: int) -> None:
+        # Written first, so the batch holds the write lock before ids are allocated.
+        self._save_checkpoint(line)
+        if self.pending["user"]:
+            self._insert_users(self.pending["user"])
+        if self.pending["post"]:
+            self.stats.touch_posts(self._insert_mapped("post", self.pending["post"]))
+
+        comments = []
+        for source_id, row in self.pending["comment"]:
+            row = self._resolve_post("comment", row)
+            if row is not None:
+                comments.append((source_id, row))
+        if comments:
+            self._insert_mapped("comment", comments)
+        likes = [row for row in (self._resolve_post("like", row) for row in self.pending["like"]) if row is not None]
+        self._insert("like", likes)
+
+        # Remember which posts need their counters recomputed at the end.
+        self.stats.touch_posts([row[COLUMNS["comment"].index("post_id")] for _, row in comments])
+        self.stats.touch_posts([row[COLUMNS["like"].index("post_id")] for row in likes])
+        self.pending = {kind: [] for kind in RECORD_TYPES}
+        for sources in self.pending_sources.values():
+            sources.clear()
+        self.pending_usernames.clear()
+        db.session.commit()
+
+    def run(self, records, progress=None) -> ImportStats:
+        resume_after = self._checkpoint()
+        self.stats.resumed_from = resume_after
+        self._load_user_ids()
+        self._load_source_ids()
+        builders = {
+            "user": self._user_row,
+            "post": self._post_row,
+            "comment": self._comment_row,
+            "like": self._like_row,
+        }
+        pending_count = 0
+        line = resume_after
+
+        for line, record in records:
+            self.stats.read += 1
+            kind = record.get("type")
+            if line <= resume_after:
+                # Already written; only remember which user a source username became.
+                local_id = self.source_ids["user"].get(_int(record.get("id"))) if kind == "user" else None
+                if local_id is not None and record.get("username"):
+                    self.imported_names[record["username"].strip()[:30]] = local_id
+                continue
+            if kind not in builders:
+                raise ValueError(f"Line {line}: unknown record type {kind!r}")
+
+            name_key, id_key = ("user", "user_id") if kind == "like" else ("author", "author_id")
+            if kind != "user" and self.pending["user"] and self._references_pending_user(record, name_key, id_key):
+                self._flush(line - 1)
+                pending_count = 0
+                if progress:
+                    progress(self.stats)
+
+            built = builders[kind](record)
+            if built is None:
+                self.stats.skipped[kind] += 1
+                continue
+            self.pending[kind].append(built)
+            pending_count += 1
+            if pending_count >= self.batch_size:
+                self._flush(line)
+                pending_count = 0
+                if progress:
+                    progress(self.stats)
+
+        self._flush(line)
+        return self.stats
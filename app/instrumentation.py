@@ -0,0 +1,190 @@
+"""Opt-in per-request performance numbers (INSTRUMENTATION=true).
+
+Each request records its latency, SQL statement count and time, template
+render time and ORM rows loaded. The numbers go out as a ``Server-Timing``
+header, one JSON log line on the ``bloxy.perf`` logger, and per-endpoint
+histograms in Prometheus text format. Histograms are per process, so scrape
+every worker.
+
+``/metrics`` exposes endpoint names and traffic, so it is opt-in on top of
+INSTRUMENTATION: it only exists when METRICS_TOKEN is set, and answers only
+requests that send that token as ``Authorization: Bearer <token>``.
+"""
+
+import hmac
+import json
+import logging
+import threading
+import time
+
+from flask import abort, before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from .extensions import db
+
+
+perf_log = logging.getLogger("bloxy.perf")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.rows = 0
+        self.render_started: float | None = None
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: dict[str, list] = {}
+
+    def observe(self, endpoint: str, value: float) -> None:
+        series = self._series.setdefault(endpoint, [[0] * len(self.buckets), 0, 0.0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+        series[1] += 1
+        series[2] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for endpoint, (counts, total, value_sum) in sorted(self._series.items()):
+            label = f'endpoint="{endpoint}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {total}')
+            lines.append(f"{self.name}_sum{{{label}}} {value_sum}")
+            lines.append(f"{self.name}_count{{{label}}} {total}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = Histogram("bloxy_request_duration_seconds", "Request latency.", LATENCY_BUCKETS)
+        self.sql_count = Histogram("bloxy_request_sql_statements", "SQL statements per request.", COUNT_BUCKETS)
+        self.sql_time = Histogram("bloxy_request_sql_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS)
+        self.render_time = Histogram("bloxy_request_render_seconds", "Template render time per request.", LATENCY_BUCKETS)
+        self.rows = Histogram("bloxy_request_orm_rows", "ORM rows loaded per request.", COUNT_BUCKETS)
+
+    def observe(self, endpoint: str, latency: float, stats: RequestStats) -> None:
+        with self._lock:
+            self.latency.observe(endpoint, latency)
+            self.sql_count.observe(endpoint, stats.sql_count)
+            self.sql_time.observe(endpoint, stats.sql_time)
+            self.render_time.observe(endpoint, stats.render_time)
+            self.rows.observe(endpoint, stats.rows)
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = (self.latency, self.sql_count, self.sql_time, self.render_time, self.rows)
+            return "\n".join(line for histogram in histograms for line in histogram.render()) + "\n"
+
+
+def _stats() -> RequestStats | None:
+    if not has_request_context():
+        return None
+    return g.get("_perf")
+
+
+def init_instrumentation(app) -> None:
+    if not app.config.get("INSTRUMENTATION", False):
+        return
+
+    request_metrics = Metrics()
+    app.extensions["perf_metrics"] = request_metrics
+    if not perf_log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        perf_log.addHandler(handler)
+        perf_log.setLevel(logging.INFO)
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("perf_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["perf_started"].pop()
+        stats = _stats()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_time += elapsed
+
+    @event.listens_for(db.Model, "load", propagate=True)
+    def on_load(target, context):
+        stats = _stats()
+        if stats is not None:
+            stats.rows += 1
+
+    def on_before_render(sender, template, context, **extra):
+        stats = _stats()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    def on_rendered(sender, template, context, **extra):
+        stats = _stats()
+        if stats is not None and stats.render_started is not None:
+            stats.render_time += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    before_render_template.connect(on_before_render, app, weak=False)
+    template_rendered.connect(on_rendered, app, weak=False)
+
+    @app.before_request
+    def start_request_stats():
+        g._perf = RequestStats()
+
+    @app.after_request
+    def record_request_stats(response):
+        stats = _stats()
+        if stats is None:
+            return response
+
+        latency = time.perf_counter() - stats.started
+        endpoint = request.endpoint or "unmatched"
+        if endpoint != "metrics":
+            request_metrics.observe(endpoint, latency, stats)
+
+        response.headers["Server-Timing"] = (
+            f"app;dur={latency * 1000:.1f}, "
+            f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries", '
+            f"render;dur={stats.render_time * 1000:.1f}"
+        )
+        perf_log.info(
+            json.dumps(
+                {
+                    "endpoint": endpoint,
+                    "method": request.method,
+                    "status": response.status_code,
+                    "latency_ms": round(latency * 1000, 2),
+                    "sql_count": stats.sql_count,
+                    "sql_ms": round(stats.sql_time * 1000, 2),
+                    "render_ms": round(stats.render_time * 1000, 2),
+                    "rows": stats.rows,
+                }
+            )
+        )
+        return response
+
+    token = app.config.get("METRICS_TOKEN", "")
+    if not token:
+        return
+
+    @app.get("/metrics", endpoint="metrics")
+    def metrics_endpoint():
+        scheme, _, sent = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(sent.encode(), token.encode()):
+            abort(401)
+        return request_metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
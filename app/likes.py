@@ -0,0 +1,228 @@
+"""Atomic like writes and an optional per-process write buffer.
+
+``set_like`` changes one (user, post) pair with a single INSERT ... ON
+CONFLICT DO NOTHING or DELETE ... RETURNING, so a double click can neither
+trip ``uq_like_user_post`` nor count twice. Both need RETURNING, so like
+writes run on PostgreSQL and SQLite 3.35 or newer only.
+
+With LIKE_BUFFER=true, likes are queued instead. The latest state per
+(user, post) wins, and a background thread writes the whole queue every
+LIKE_BUFFER_FLUSH_MS in one transaction. A like storm on a viral post then
+takes the SQLite write lock once per interval instead of once per click.
+Readers see buffered likes after the next flush. A like queued for a post
+or user deleted before the flush is dropped, not written as an orphan row.
+"""
+
+import atexit
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import delete, exists, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from .cache import FEED_TAG, invalidate, post_tag
+from .extensions import db
+from .models import Like, Post, User, refresh_post_counts
+from .rankings import LIKE_WEIGHT, event_time, record_activity
+
+log = logging.getLogger(__name__)
+
+
+def _insert_ignoring_duplicates():
+    dialect = db.engine.dialect
+    if dialect.name == "postgresql":
+        return postgresql_insert(Like).on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+    if dialect.name == "sqlite" and dialect.server_version_info >= (3, 35):
+        return sqlite_insert(Like).on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+    # The callers read the inserted rows back with RETURNING, which MySQL and older SQLite lack.
+    raise RuntimeError("Like writes need PostgreSQL or SQLite 3.35+ (INSERT ... RETURNING).")
+
+
+def _existing_ids(model, ids: set[int], chunk_size: int = 500) -> set[int]:
+    ids = sorted(ids)
+    found = set()
+    for start in range(0, len(ids), chunk_size):
+        found.update(db.session.scalars(select(model.id).where(model.id.in_(ids[start : start + chunk_size]))))
+    return found
+
+
+def is_liked(user_id: int, post_id: int) -> bool:
+    return db.session.scalar(select(exists().where(Like.user_id == user_id, Like.post_id == post_id)))
+
+
+def current_like_state(user_id: int, post_id: int) -> bool:
+    """Whether the user likes the post, counting a like still waiting in the write buffer."""
+    buffer = current_app.extensions.get("like_buffer")
+    pending = buffer.pending_state(user_id, post_id) if buffer is not None else None
+    return is_liked(user_id, post_id) if pending is None else pending
+
+
+def set_like(user_id: int, post_id: int, liked: bool) -> tuple[bool, int]:
+    """Make the like exist (or not) and return ``(liked, like_count)``; the caller commits."""
+    if liked:
+        changed = db.session.execute(
+            _insert_ignoring_duplicates().values(user_id=user_id, post_id=post_id).returning(Like.created_at)
+        ).first()
+    else:
+        changed = db.session.execute(
+            delete(Like).where(Like.user_id == user_id, Like.post_id == post_id).returning(Like.created_at)
+        ).first()
+
+    if changed is None:
+        return liked, db.session.scalar(select(Post.like_count).where(Post.id == post_id))
+
+    record_activity([(post_id, LIKE_WEIGHT if liked else -LIKE_WEIGHT, event_time(changed.created_at))])
+
+    delta = 1 if liked else -1
+    count = db.session.execute(
+        update(Post).where(Post.id == post_id).values(like_count=Post.like_count + delta).returning(Post.like_count),
+        execution_options={"synchronize_session": False},
+    ).scalar()
+    return liked, count
+
+
+def toggle_like(user_id: int, post_id: int) -> tuple[bool, int]:
+    # Try the delete first: if nothing was there, insert. A concurrent insert of the same
+    # pair is ignored, and the post simply stays liked.
+    removed = db.session.execute(
+        delete(Like).where(Like.user_id == user_id, Like.post_id == post_id).returning(Like.created_at)
+    ).first()
+    if removed is not None:
+        record_activity([(post_id, -LIKE_WEIGHT, event_time(removed.created_at))])
+        count = db.session.execute(
+            update(Post).where(Post.id == post_id).values(like_count=Post.like_count - 1).returning(Post.like_count),
+            execution_options={"synchronize_session": False},
+        ).scalar()
+        return False, count
+    return set_like(user_id, post_id, True)
+
+
+def apply_like(user_id: int, post_id: int, liked: bool | None = None) -> tuple[bool, int]:
+    """Toggle the like (or set it to ``liked``) and return the new ``(liked, like_count)``.
+
+    With the write buffer on, the count is the stored count adjusted for this user's own
+    pending change; other users' queued likes show up after the next flush.
+    """
+    buffer = current_app.extensions.get("like_buffer")
+    if buffer is None:
+        result = toggle_like(user_id, post_id) if liked is None else set_like(user_id, post_id, liked)
+        db.session.commit()
+        invalidate(FEED_TAG, post_tag(post_id))
+        return result
+
+    stored = is_liked(user_id, post_id)
+    pending = buffer.pending_state(user_id, post_id)
+    current = stored if pending is None else pending
+    new_state = (not current) if liked is None else liked
+    buffer.enqueue(user_id, post_id, new_state)
+    count = db.session.scalar(select(Post.like_count).where(Post.id == post_id))
+    return new_state, count + int(new_state) - int(stored)
+
+
+class LikeBuffer:
+    def __init__(self, app, interval: float, max_pending: int):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: dict[tuple[int, int], bool] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        atexit.register(self.flush)
+
+    def _ensure_thread(self) -> None:
+        # Started on first use so the thread lives in the serving worker, not a pre-fork parent.
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="like-buffer", daemon=True)
+            self._thread.start()
+
+    def pending_state(self, user_id: int, post_id: int) -> bool | None:
+        with self._lock:
+            return self._pending.get((user_id, post_id))
+
+    def enqueue(self, user_id: int, post_id: int, liked: bool) -> None:
+        with self._lock:
+            self._pending[(user_id, post_id)] = liked
+            self._ensure_thread()
+            if len(self._pending) >= self.max_pending:
+                self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Flushing buffered likes failed")
+
+    def _write(self, batch: dict) -> None:
+        liked = [pair for pair, state in batch.items() if state]
+        unliked = [pair for pair, state in batch.items() if not state]
+        # SQLite does not enforce the foreign keys, so skip pairs whose post or user is gone.
+        users = _existing_ids(User, {user_id for user_id, _ in liked})
+        posts = _existing_ids(Post, {post_id for _, post_id in liked})
+        liked = [
+            {"user_id": user_id, "post_id": post_id} for user_id, post_id in liked if user_id in users and post_id in posts
+        ]
+
+        events = []
+        if liked:
+            added = db.session.execute(
+                _insert_ignoring_duplicates().returning(Like.post_id, Like.created_at), liked
+            ).all()
+            events += [(row.post_id, LIKE_WEIGHT, event_time(row.created_at)) for row in added]
+        for start in range(0, len(unliked), 500):
+            chunk = unliked[start : start + 500]
+            removed = db.session.execute(
+                delete(Like)
+                .where(tuple_(Like.user_id, Like.post_id).in_(chunk))
+                .returning(Like.post_id, Like.created_at)
+            ).all()
+            events += [(row.post_id, -LIKE_WEIGHT, event_time(row.created_at)) for row in removed]
+        record_activity(events)
+        refresh_post_counts({post_id for _, post_id in batch})
+        db.session.commit()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        post_ids = {post_id for _, post_id in batch}
+        with self.app.app_context():
+            try:
+                try:
+                    self._write(batch)
+                except IntegrityError:
+                    # A post or user was deleted between the check and the insert: check again.
+                    db.session.rollback()
+                    self._write(batch)
+            except IntegrityError:
+                # Retrying would fail the same way, so these pairs are dropped, not re-queued.
+                db.session.rollback()
+                log.warning("Dropped %d buffered likes that point at deleted rows", len(batch))
+            except Exception:
+                db.session.rollback()
+                # Put the batch back unless a newer state for the same pair arrived meanwhile.
+                with self._lock:
+                    for pair, state in batch.items():
+                        self._pending.setdefault(pair, state)
+                raise
+
+            invalidate(FEED_TAG, *(post_tag(post_id) for post_id in post_ids))
+
+
+def init_like_buffer(app) -> None:
+    buffer = None
+    if app.config.get("LIKE_BUFFER", False):
+        buffer = LikeBuffer(
+            app,
+            interval=app.config.get("LIKE_BUFFER_FLUSH_MS", 200) / 1000,
+            max_pending=app.config.get("LIKE_BUFFER_MAX_PENDING", 5000),
+        )
+    app.extensions["like_buffer"] = buffer
@@ -0,0 +1,173 @@
+"""Versioned, idempotent schema upgrades for databases created before a model change.
+
+``db.create_all()`` only creates missing tables, so columns and indexes added to
+existing tables are applied here. Every step must be safe to re-run and a no-op
+on a schema that ``create_all`` just built.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from .extensions import db
+
+
+def _add_post_counters(conn) -> None:
+    from .models import post_recount_statement
+
+    columns = {column["name"] for column in inspect(conn).get_columns("post")}
+    missing = [name for name in ("like_count", "comment_count") if name not in columns]
+    for name in missing:
+        conn.execute(text(f"ALTER TABLE post ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+
+    if missing:
+        max_id = conn.execute(text("SELECT MAX(id) FROM post")).scalar() or 0
+        for first_id in range(1, max_id + 1, 1000):
+            conn.execute(post_recount_statement(first_id, first_id + 999))
+
+
+def _create_indexes(*names: str):
+    def step(conn) -> None:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(conn, checkfirst=True)
+
+    return step
+
+
+def _create_search_index(conn) -> None:
+    from .search import create_fts_table, fill_fts_table
+
+    # The in-process fallback index covers other databases.
+    if conn.dialect.name != "sqlite":
+        return
+    create_fts_table(conn)
+    fill_fts_table(conn)
+
+
+def _create_search_version(conn) -> None:
+    from .search import create_version_table
+
+    create_version_table(conn)
+
+
+def _create_search_change_log(conn) -> None:
+    from .search import create_change_table
+
+    create_change_table(conn)
+
+
+def render_post_range(conn, first_id: int, last_id: int) -> None:
+    from .rendering import render_post
+
+    rows = conn.execute(
+        text("SELECT id, body FROM post WHERE id BETWEEN :first AND :last"), {"first": first_id, "last": last_id}
+    ).all()
+    if rows:
+        conn.execute(
+            text("UPDATE post SET body_html = :body_html, excerpt = :excerpt WHERE id = :id"),
+            [dict(zip(("body_html", "excerpt"), render_post(body)), id=post_id) for post_id, body in rows],
+        )
+
+
+def render_all_posts(conn, batch_size: int = 1000) -> None:
+    max_id = conn.execute(text("SELECT MAX(id) FROM post")).scalar() or 0
+    for first_id in range(1, max_id + 1, batch_size):
+        render_post_range(conn, first_id, first_id + batch_size - 1)
+
+
+def _add_rendered_bodies(conn) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("post")}
+    missing = [name for name in ("body_html", "excerpt") if name not in columns]
+    for name in missing:
+        conn.execute(text(f"ALTER TABLE post ADD COLUMN {name} TEXT"))
+    if missing:
+        render_all_posts(conn)
+
+
+def _create_rankings(conn) -> None:
+    from flask import current_app
+
+    from .models import PostRank, RankingState
+    from .rankings import rebuild_rankings
+
+    for table in (PostRank.__table__, RankingState.__table__):
+        table.create(conn, checkfirst=True)
+    _create_indexes("ix_post_rank_trending", "ix_post_rank_week", "ix_like_created", "ix_comment_created")(conn)
+    if conn.execute(text("SELECT id FROM ranking_state")).first() is None:
+        rebuild_rankings(conn, current_app.config["TRENDING_HALF_LIFE_HOURS"] * 3600)
+
+
+def _add_profile_indexes(conn) -> None:
+    _create_indexes("ix_comment_author_created", "ix_like_user_created")(conn)
+    # ix_comment_author_created starts with author_id, so it replaces the single-column index.
+    if "ix_comment_author" in {index["name"] for index in inspect(conn).get_indexes("comment")}:
+        on_table = " ON comment" if conn.dialect.name == "mysql" else ""
+        conn.execute(text(f"DROP INDEX ix_comment_author{on_table}"))
+
+
+MIGRATIONS = [
+    (1, "post like/comment counters", _add_post_counters),
+    (
+        2,
+        "indexes for hot lookups",
+        _create_indexes(
+            "ix_post_created_at",
+            "ix_comment_post_created",
+            "ix_like_post_id",
+            "ix_user_created_at",
+            "ix_user_oauth",
+        ),
+    ),
+    (3, "full-text search index", _create_search_index),
+    (4, "rendered post bodies and excerpts", _add_rendered_bodies),
+    (
+        5,
+        "indexes for admin filters and user deletes",
+        # This step also added ix_comment_author. Step 7 replaces it with ix_comment_author_created,
+        # creating that for databases upgraded from before version 5 and dropping the old index where
+        # this step already built it, so it is no longer created here.
+        _create_indexes("ix_user_role_created", "ix_post_author_created", "ix_post_title"),
+    ),
+    (6, "trending and top-this-week rankings", _create_rankings),
+    (7, "indexes for author profiles", _add_profile_indexes),
+    (8, "search index version counter", _create_search_version),
+    (9, "search index change log", _create_search_change_log),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def schema_is_current(engine) -> bool:
+    """Whether the schema_version marker says every migration has run, without any DDL.
+
+    New tables must come with a migration step too, or a database that is
+    already current would never get them at boot.
+    """
+    try:
+        with engine.connect() as conn:
+            return (conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0) >= LATEST_VERSION
+    except DBAPIError:
+        return False
+
+
+def upgrade_schema(engine) -> list[str]:
+    """Apply pending migrations in order, one transaction each; returns what ran."""
+    with engine.begin() as conn:
+        version = current_version(conn)
+
+    applied = []
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": step_version})
+        applied.append(f"{step_version}: {description}")
+
+    return applied
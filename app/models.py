@@ -1,9 +1,13 @@
+import re
 from datetime import UTC, datetime
 
+from flask import current_app
 from flask_login import UserMixin
-from werkzeug.security import check_password_hash, generate_password_hash
-
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import make_transient_to_detached, validates
 from .extensions import db, login_manager
+from .passwords import hash_password, needs_rehash, verify_password
+from .rendering import render_post
 
 ROLE_USER = "user"
 ROLE_AUTHOR = "author"
@@ -12,6 +16,12 @@ ROLE_VALUES = (ROLE_USER, ROLE_AUTHOR, ROLE_ADMIN)
 
 
 class User(UserMixin, db.Model):
+    __table_args__ = (
+        db.Index("ix_user_created_at", "created_at"),
+        db.Index("ix_user_oauth", "oauth_provider", "oauth_sub"),
+        db.Index("ix_user_role_created", "role", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(30), unique=True, nullable=False)
     email = db.Column(db.String(255), unique=True, nullable=False)
@@ -21,17 +31,23 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), nullable=False, default=ROLE_USER)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(UTC))
 
-    posts = db.relationship("Post", back_populates="author", lazy=True, cascade="all, delete-orphan")
-    comments = db.relationship("Comment", back_populates="author", lazy=True, cascade="all, delete-orphan")
-    likes = db.relationship("Like", back_populates="user", lazy=True, cascade="all, delete-orphan")
+    # Children are never loaded just to delete them: app.deletion removes them with bulk
+    # DELETEs, and the foreign keys cascade on databases that enforce them.
+    posts = db.relationship("Post", back_populates="author", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    comments = db.relationship("Comment", back_populates="author", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    likes = db.relationship("Like", back_populates="user", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
         if not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    @property
+    def password_needs_rehash(self) -> bool:
+        return bool(self.password_hash) and needs_rehash(self.password_hash)
 
     @property
     def is_admin(self) -> bool:
@@ -48,42 +64,179 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id: str):
-    return db.session.get(User, int(user_id))
+    cache = current_app.extensions.get("user_cache")
+    if cache is None:
+        return db.session.get(User, int(user_id))
+
+    values = cache.get(int(user_id))
+    if values is None:
+        # The feed may already hold this user with only id/username loaded; fetch the full row once.
+        user = db.session.get(User, int(user_id), populate_existing=True)
+        if user is not None:
+            cache.set(user.id, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+        return user
+
+    # Rebuild from the cached row and merge it in without a SELECT; relationships still lazy-load.
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+USERNAME_LENGTH = 30
+# Suffixes up to this many digits share the prefix the lookup scans.
+_SUFFIX_DIGITS = 7
+
+
+def allocate_username(base_username: str, skip: int = 0) -> str:
+    """First free username for ``base_username``: the cleaned name, else name1, name2, ...
+
+    One range query on the username index fetches every taken name that a
+    candidate could collide with, and the gap is found in Python. Two sign-ups
+    can still pick the same name at once; the caller retries on the unique
+    constraint, passing ``skip`` to pass over that many free names.
+    """
+    cleaned = re.sub(r"[^A-Za-z0-9_.-]", "", base_username).lower() or "user"
+    prefix = cleaned[: USERNAME_LENGTH - _SUFFIX_DIGITS]
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    taken = set(db.session.scalars(select(User.username).where(User.username >= prefix, User.username < upper)))
+
+    candidate = cleaned[:USERNAME_LENGTH]
+    suffix = 1
+    while candidate in taken or skip:
+        if candidate not in taken:
+            skip -= 1
+        suffix_text = str(suffix)
+        candidate = f"{cleaned[: USERNAME_LENGTH - len(suffix_text)]}{suffix_text}"
+        suffix += 1
+    return candidate
+
+
+def forget_user(user_id: int) -> None:
+    """Drop this worker's cached login after the user's row changes; other workers wait out the TTL."""
+    cache = current_app.extensions.get("user_cache")
+    if cache is not None:
+        cache.delete(user_id)
 
 
 class Post(db.Model):
+    __table_args__ = (
+        db.Index("ix_post_created_at", "created_at", "id"),
+        db.Index("ix_post_author_created", "author_id", "created_at", "id"),
+        db.Index("ix_post_title", "title"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140), nullable=False)
     body = db.Column(db.Text, nullable=False)
+    # Rendered from body on every assignment; list pages read excerpt and never load body.
+    body_html = db.Column(db.Text, nullable=True)
+    excerpt = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(UTC))
     updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
-    author_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
     author = db.relationship("User", back_populates="posts")
-    comments = db.relationship("Comment", back_populates="post", lazy=True, cascade="all, delete-orphan")
-    likes = db.relationship("Like", back_populates="post", lazy=True, cascade="all, delete-orphan")
+    comments = db.relationship("Comment", back_populates="post", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    likes = db.relationship("Like", back_populates="post", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+
+    @validates("body")
+    def _render_body(self, key, body):
+        self.body_html, self.excerpt = render_post(body)
+        return body
 
 
 class Comment(db.Model):
+    __table_args__ = (
+        db.Index("ix_comment_post_created", "post_id", "created_at", "id"),
+        db.Index("ix_comment_author_created", "author_id", "created_at", "id"),
+        db.Index("ix_comment_created", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     body = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(UTC))
 
-    author_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey("post.id", ondelete="CASCADE"), nullable=False)
 
     author = db.relationship("User", back_populates="comments")
     post = db.relationship("Post", back_populates="comments")
 
 
 class Like(db.Model):
-    __table_args__ = (db.UniqueConstraint("user_id", "post_id", name="uq_like_user_post"),)
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "post_id", name="uq_like_user_post"),
+        db.Index("ix_like_post_id", "post_id"),
+        db.Index("ix_like_created", "created_at"),
+        db.Index("ix_like_user_created", "user_id", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(UTC))
 
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey("post.id", ondelete="CASCADE"), nullable=False)
 
     user = db.relationship("User", back_populates="likes")
     post = db.relationship("Post", back_populates="likes")
+
+
+class PostRank(db.Model):
+    """Materialized feed rankings, one row per post with recent activity (see app.rankings).
+
+    ``trending`` is a sum of 2 ** ((event_time - epoch) / half_life) terms relative to
+    the epoch in ``RankingState``, so it only grows as events arrive and still orders
+    posts by their decayed score. ``week`` sums the same weights over the last 7 days.
+    """
+
+    __tablename__ = "post_rank"
+    __table_args__ = (
+        db.Index("ix_post_rank_trending", "trending", "post_id"),
+        db.Index("ix_post_rank_week", "week", "post_id"),
+    )
+
+    post_id = db.Column(db.Integer, db.ForeignKey("post.id", ondelete="CASCADE"), primary_key=True)
+    trending = db.Column(db.Float, nullable=False, default=0.0)
+    week = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class RankingState(db.Model):
+    """The single row that anchors ``PostRank`` scores: epoch and half-life in Unix seconds."""
+
+    __tablename__ = "ranking_state"
+
+    id = db.Column(db.Integer, primary_key=True)
+    epoch = db.Column(db.Float, nullable=False)
+    half_life = db.Column(db.Float, nullable=False)
+    refreshed_at = db.Column(db.Float, nullable=False, default=0.0)
+
+
+def _post_count_values() -> dict:
+    return {
+        "like_count": select(func.count(Like.id)).where(Like.post_id == Post.id).scalar_subquery(),
+        "comment_count": select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery(),
+    }
+
+
+def refresh_post_counts(post_ids, chunk_size: int = 500) -> None:
+    """Recompute the denormalized counters for ``post_ids`` from the like/comment tables."""
+    post_ids = sorted(set(post_ids))
+    for start in range(0, len(post_ids), chunk_size):
+        chunk = post_ids[start : start + chunk_size]
+        db.session.execute(
+            update(Post).where(Post.id.in_(chunk)).values(**_post_count_values()),
+            execution_options={"synchronize_session": False},
+        )
+
+
+def post_recount_statement(first_id: int, last_id: int):
+    return update(Post).where(Post.id.between(first_id, last_id)).values(**_post_count_values())
+
+
+def recount_post_range(first_id: int, last_id: int) -> None:
+    db.session.execute(
+        post_recount_statement(first_id, last_id),
+        execution_options={"synchronize_session": False},
+    )
@@ -0,0 +1,60 @@
+"""Google sign-in, set up on first use.
+
+Importing Authlib and requests costs a few hundred milliseconds, which
+every worker would pay at boot for a login most requests never touch.
+``init_google_oauth`` only records the settings and prefetches the OIDC
+metadata in a background thread; ``google_client`` builds the Authlib
+client the first time a login needs it (see ``app.oidc``).
+"""
+
+import threading
+
+from flask import current_app
+
+
+class GoogleOAuth:
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.RLock()
+        self._metadata = None
+        self._client = None
+
+    def metadata(self):
+        with self._lock:
+            if self._metadata is None:
+                from .oidc import GOOGLE_DISCOVERY_URL, OIDCMetadata
+
+                config = self.app.config
+                self._metadata = OIDCMetadata(
+                    GOOGLE_DISCOVERY_URL,
+                    path=config["OIDC_CACHE_PATH"],
+                    ttl=config["OIDC_CACHE_TTL"],
+                    fixture=config.get("OIDC_METADATA_FILE") or None,
+                    timeout=config["OIDC_HTTP_TIMEOUT"],
+                )
+            return self._metadata
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from .oidc import create_google_client
+
+                self._client = create_google_client(self.app, self.metadata())
+            return self._client
+
+    def prefetch(self) -> None:
+        threading.Thread(target=lambda: self.metadata().warm(), name="oidc-prefetch", daemon=True).start()
+
+
+def init_google_oauth(app) -> None:
+    google = None
+    if app.config.get("GOOGLE_CLIENT_ID") and app.config.get("GOOGLE_CLIENT_SECRET"):
+        google = GoogleOAuth(app)
+        google.prefetch()
+    app.extensions["google_oauth"] = google
+
+
+def google_client():
+    """The Authlib client for Google, or None when Google sign-in is not configured."""
+    google = current_app.extensions.get("google_oauth")
+    return google.client() if google is not None else None
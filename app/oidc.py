@@ -0,0 +1,186 @@
+"""Google sign-in client with cached OIDC discovery metadata and JWKS.
+
+Authlib fetches the discovery document and the signing keys lazily, inside
+the first login request of every worker, and again whenever a token is
+signed by a key it has not seen. Here both documents are kept in one JSON
+file under ``instance/`` that all workers share:
+
+- At boot each worker loads the file and, if it is missing or older than
+  OIDC_CACHE_TTL, refreshes it in a background thread.
+- A stale copy keeps being served while a refresh runs; only a worker with
+  no copy at all waits for the fetch.
+- OIDC_METADATA_FILE points at a fixture with the same layout, for offline
+  tests. It is never refreshed.
+
+Token exchanges and key fetches share one keep-alive connection pool, so
+a callback does not pay for a new TLS handshake each time.
+
+This module pulls in Authlib and requests; ``app.oauth`` imports it on
+first use so worker boot does not pay for them.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+from authlib.integrations.flask_client import FlaskOAuth2App, OAuth
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+# A token signed by an unknown key forces a JWKS refetch at most this often.
+JWKS_FORCE_INTERVAL = 60
+
+
+class _PooledAdapter(HTTPAdapter):
+    # Authlib closes its session after every call; keep the pool alive for the process.
+    def close(self):
+        pass
+
+
+_adapter = _PooledAdapter(pool_connections=4, pool_maxsize=16)
+
+
+def pooled_session() -> requests.Session:
+    session = requests.Session()
+    mount_pool(session)
+    return session
+
+
+def mount_pool(session: requests.Session) -> None:
+    session.mount("https://", _adapter)
+    session.mount("http://", _adapter)
+
+
+class OIDCMetadata:
+    def __init__(self, discovery_url: str, path: str, ttl: int, fixture: str | None = None, timeout: float = 10):
+        self.discovery_url = discovery_url
+        self.path = fixture or path
+        self.ttl = ttl
+        self.offline = fixture is not None
+        self.timeout = timeout
+        self._document: dict | None = None
+        self._lock = threading.Lock()
+        self._flag_lock = threading.Lock()
+        self._refreshing = False
+        self._forced_at = 0.0
+        self._http = pooled_session()
+
+    def _stale(self, document: dict) -> bool:
+        return not self.offline and time.time() - document.get("fetched_at", 0) >= self.ttl
+
+    def load(self) -> bool:
+        """Read the cached (or fixture) document; False if there is none to read."""
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                document = json.load(handle)
+        except (OSError, ValueError):
+            return False
+        if "metadata" not in document or "jwks" not in document:
+            return False
+        self._document = document
+        return True
+
+    def _get(self, url: str) -> dict:
+        response = self._http.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _save(self, document: dict) -> None:
+        self._document = document
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(document, handle)
+        os.replace(temporary, self.path)
+
+    def refresh(self, jwks_only: bool = False) -> dict:
+        """Fetch the discovery document (unless ``jwks_only``) and the key set, and store both."""
+        if self.offline:
+            raise RuntimeError(f"OIDC metadata comes from the fixture {self.path} and is never fetched")
+        metadata = self._document["metadata"] if jwks_only and self._document else self._get(self.discovery_url)
+        document = {"metadata": metadata, "jwks": self._get(metadata["jwks_uri"]), "fetched_at": time.time()}
+        self._save(document)
+        return document
+
+    def _refresh_quietly(self) -> None:
+        try:
+            with self._lock:
+                self.refresh()
+        except Exception:
+            log.warning("Refreshing OIDC metadata from %s failed", self.discovery_url, exc_info=True)
+        finally:
+            self._refreshing = False
+
+    def refresh_in_background(self) -> None:
+        with self._flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_quietly, name="oidc-refresh", daemon=True).start()
+
+    def warm(self) -> None:
+        """Load the shared copy at boot and refresh it off the request path if it is old."""
+        if not self.load() or self._stale(self._document):
+            self.refresh_in_background()
+
+    def document(self) -> dict:
+        document = self._document
+        if document is None:
+            with self._lock:
+                # Another worker may have written the file since boot.
+                if self._document is None and not self.load():
+                    self.refresh()
+                document = self._document
+        if self._stale(document):
+            self.refresh_in_background()
+        return document
+
+    def metadata(self) -> dict:
+        return self.document()["metadata"]
+
+    def jwks(self, force: bool = False) -> dict:
+        if force and not self.offline and time.time() - self._forced_at >= JWKS_FORCE_INTERVAL:
+            # Google rotated its keys: fetch the new set now, but don't let bogus kids hammer it.
+            self._forced_at = time.time()
+            with self._lock:
+                return self.refresh(jwks_only=True)["jwks"]
+        return self.document()["jwks"]
+
+
+class GoogleOAuthApp(FlaskOAuth2App):
+    """Authlib's Flask client, reading metadata and keys from ``metadata_source``."""
+
+    metadata_source: OIDCMetadata | None = None
+
+    def load_server_metadata(self):
+        if self.metadata_source is None:
+            return super().load_server_metadata()
+        self.server_metadata.update(self.metadata_source.metadata())
+        return self.server_metadata
+
+    def fetch_jwk_set(self, force=False):
+        if self.metadata_source is None:
+            return super().fetch_jwk_set(force=force)
+        return self.metadata_source.jwks(force=force)
+
+    def _get_oauth_client(self, **metadata):
+        session = super()._get_oauth_client(**metadata)
+        mount_pool(session)
+        return session
+
+
+def create_google_client(app, source: OIDCMetadata) -> GoogleOAuthApp:
+    client = OAuth(app).register(
+        name="google",
+        client_id=app.config["GOOGLE_CLIENT_ID"],
+        client_secret=app.config["GOOGLE_CLIENT_SECRET"],
+        server_metadata_url=GOOGLE_DISCOVERY_URL,
+        client_kwargs={"scope": "openid email profile"},
+        client_cls=GoogleOAuthApp,
+    )
+    client.metadata_source = source
+    return client
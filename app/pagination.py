@@ -0,0 +1,65 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import or_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str | None) -> tuple[datetime, int] | None:
+    if not token:
+        return None
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_text, id_text = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(created_text), int(id_text)
+    except (ValueError, UnicodeDecodeError):
+        # A tampered or stale cursor just restarts from the first page.
+        return None
+
+
+class Page:
+    def __init__(self, items: list, next_cursor: str | None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+
+def paginate_desc(query, created_col, id_col, cursor: str | None, per_page: int, key=None) -> Page:
+    """Newest-first keyset page over ``(created_col, id_col)``.
+
+    ``key`` maps a result row to its ``(created_at, id)`` pair; it defaults to
+    reading ``created_at``/``id`` attributes from the row itself.
+    """
+    if key is None:
+        key = lambda row: (row.created_at, row.id)  # noqa: E731
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, row_id = position
+        # The leading bound lets the (created_at, id) index seek straight to the cursor.
+        query = query.filter(created_col <= created_at, or_(created_col < created_at, id_col < row_id))
+
+    rows = query.order_by(created_col.desc(), id_col.desc()).limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(*key(rows[-1]))
+
+    return Page(rows, next_cursor)
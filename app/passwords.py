@@ -0,0 +1,69 @@
+"""Password hashing in a bounded process pool.
+
+scrypt/PBKDF2 are CPU-bound, so hashing on the request thread stalls every
+other thread of the worker. The pool runs them in separate processes; the
+request thread just waits on the result with the GIL released.
+
+The processes are started with "forkserver" (or "spawn" where that is
+missing), never a plain fork: with FAST_BOOT the pool starts while the
+app-boot and request threads are running, and a forked child could inherit
+a lock one of them held and hang on it.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A pool created before a fork (e.g. gunicorn --preload) has no live workers in the child.
+        if _pool is None or _pool_pid != os.getpid():
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def init_password_hashing(app) -> None:
+    """Start the hashing processes at boot, so the first login does not wait for them."""
+    workers = app.config.get("PASSWORD_HASH_WORKERS", 0)
+    if workers > 0:
+        _executor(workers).submit(int).result()
+
+
+def _run(func, *args):
+    workers = current_app.config.get("PASSWORD_HASH_WORKERS", 0)
+    if workers <= 0:
+        return func(*args)
+    return _executor(workers).submit(func, *args).result()
+
+
+@lru_cache(maxsize=8)
+def _stored_prefix(method: str) -> str:
+    # Werkzeug fills in default parameters ("pbkdf2" -> "pbkdf2:sha256:600000"), so ask it.
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def hash_password(password: str, method: str | None = None) -> str:
+    return _run(generate_password_hash, password, method or current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True when ``password_hash`` was made with a different method or cost than configured."""
+    return password_hash.split("$", 1)[0] != _stored_prefix(current_app.config["PASSWORD_HASH_METHOD"])
@@ -0,0 +1,107 @@
+"""Author profile pages: a cached per-user summary and a recent-activity feed.
+
+The profile header shows post count, likes received and last activity. Each
+of these is an aggregate over one of the ``User.posts``/``comments``/``likes``
+collections, so none of them is ever loaded. One statement computes all
+three from the author indexes, and the result is kept per worker in a
+slotted ``AuthorSummary``. The blog write routes drop the summaries they
+affect; a change made elsewhere (admin deletes, buffered likes, other
+workers) shows up within AUTHOR_SUMMARY_TTL.
+"""
+
+from datetime import datetime
+from typing import NamedTuple
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from .cache import LRUCache
+from .extensions import db
+from .models import Comment, Like, Post
+
+
+class AuthorSummary:
+    __slots__ = ("post_count", "likes_received", "last_activity")
+
+    def __init__(self, post_count: int, likes_received: int, last_activity: datetime | None):
+        self.post_count = post_count
+        self.likes_received = likes_received
+        self.last_activity = last_activity
+
+
+class Activity(NamedTuple):
+    kind: str
+    created_at: datetime
+    post_id: int
+    title: str
+
+
+def init_profiles(app) -> None:
+    ttl = app.config.get("AUTHOR_SUMMARY_TTL", 300)
+    max_entries = app.config.get("AUTHOR_SUMMARY_MAX_ENTRIES", 4096)
+    app.extensions["author_summaries"] = LRUCache(max_entries, ttl) if ttl > 0 else None
+
+
+def summary_statement(user_id: int):
+    # MAX over a (user, created_at) index prefix is a single index probe.
+    last_comment = select(func.max(Comment.created_at)).where(Comment.author_id == user_id).scalar_subquery()
+    last_like = select(func.max(Like.created_at)).where(Like.user_id == user_id).scalar_subquery()
+    return select(
+        func.count(Post.id),
+        func.coalesce(func.sum(Post.like_count), 0),
+        func.max(Post.created_at),
+        last_comment,
+        last_like,
+    ).where(Post.author_id == user_id)
+
+
+def load_summary(user_id: int) -> AuthorSummary:
+    post_count, likes_received, *times = db.session.execute(summary_statement(user_id)).one()
+    times = [value for value in times if value is not None]
+    return AuthorSummary(post_count, likes_received, max(times) if times else None)
+
+
+def author_summary(user_id: int) -> AuthorSummary:
+    cache = current_app.extensions.get("author_summaries")
+    if cache is None:
+        return load_summary(user_id)
+
+    summary = cache.get(user_id)
+    if summary is None:
+        summary = load_summary(user_id)
+        cache.set(user_id, summary)
+    return summary
+
+
+def forget_summaries(*user_ids: int) -> None:
+    """Drop cached summaries after a write so the next profile view recomputes them."""
+    cache = current_app.extensions.get("author_summaries")
+    if cache is not None:
+        for user_id in set(user_ids):
+            cache.delete(user_id)
+
+
+def activity_statements(user_id: int, limit: int) -> dict:
+    """Newest comments and likes by the user, each read backwards from its author index."""
+    return {
+        "comment": select(Comment.created_at, Post.id, Post.title)
+        .join(Post, Post.id == Comment.post_id)
+        .where(Comment.author_id == user_id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(limit),
+        "like": select(Like.created_at, Post.id, Post.title)
+        .join(Post, Post.id == Like.post_id)
+        .where(Like.user_id == user_id)
+        .order_by(Like.created_at.desc(), Like.id.desc())
+        .limit(limit),
+    }
+
+
+def recent_activity(user_id: int, limit: int) -> list[Activity]:
+    items = [
+        Activity(kind, *row)
+        for kind, statement in activity_statements(user_id, limit).items()
+        for row in db.session.execute(statement)
+    ]
+    items.sort(key=lambda item: item.created_at, reverse=True)
+    return items[:limit]
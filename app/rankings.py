@@ -0,0 +1,288 @@
+"""Trending and top-this-week feeds from a materialized ranking table.
+
+A post's trending score is the sum of its likes and comments, each weighted
+by 2 ** (-age / half_life). ``post_rank.trending`` stores that sum scaled to
+a fixed epoch instead of to "now", as terms of 2 ** ((event_time - epoch) /
+half_life). The scale factor is the same for every post, so the order is
+unchanged and a new event only adds its own term. Each like or comment is
+therefore one indexed upsert, and the top 50 is a backward range scan of
+``ix_post_rank_trending``.
+
+The periodic decay pass (``refresh_rankings``) moves the epoch to now, which
+multiplies every trending score by the same factor: one UPDATE over the
+ranked posts, not a scan of the events. It also recounts the week scores,
+summed in SQL before the write transaction opens, and drops posts that went
+quiet. One worker runs it every RANKING_REFRESH_SECONDS.
+
+``flask refresh-rankings`` rebuilds every score from the events instead.
+That also corrects for removed comments and deleted users, and the import
+and seed commands run it after their bulk inserts.
+"""
+
+import logging
+import threading
+import time
+from datetime import UTC, datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import contains_eager, defer
+
+from .cache import FEED_TAG, invalidate
+from .extensions import db
+from .models import Comment, Like, Post, PostRank, RankingState, User
+
+log = logging.getLogger(__name__)
+
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+WEEK = 7 * 24 * 3600
+# Events older than this many half-lives add under 0.1% and are left out of a rebuild.
+HORIZON_HALF_LIVES = 10
+STATE_ID = 1
+RANKINGS = {"trending": PostRank.trending, "week": PostRank.week}
+
+
+def event_time(created_at: datetime) -> float:
+    # Timestamps are stored as naive UTC.
+    return created_at.replace(tzinfo=UTC).timestamp()
+
+
+def _upsert(values: dict):
+    dialect = db.engine.dialect.name
+    if dialect == "mysql":
+        statement = mysql_insert(PostRank).values(**values)
+        return statement.on_duplicate_key_update(
+            trending=PostRank.trending + statement.inserted.trending, week=PostRank.week + statement.inserted.week
+        )
+    statement = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(PostRank).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=["post_id"],
+        set_={"trending": PostRank.trending + statement.excluded.trending, "week": PostRank.week + statement.excluded.week},
+    )
+
+
+def record_activity(events) -> None:
+    """Add ``(post_id, weight, at)`` events to the rankings; a negative weight takes one back.
+
+    ``at`` is a Unix timestamp. The term is computed in SQL against the stored epoch,
+    so it stays consistent with a decay pass committed by another worker. The
+    caller commits.
+    """
+    week_start = time.time() - WEEK
+    params = [
+        {"post_id": post_id, "weight": weight, "at": at, "week": weight if at >= week_start else 0.0}
+        for post_id, weight, at in events
+    ]
+    if not params:
+        return
+
+    exponent = (
+        select((bindparam("at") - RankingState.epoch) / RankingState.half_life)
+        .where(RankingState.id == STATE_ID)
+        .scalar_subquery()
+    )
+    statement = _upsert(
+        {
+            "post_id": bindparam("post_id"),
+            # Before the first decay pass there is no epoch; the pass picks these events up.
+            "trending": func.coalesce(bindparam("weight") * func.power(2.0, exponent), 0.0),
+            "week": bindparam("week"),
+        }
+    )
+    db.session.execute(statement, params)
+
+
+def _naive(at: float) -> datetime:
+    return datetime.fromtimestamp(at, UTC).replace(tzinfo=None)
+
+
+def _event_scores(conn, half_life: float, now: float, since: float, until: float | None = None) -> dict:
+    """``{post_id: [trending, week]}`` for events in ``[since, until)``, trending relative to ``now``."""
+    week_start = now - WEEK
+    scores: dict[int, list[float]] = {}
+    for model, weight in ((Like, LIKE_WEIGHT), (Comment, COMMENT_WEIGHT)):
+        statement = select(model.post_id, model.created_at).where(model.created_at >= _naive(since))
+        if until is not None:
+            statement = statement.where(model.created_at < _naive(until))
+        for post_id, created_at in conn.execute(statement):
+            at = event_time(created_at)
+            score = scores.setdefault(post_id, [0.0, 0.0])
+            score[0] += weight * 2 ** ((at - now) / half_life)
+            if at >= week_start:
+                score[1] += weight
+    return scores
+
+
+def _week_scores(conn, since: float, until: float | None = None) -> dict:
+    """Weighted like and comment counts per post for events in ``[since, until)``, summed in SQL."""
+    scores: dict[int, float] = {}
+    for model, weight in ((Like, LIKE_WEIGHT), (Comment, COMMENT_WEIGHT)):
+        statement = select(model.post_id, func.count()).where(model.created_at >= _naive(since))
+        if until is not None:
+            statement = statement.where(model.created_at < _naive(until))
+        for post_id, count in conn.execute(statement.group_by(model.post_id)):
+            scores[post_id] = scores.get(post_id, 0.0) + weight * count
+    return scores
+
+
+def _claim(conn, now: float, half_life: float, stale_before: float | None):
+    """Take the state row (and with it the write lock); None if the pass is not due."""
+    claim = update(RankingState).where(RankingState.id == STATE_ID).values(refreshed_at=now)
+    if stale_before is not None:
+        claim = claim.where(RankingState.refreshed_at < stale_before)
+    if conn.execute(claim).rowcount == 0:
+        state = conn.execute(select(RankingState).where(RankingState.id == STATE_ID)).first()
+        if state is not None:
+            return None
+        conn.execute(insert(RankingState).values(id=STATE_ID, epoch=now, half_life=half_life, refreshed_at=now))
+    if conn.dialect.name == "postgresql":
+        # An upsert computed against the old epoch must not land on a rescaled row.
+        conn.execute(text("LOCK TABLE post_rank IN EXCLUSIVE MODE"))
+    return conn.execute(select(RankingState.epoch, RankingState.half_life).where(RankingState.id == STATE_ID)).one()
+
+
+def rebuild_rankings(conn, half_life: float, now: float | None = None, scores: dict | None = None) -> int:
+    """Recompute every score from the events and move the epoch to ``now``.
+
+    ``scores`` are ``_event_scores`` up to ``now``, read before the caller opened this
+    write transaction; without them the scan runs here. Events from ``now`` on are
+    added under the lock. Returns the number of ranked posts.
+    """
+    now = time.time() if now is None else now
+    since = now - max(HORIZON_HALF_LIVES * half_life, WEEK)
+    if scores is None:
+        scores = _event_scores(conn, half_life, now, since, now)
+    _claim(conn, now, half_life, None)
+    for post_id, (trending, week) in _event_scores(conn, half_life, now, now).items():
+        score = scores.setdefault(post_id, [0.0, 0.0])
+        score[0] += trending
+        score[1] += week
+
+    conn.execute(delete(PostRank))
+    rows = [{"post_id": post_id, "trending": trending, "week": week} for post_id, (trending, week) in scores.items()]
+    for start in range(0, len(rows), 5000):
+        conn.execute(insert(PostRank), rows[start : start + 5000])
+    conn.execute(update(RankingState).where(RankingState.id == STATE_ID).values(epoch=now, half_life=half_life))
+    return len(rows)
+
+
+def decay_rankings(conn, half_life: float, now: float, week: dict, stale_before: float | None = None) -> int | None:
+    """The periodic pass: rescale trending to a new epoch and reset the week scores.
+
+    Moving the epoch multiplies every trending score by the same factor, so it is one
+    UPDATE over the ranked posts. ``week`` holds ``_week_scores`` up to ``now``, read
+    before this write transaction; later events are added under the lock. Returns the
+    number of ranked posts, or None if the pass was not due. A changed half-life can
+    not be rescaled, so that case rebuilds instead.
+    """
+    state = _claim(conn, now, half_life, stale_before)
+    if state is None:
+        return None
+    if state.half_life != half_life:
+        return rebuild_rankings(conn, half_life, now)
+
+    factor = 2.0 ** ((state.epoch - now) / half_life)
+    conn.execute(update(PostRank).values(trending=PostRank.trending * factor, week=0.0))
+    week = dict(week)
+    for post_id, score in _week_scores(conn, now).items():
+        week[post_id] = week.get(post_id, 0.0) + score
+    params = [{"post_id": post_id, "trending": 0.0, "week": score} for post_id, score in week.items()]
+    if params:
+        conn.execute(
+            _upsert({"post_id": bindparam("post_id"), "trending": bindparam("trending"), "week": bindparam("week")}),
+            params,
+        )
+    # Posts whose activity decayed below the rebuild horizon leave the table.
+    conn.execute(
+        delete(PostRank).where(PostRank.week == 0.0, PostRank.trending < LIKE_WEIGHT * 2.0**-HORIZON_HALF_LIVES)
+    )
+    conn.execute(update(RankingState).where(RankingState.id == STATE_ID).values(epoch=now))
+    return conn.execute(select(func.count()).select_from(PostRank)).scalar()
+
+
+def _is_due(conn, stale_before: float) -> bool:
+    refreshed_at = conn.execute(select(RankingState.refreshed_at).where(RankingState.id == STATE_ID)).scalar()
+    return refreshed_at is None or refreshed_at < stale_before
+
+
+def refresh_rankings(force: bool = False) -> int | None:
+    """Run the decay pass if it is due; None if it was not. ``force`` rebuilds from the events.
+
+    The events are aggregated on a read connection first, so the write transaction,
+    which blocks likes and comments on SQLite, only holds the lock for the swap.
+    """
+    config = current_app.config
+    now = time.time()
+    half_life = config["TRENDING_HALF_LIFE_HOURS"] * 3600
+    if force:
+        with db.engine.connect() as conn:
+            scores = _event_scores(conn, half_life, now, now - max(HORIZON_HALF_LIVES * half_life, WEEK), now)
+        with db.engine.begin() as conn:
+            ranked = rebuild_rankings(conn, half_life, now, scores)
+    else:
+        stale_before = now - config["RANKING_REFRESH_SECONDS"]
+        with db.engine.connect() as conn:
+            # Skip the aggregation when another worker has just run the pass.
+            if not _is_due(conn, stale_before):
+                return None
+            week = _week_scores(conn, now - WEEK, now)
+        with db.engine.begin() as conn:
+            ranked = decay_rankings(conn, half_life, now, week, stale_before)
+    if ranked is not None:
+        invalidate(FEED_TAG)
+    return ranked
+
+
+class RankingRefresher:
+    """Starts the decay pass in the background once it is due; the state row picks one worker."""
+
+    def __init__(self, app, interval: float):
+        self.app = app
+        self.interval = interval
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _run(self) -> None:
+        with self.app.app_context():
+            try:
+                refresh_rankings()
+            except Exception:
+                log.exception("Refreshing feed rankings failed")
+
+    def maybe_refresh(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.interval
+        threading.Thread(target=self._run, name="ranking-refresh", daemon=True).start()
+
+
+def init_rankings(app) -> None:
+    app.extensions["rankings"] = RankingRefresher(app, app.config.get("RANKING_REFRESH_SECONDS", 900))
+
+
+def ranking_query(kind: str, limit: int):
+    """Posts by ``kind`` ("trending" or "week"), best first: one backward scan of its index."""
+    score = RANKINGS[kind]
+    return (
+        Post.query.join(PostRank, PostRank.post_id == Post.id)
+        .join(Post.author)
+        .filter(score > 0)
+        .options(
+            defer(Post.body),
+            defer(Post.body_html),
+            contains_eager(Post.author).load_only(User.id, User.username),
+        )
+        .order_by(score.desc(), PostRank.post_id.desc())
+        .limit(limit)
+    )
+
+
+def ranked_posts(kind: str, limit: int) -> list[Post]:
+    current_app.extensions["rankings"].maybe_refresh()
+    return ranking_query(kind, limit).all()
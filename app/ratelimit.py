@@ -0,0 +1,186 @@
+"""Token-bucket rate limits for the login, register, comment and like endpoints.
+
+Each rule in Config reads "<requests>/<period>", e.g. "10/minute". A client's
+bucket holds up to that many tokens and refills at the same average rate, so
+it can burst the full amount and then keep going at the refill rate. A POST
+that finds the bucket empty gets a 429 with Retry-After. The check runs
+before the view body, so a throttled request costs no SQL and no password
+hashing.
+
+Buckets are keyed on the logged-in user id, read straight from the session
+cookie so no user is loaded. Anonymous clients are keyed on their IP, which
+ProxyFix resolves when TRUST_PROXY_HEADERS is on.
+
+Backends follow the response cache: "memory" keeps per-worker buckets,
+"sqlite" shares them through a small file, so a client cannot multiply its
+allowance by the worker count. "none" turns limiting off.
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import NamedTuple
+
+from flask import current_app, request, session
+from werkzeug.exceptions import TooManyRequests
+
+from .sqlite_store import SQLiteStore
+
+log = logging.getLogger(__name__)
+
+RULES = ("login", "register", "comment", "like")
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Rule(NamedTuple):
+    capacity: float
+    rate: float  # tokens refilled per second
+
+
+def parse_rule(text: str | None) -> Rule | None:
+    """``"10/minute"`` -> Rule(10, 10/60); an empty value means no limit."""
+    if not text:
+        return None
+    count, _, period = text.partition("/")
+    try:
+        requests = int(count)
+        seconds = PERIODS[period.strip().lower()]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate limit {text!r}; expected e.g. '10/minute'") from None
+    if requests <= 0:
+        raise ValueError(f"Invalid rate limit {text!r}; the request count must be positive")
+    return Rule(float(requests), requests / seconds)
+
+
+def take_token(tokens: float, updated: float, now: float, rule: Rule) -> tuple[float, float, float]:
+    """Refill the bucket up to ``now`` and take one token.
+
+    Returns ``(tokens left, seconds until a token is free or 0.0 if this request
+    may pass, time the bucket is full again)``. A full bucket is the same as no
+    bucket, so backends may forget one after that time.
+    """
+    tokens = min(rule.capacity, tokens + (now - updated) * rule.rate)
+    wait = 0.0
+    if tokens >= 1:
+        tokens -= 1
+    else:
+        wait = (1 - tokens) / rule.rate
+    return tokens, wait, now + (rule.capacity - tokens) / rule.rate
+
+
+class MemoryBackend:
+    """Per-process buckets; each gunicorn worker enforces the limit on its own share of traffic."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: dict[str, tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, rule: Rule, now: float) -> float:
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (rule.capacity, now, now))
+            tokens, wait, full_at = take_token(tokens, updated, now, rule)
+            self._buckets[key] = (tokens, now, full_at)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now: float) -> None:
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        # Still too many busy clients: forget the least recently created buckets.
+        while len(self._buckets) > self.max_keys:
+            del self._buckets[next(iter(self._buckets))]
+
+
+class SQLiteBackend:
+    """Buckets shared by every worker on the host through a small SQLite file."""
+
+    def __init__(self, path: str):
+        self._store = SQLiteStore(
+            path,
+            "CREATE TABLE IF NOT EXISTS bucket ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_bucket_full_at ON bucket (full_at)",
+        )
+
+    def hit(self, key: str, rule: Rule, now: float) -> float:
+        # Two workers cannot spend the same token: the transaction takes the write lock before reading.
+        with self._store.transaction() as conn:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (rule.capacity, now)
+            tokens, wait, full_at = take_token(tokens, updated, now, rule)
+            conn.execute(
+                "INSERT OR REPLACE INTO bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, full_at),
+            )
+            conn.execute("DELETE FROM bucket WHERE full_at <= ?", (now,))
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, backend, rules: dict[str, Rule | None]):
+        self.backend = backend
+        self.rules = rules
+
+    def check(self, name: str, client: str) -> float:
+        """Spend one of ``client``'s tokens for ``name``; returns seconds to wait, 0.0 if allowed."""
+        rule = self.rules.get(name)
+        if rule is None:
+            return 0.0
+        try:
+            return self.backend.hit(f"{name}:{client}", rule, time.time())
+        except sqlite3.Error:
+            # A stuck limiter file must not take the site down with it.
+            log.warning("Rate limit check for %s failed; letting the request through", name, exc_info=True)
+            return 0.0
+
+
+def init_rate_limits(app) -> None:
+    kind = app.config.get("RATE_LIMIT_BACKEND", "memory")
+    if kind == "memory":
+        backend = MemoryBackend(app.config.get("RATE_LIMIT_MAX_KEYS", 100_000))
+    elif kind == "sqlite":
+        backend = SQLiteBackend(app.config["RATE_LIMIT_PATH"])
+    elif kind in ("", "none"):
+        backend = None
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {kind}")
+
+    rules = {name: parse_rule(app.config.get(f"RATE_LIMIT_{name.upper()}")) for name in RULES}
+    app.extensions["rate_limiter"] = RateLimiter(backend, rules) if backend is not None else None
+
+
+def _client_key() -> str:
+    # Flask-Login keeps the id in the session; reading it does not load the user.
+    user_id = session.get("_user_id")
+    return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+
+def _throttled(wait: float):
+    retry_after = max(1, math.ceil(wait))
+    message = f"Too many requests. Try again in {retry_after} second{'s' if retry_after != 1 else ''}."
+    if request.is_json:
+        return {"error": message}, 429, {"Retry-After": str(retry_after)}
+    raise TooManyRequests(message, retry_after=retry_after)
+
+
+def rate_limit(name: str):
+    """Throttle POSTs to the view with the ``name`` rule; place it above ``login_required``."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            limiter = current_app.extensions.get("rate_limiter")
+            if limiter is not None and request.method == "POST":
+                wait = limiter.check(name, _client_key())
+                if wait:
+                    return _throttled(wait)
+            return view(**kwargs)
+
+        return wrapper
+
+    return decorator
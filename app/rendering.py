@@ -0,0 +1,57 @@
+"""Post bodies rendered once on write instead of on every page view.
+
+``render_post`` turns a body into the HTML shown on the detail page and a
+short plain-text excerpt for the feed, and both are stored on ``Post``.
+Bodies are plain text with line breaks by default. With POST_MARKDOWN=true
+and ``markdown-it-py`` installed they are CommonMark instead; raw HTML in
+the source is escaped either way.
+"""
+
+import html
+import re
+
+from flask import current_app, has_app_context
+from markupsafe import escape
+
+try:
+    from markdown_it import MarkdownIt
+except ImportError:  # optional dependency
+    MarkdownIt = None
+
+EXCERPT_LENGTH = 250
+_BREAK_TAG_RE = re.compile(r"<(?:br|/p|/li|/h\d|/blockquote|/pre|hr)\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _plain_html(body: str) -> str:
+    return str(escape(body)).replace("\n", "<br>")
+
+
+def plain_text(body_html: str) -> str:
+    """Visible text of rendered HTML on one line."""
+    text = _TAG_RE.sub("", _BREAK_TAG_RE.sub(" ", body_html))
+    return _SPACE_RE.sub(" ", html.unescape(text)).strip()
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    if len(text) <= length:
+        return text
+    return text[:length].rstrip() + "..."
+
+
+def init_rendering(app) -> None:
+    renderer = None
+    if app.config.get("POST_MARKDOWN", False):
+        if MarkdownIt is None:
+            raise RuntimeError("POST_MARKDOWN=true needs the markdown-it-py package.")
+        # "js-default" is CommonMark with raw HTML disabled, so <script> in a post stays text.
+        renderer = MarkdownIt("js-default")
+    app.extensions["markdown"] = renderer
+
+
+def render_post(body: str) -> tuple[str, str]:
+    """Return ``(body_html, excerpt)`` for a post body."""
+    renderer = current_app.extensions.get("markdown") if has_app_context() else None
+    body_html = renderer.render(body) if renderer is not None else _plain_html(body)
+    return body_html, make_excerpt(plain_text(body_html))
@@ -0,0 +1,398 @@
+"""Full-text search over posts and comments.
+
+On SQLite the index is an FTS5 table; elsewhere (or with SEARCH_BACKEND=memory)
+it is an in-process inverted index built from the database on first use.
+Both rank with BM25 (titles weigh double) and page with an opaque
+``(rank, rowid)`` cursor.
+
+Each document's rowid encodes its kind, ``id * 2`` for posts and
+``id * 2 + 1`` for comments, so an update or delete touches one row by
+primary key instead of scanning the index.
+
+The in-process index follows the database through a change log. Every
+write bumps the ``search_version`` counter and records the rowids it
+touched under the new version in ``search_change``, in the same
+transaction. The counter row stays locked until commit, so versions commit
+in order. Before searching, a worker reads the counter and re-reads just
+the documents changed since the version it holds. It loads everything
+again only when that gap reaches back past the SEARCH_CHANGE_LOG_SIZE
+versions the log keeps, or after ``rebuild_index``.
+"""
+
+import base64
+import html
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+from flask import current_app
+from sqlalchemy import literal, select, text
+
+from .extensions import db
+from .models import Comment, Post
+from .pagination import Page
+
+FTS_TABLE = "search_index"
+VERSION_TABLE = "search_version"
+CHANGE_TABLE = "search_change"
+BM25 = f"bm25({FTS_TABLE}, 2.0, 1.0)"
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class SearchHit(NamedTuple):
+    kind: str
+    post_id: int
+    title: str
+    snippet: str
+
+
+def post_rowid(post_id: int) -> int:
+    return post_id * 2
+
+
+def comment_rowid(comment_id: int) -> int:
+    return comment_id * 2 + 1
+
+
+def tokenize(value: str) -> list[str]:
+    return _TOKEN_RE.findall(value.lower())
+
+
+def encode_rank_cursor(rank: float, rowid: int) -> str:
+    return base64.urlsafe_b64encode(f"{rank!r}|{rowid}".encode()).decode().rstrip("=")
+
+
+def decode_rank_cursor(token: str | None) -> tuple[float, int] | None:
+    if not token:
+        return None
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        rank_text, rowid_text = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return float(rank_text), int(rowid_text)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _marked_html(snippet: str) -> str:
+    # Escape the user's text first, then turn the match markers into <mark> tags.
+    return html.escape(snippet).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def create_fts_table(conn) -> None:
+    conn.execute(
+        text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, body, tokenize='porter unicode61')")
+    )
+
+
+def fill_fts_table(conn, batch_size: int = 5000) -> None:
+    """(Re)load every post and comment into the FTS table in id-range batches."""
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    for table, offset, title in (("post", 0, "title"), ("comment", 1, "''")):
+        max_id = conn.execute(text(f"SELECT MAX(id) FROM {table}")).scalar() or 0
+        for first_id in range(1, max_id + 1, batch_size):
+            conn.execute(
+                text(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, body) "
+                    f"SELECT id * 2 + {offset}, {title}, body FROM {table} WHERE id BETWEEN :first AND :last"
+                ),
+                {"first": first_id, "last": first_id + batch_size - 1},
+            )
+
+
+def create_version_table(conn) -> None:
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"))
+    if conn.execute(text(f"SELECT COUNT(*) FROM {VERSION_TABLE}")).scalar() == 0:
+        conn.execute(text(f"INSERT INTO {VERSION_TABLE} (id, version) VALUES (1, 0)"))
+
+
+def _read_version() -> int:
+    return db.session.execute(text(f"SELECT version FROM {VERSION_TABLE} WHERE id = 1")).scalar()
+
+
+def create_change_table(conn) -> None:
+    # rowids is a comma-separated list; NULL marks a rebuild, which every worker reloads for.
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} (version INTEGER PRIMARY KEY, rowids TEXT)"))
+
+
+def _bump_version() -> int:
+    # The UPDATE locks the row until commit, so the SELECT sees this transaction's own value.
+    db.session.execute(text(f"UPDATE {VERSION_TABLE} SET version = version + 1 WHERE id = 1"))
+    return _read_version()
+
+
+def _log_change(rowids: list[int] | None, keep: int) -> None:
+    version = _bump_version()
+    db.session.execute(
+        text(f"INSERT INTO {CHANGE_TABLE} (version, rowids) VALUES (:version, :rowids)"),
+        {"version": version, "rowids": None if rowids is None else ",".join(map(str, rowids))},
+    )
+    if version % 100 == 0:
+        db.session.execute(text(f"DELETE FROM {CHANGE_TABLE} WHERE version <= :old"), {"old": version - keep})
+
+
+def _hits(rows) -> list[SearchHit]:
+    """Turn ``(rowid, snippet_html)`` pairs into hits, loading titles in two queries."""
+    post_ids = [rowid // 2 for rowid, _ in rows if rowid % 2 == 0]
+    comment_ids = [rowid // 2 for rowid, _ in rows if rowid % 2 == 1]
+    comment_posts = dict(
+        db.session.execute(select(Comment.id, Comment.post_id).where(Comment.id.in_(comment_ids))).all()
+    )
+    titles = dict(
+        db.session.execute(
+            select(Post.id, Post.title).where(Post.id.in_(set(post_ids) | set(comment_posts.values())))
+        ).all()
+    )
+
+    hits = []
+    for rowid, snippet in rows:
+        if rowid % 2 == 0:
+            post_id, kind = rowid // 2, "post"
+        else:
+            post_id, kind = comment_posts.get(rowid // 2), "comment"
+        if post_id in titles:
+            hits.append(SearchHit(kind, post_id, titles[post_id], snippet))
+    return hits
+
+
+class FTSBackend:
+    def index(self, rowid: int, title: str, body: str) -> None:
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": rowid})
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (:rowid, :title, :body)"),
+            {"rowid": rowid, "title": title, "body": body},
+        )
+
+    def remove(self, rowids: list[int]) -> None:
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start : start + 500]
+            db.session.execute(
+                text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(str(int(r)) for r in chunk)})")
+            )
+
+    def search(self, terms: list[str], after: tuple[float, int] | None, limit: int) -> list[tuple]:
+        params = {"match": " ".join(f'"{term}"' for term in terms), "limit": limit}
+        where = f"{FTS_TABLE} MATCH :match"
+        if after is not None:
+            where += f" AND ({BM25} > :rank OR ({BM25} = :rank AND rowid > :rowid))"
+            params.update(rank=after[0], rowid=after[1])
+
+        return db.session.execute(
+            text(
+                f"SELECT rowid, {BM25} AS score, "
+                f"snippet({FTS_TABLE}, 1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', 16) AS snippet "
+                f"FROM {FTS_TABLE} WHERE {where} ORDER BY score, rowid LIMIT :limit"
+            ),
+            params,
+        ).all()
+
+    def rebuild(self, batch_size: int) -> None:
+        fill_fts_table(db.session.connection(), batch_size)
+
+
+class MemoryIndexBackend:
+    """BM25 over an in-process inverted index; each worker keeps its own copy.
+
+    ``index``/``remove`` only write to the change log; the documents are read
+    back from the database once the change is committed.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, log_size: int = 10_000):
+        self.log_size = log_size
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._version: int | None = None
+        self._docs: dict[int, tuple[str, str, int]] = {}
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._total_length = 0
+
+    def _add(self, rowid: int, title: str, body: str) -> None:
+        self._drop(rowid)
+        # Title tokens count twice, matching the FTS5 column weights.
+        counts = Counter(tokenize(title) * 2 + tokenize(body))
+        length = sum(counts.values())
+        self._docs[rowid] = (title, body, length)
+        self._total_length += length
+        for term, count in counts.items():
+            self._postings[term][rowid] = count
+
+    def _drop(self, rowid: int) -> None:
+        doc = self._docs.pop(rowid, None)
+        if doc is None:
+            return
+        self._total_length -= doc[2]
+        for term in set(tokenize(doc[0]) + tokenize(doc[1])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(rowid, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _reset(self) -> None:
+        self._docs.clear()
+        self._postings.clear()
+        self._total_length = 0
+        self._loaded = False
+
+    def _load(self, version: int, batch_size: int = 5000) -> None:
+        self._reset()
+        self._version = version
+        posts = select(Post.id, Post.title, Post.body).execution_options(yield_per=batch_size)
+        for row in db.session.execute(posts):
+            self._add(post_rowid(row.id), row.title, row.body)
+        comments = select(Comment.id, Comment.body).execution_options(yield_per=batch_size)
+        for row in db.session.execute(comments):
+            self._add(comment_rowid(row.id), "", row.body)
+        self._loaded = True
+
+    def _changed_rowids(self, version: int) -> set[int] | None:
+        """Rowids changed after the loaded version, or None if the log cannot say."""
+        entries = db.session.execute(
+            text(f"SELECT rowids FROM {CHANGE_TABLE} WHERE version > :loaded AND version <= :version"),
+            {"loaded": self._version, "version": version},
+        ).scalars().all()
+        if len(entries) != version - self._version or None in entries:
+            return None
+        return {int(rowid) for entry in entries for rowid in entry.split(",") if rowid}
+
+    def _refresh(self, rowids: set[int]) -> None:
+        """Re-read the given documents; ones no longer in the database leave the index."""
+        sources = (
+            (0, post_rowid, lambda ids: select(Post.id, Post.title, Post.body).where(Post.id.in_(ids))),
+            (1, comment_rowid, lambda ids: select(Comment.id, literal(""), Comment.body).where(Comment.id.in_(ids))),
+        )
+        for parity, to_rowid, statement in sources:
+            ids = sorted(rowid // 2 for rowid in rowids if rowid % 2 == parity)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                found = {row[0]: row for row in db.session.execute(statement(chunk))}
+                for item_id in chunk:
+                    if item_id in found:
+                        self._add(to_rowid(item_id), found[item_id][1], found[item_id][2])
+                    else:
+                        self._drop(to_rowid(item_id))
+
+    def _ensure_current(self) -> None:
+        # Read first: a change committed during the load below is replayed again next time.
+        version = _read_version()
+        if self._loaded and version == self._version:
+            return
+        rowids = self._changed_rowids(version) if self._loaded else None
+        if rowids is None:
+            self._load(version)
+        else:
+            self._refresh(rowids)
+            self._version = version
+
+    def index(self, rowid: int, title: str, body: str) -> None:
+        _log_change([rowid], self.log_size)
+
+    def remove(self, rowids: list[int]) -> None:
+        _log_change(rowids, self.log_size)
+
+    def _snippet(self, body: str, terms: set[str], width: int = 16) -> str:
+        words = body.split()
+        positions = [i for i, word in enumerate(words) if set(tokenize(word)) & terms]
+        start = max(0, positions[0] - width // 2) if positions else 0
+        window = words[start : start + width]
+        marked = [
+            f"{_MARK_OPEN}{word}{_MARK_CLOSE}" if set(tokenize(word)) & terms else word for word in window
+        ]
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if start + width < len(words) else ""
+        return prefix + " ".join(marked) + suffix
+
+    def search(self, terms: list[str], after: tuple[float, int] | None, limit: int) -> list[tuple]:
+        with self._lock:
+            self._ensure_current()
+            if not self._docs:
+                return []
+
+            # Every term must match, like the implicit AND of an FTS5 query.
+            candidates = None
+            for term in terms:
+                rowids = set(self._postings.get(term, ()))
+                candidates = rowids if candidates is None else candidates & rowids
+            average = self._total_length / len(self._docs)
+            ranked = []
+            for rowid in candidates or ():
+                length = self._docs[rowid][2]
+                score = 0.0
+                for term in terms:
+                    postings = self._postings[term]
+                    idf = math.log(1 + (len(self._docs) - len(postings) + 0.5) / (len(postings) + 0.5))
+                    tf = postings[rowid]
+                    score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average))
+                # Lower is better, as with FTS5's bm25().
+                ranked.append((-score, rowid))
+            ranked.sort()
+            if after is not None:
+                ranked = [entry for entry in ranked if entry > after]
+
+            term_set = set(terms)
+            return [
+                (rowid, rank, self._snippet(self._docs[rowid][1], term_set)) for rank, rowid in ranked[:limit]
+            ]
+
+    def rebuild(self, batch_size: int) -> None:
+        # After the caller commits, every worker sees the rebuild marker and reloads its copy.
+        _log_change(None, self.log_size)
+        with self._lock:
+            self._reset()
+
+
+def init_search(app) -> None:
+    kind = app.config.get("SEARCH_BACKEND", "auto")
+    if kind == "auto":
+        with app.app_context():
+            kind = "fts5" if db.engine.dialect.name == "sqlite" else "memory"
+
+    if kind == "fts5":
+        backend = FTSBackend()
+    elif kind == "memory":
+        backend = MemoryIndexBackend(app.config.get("SEARCH_CHANGE_LOG_SIZE", 10_000))
+    else:
+        raise ValueError(f"Unknown SEARCH_BACKEND: {kind}")
+    app.extensions["search"] = backend
+
+
+def _backend():
+    return current_app.extensions["search"]
+
+
+def index_post(post: Post) -> None:
+    _backend().index(post_rowid(post.id), post.title, post.body)
+
+
+def index_comment(comment: Comment) -> None:
+    _backend().index(comment_rowid(comment.id), "", comment.body)
+
+
+def remove_documents(post_ids=(), comment_ids=()) -> None:
+    rowids = [post_rowid(i) for i in post_ids] + [comment_rowid(i) for i in comment_ids]
+    if rowids:
+        _backend().remove(rowids)
+
+
+def rebuild_index(batch_size: int = 5000) -> None:
+    _backend().rebuild(batch_size)
+
+
+def search(query: str, cursor: str | None, per_page: int) -> Page:
+    terms = tokenize(query)
+    if not terms:
+        return Page([], None)
+
+    rows = _backend().search(terms, decode_rank_cursor(cursor), per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_rank_cursor(rows[-1][1], rows[-1][0])
+
+    return Page(_hits([(rowid, _marked_html(snippet)) for rowid, _, snippet in rows]), next_cursor)
@@ -0,0 +1,43 @@
+"""A small SQLite file shared by every worker on the host.
+
+The response cache and the rate limiter keep their "sqlite" backends here:
+one connection per thread in autocommit mode, WAL so readers never wait on
+the writer, and ``synchronous=NORMAL`` since the data is cheap to lose.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteStore:
+    def __init__(self, path: str, *schema: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connect()
+        for statement in schema:
+            conn.execute(statement)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        return self.connect().execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write lock from the first read, so a read-modify-write cannot interleave."""
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
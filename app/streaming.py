@@ -0,0 +1,46 @@
+"""Streamed page rendering for the feed, post pages and admin lists.
+
+With STREAM_PAGES=true, ``render_page`` sends the template as it renders,
+in chunks of about STREAM_CHUNK_SIZE characters, instead of building the
+whole page as one string. The first byte then goes out as soon as the page
+head is rendered, and a request holds one chunk in memory, not the whole
+page. The view's queries still run before streaming starts. A template that
+lazy-loads rows is the only thing that queries mid-stream.
+
+The headers, and the session cookie with them, are sent before the body is
+rendered. So everything the templates would store in the session is done
+up front: popping flashed messages, issuing the CSRF token and loading the
+current user.
+"""
+
+from flask import Response, current_app, get_flashed_messages, render_template, stream_template
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+STREAM_CHUNK_SIZE = 8 * 1024
+
+
+def _chunks(parts, size: int):
+    try:
+        buffer, buffered = [], 0
+        for part in parts:
+            buffer.append(part)
+            buffered += len(part)
+            if buffered >= size:
+                yield "".join(buffer)
+                buffer, buffered = [], 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        parts.close()
+
+
+def render_page(template_name: str, **context):
+    if not current_app.config.get("STREAM_PAGES", False):
+        return render_template(template_name, **context)
+
+    get_flashed_messages(with_categories=True)
+    generate_csrf()
+    current_user.is_authenticated  # noqa: B018 - loads the user, maybe from the remember cookie
+    parts = stream_template(template_name, **context)
+    return Response(_chunks(parts, STREAM_CHUNK_SIZE), mimetype="text/html")
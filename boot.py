@@ -0,0 +1,47 @@
+"""Fast-boot WSGI entry point.
+
+With FAST_BOOT=true, ``wsgi.py`` serves a ``LazyApp`` instead of the Flask
+app. A gunicorn worker then comes up without importing Flask, SQLAlchemy
+or the blueprints; ``create_app`` runs in a background thread while
+``/healthz`` already answers. Other requests wait until the app is
+built. Don't combine it with ``gunicorn --preload``, which would start
+the thread in the master process instead of the workers.
+"""
+
+import threading
+
+
+def create_app():
+    # Imported here so loading this module does not pull in Flask.
+    from app import create_app as factory
+
+    return factory()
+
+
+class LazyApp:
+    def __init__(self, healthz_path: str = "/healthz"):
+        self.healthz_path = healthz_path
+        self._app = None
+        self._error: BaseException | None = None
+        self._ready = threading.Event()
+        threading.Thread(target=self._build, name="app-boot", daemon=True).start()
+
+    def _build(self) -> None:
+        try:
+            self._app = create_app()
+        except BaseException as exc:
+            self._error = exc
+            raise
+        finally:
+            self._ready.set()
+
+    def __call__(self, environ, start_response):
+        if not self._ready.is_set() and environ.get("PATH_INFO") == self.healthz_path:
+            body = b'{"status": "starting"}'
+            start_response("200 OK", [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+            return [body]
+
+        self._ready.wait()
+        if self._error is not None:
+            raise RuntimeError("create_app() failed; see the app-boot thread's traceback") from self._error
+        return self._app(environ, start_response)
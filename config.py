@@ -15,6 +15,12 @@ def _as_bool(value: str | None, default: bool = False) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _as_int(value: str | None, default: int) -> int:
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+
 def _database_uri() -> str:
     raw = os.getenv("DATABASE_URL")
     if not raw:
@@ -41,9 +47,102 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-change-this-secret")
     SQLALCHEMY_DATABASE_URI = _database_uri()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool options are derived from the URI in create_app; anything set here overrides them.
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # One pooled connection per gunicorn thread plus headroom; SQLite connections are cheap to keep open.
+    SQLITE_POOL_SIZE = _as_int(os.getenv("SQLITE_POOL_SIZE"), default=5)
+    SQLITE_POOL_OVERFLOW = _as_int(os.getenv("SQLITE_POOL_OVERFLOW"), default=5)
+
+    # Applied to every new SQLite connection; SQLITE_TUNING=false keeps SQLite's defaults.
+    SQLITE_TUNING = _as_bool(os.getenv("SQLITE_TUNING"), default=True)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = _as_int(os.getenv("SQLITE_BUSY_TIMEOUT_MS"), default=5000)
+    SQLITE_MMAP_SIZE = _as_int(os.getenv("SQLITE_MMAP_SIZE"), default=256 * 1024 * 1024)
+    # Negative values are KiB, so this is 64 MiB of page cache per connection.
+    SQLITE_CACHE_SIZE = _as_int(os.getenv("SQLITE_CACHE_SIZE"), default=-64 * 1024)
 
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+    # Google's discovery document and signing keys, shared by all workers and refreshed after the TTL.
+    OIDC_CACHE_PATH = os.getenv("OIDC_CACHE_PATH", str(INSTANCE_DIR / "google_oidc.json"))
+    OIDC_CACHE_TTL = _as_int(os.getenv("OIDC_CACHE_TTL"), default=6 * 3600)
+    # A file with the same layout as the cache, used as-is and never fetched (offline tests).
+    OIDC_METADATA_FILE = os.getenv("OIDC_METADATA_FILE")
+    OIDC_HTTP_TIMEOUT = _as_int(os.getenv("OIDC_HTTP_TIMEOUT"), default=10)
 
     TRUST_PROXY_HEADERS = _as_bool(os.getenv("TRUST_PROXY_HEADERS"), default=True)
     AUTO_CREATE_DB = _as_bool(os.getenv("AUTO_CREATE_DB"), default=True)
+    # wsgi.py (gunicorn wsgi:app) answers /healthz at once and builds the app in a background thread.
+    FAST_BOOT = _as_bool(os.getenv("FAST_BOOT"), default=False)
+
+    # Any werkzeug method string; stored hashes made with other settings are upgraded at next login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # Processes used for hashing; 0 hashes on the request thread.
+    PASSWORD_HASH_WORKERS = _as_int(os.getenv("PASSWORD_HASH_WORKERS"), default=2)
+
+    # Queue likes per worker and write them in one transaction every LIKE_BUFFER_FLUSH_MS.
+    LIKE_BUFFER = _as_bool(os.getenv("LIKE_BUFFER"), default=False)
+    LIKE_BUFFER_FLUSH_MS = _as_int(os.getenv("LIKE_BUFFER_FLUSH_MS"), default=200)
+    LIKE_BUFFER_MAX_PENDING = _as_int(os.getenv("LIKE_BUFFER_MAX_PENDING"), default=5000)
+
+    # Server-Timing headers, per-request JSON logs on "bloxy.perf" and /metrics.
+    INSTRUMENTATION = _as_bool(os.getenv("INSTRUMENTATION"), default=False)
+    # /metrics is only served when this is set, to scrapers sending "Authorization: Bearer <token>".
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+    # gzip/Brotli for dynamic text responses; often left to a proxy that already compresses.
+    RESPONSE_COMPRESSION = _as_bool(os.getenv("RESPONSE_COMPRESSION"), default=False)
+    COMPRESSION_MIN_SIZE = _as_int(os.getenv("COMPRESSION_MIN_SIZE"), default=1024)
+    COMPRESSION_GZIP_LEVEL = _as_int(os.getenv("COMPRESSION_GZIP_LEVEL"), default=6)
+    COMPRESSION_BROTLI_QUALITY = _as_int(os.getenv("COMPRESSION_BROTLI_QUALITY"), default=4)
+    # Stream the feed, post pages and admin lists while they render instead of building one string.
+    STREAM_PAGES = _as_bool(os.getenv("STREAM_PAGES"), default=False)
+
+    # Serve the hashed, precompressed files from `flask build-assets` when its manifest exists.
+    STATIC_ASSET_MANIFEST = _as_bool(os.getenv("STATIC_ASSET_MANIFEST"), default=True)
+
+    # Render post bodies as CommonMark (needs markdown-it-py); run `flask render-posts` after changing it.
+    POST_MARKDOWN = _as_bool(os.getenv("POST_MARKDOWN"), default=False)
+
+    FEED_PAGE_SIZE = _as_int(os.getenv("FEED_PAGE_SIZE"), default=20)
+    COMMENTS_PAGE_SIZE = _as_int(os.getenv("COMMENTS_PAGE_SIZE"), default=20)
+    SEARCH_PAGE_SIZE = _as_int(os.getenv("SEARCH_PAGE_SIZE"), default=20)
+    API_PAGE_SIZE = _as_int(os.getenv("API_PAGE_SIZE"), default=50)
+    API_MAX_PAGE_SIZE = _as_int(os.getenv("API_MAX_PAGE_SIZE"), default=200)
+    ADMIN_PAGE_SIZE = _as_int(os.getenv("ADMIN_PAGE_SIZE"), default=50)
+    PROFILE_ACTIVITY_SIZE = _as_int(os.getenv("PROFILE_ACTIVITY_SIZE"), default=10)
+    RANKING_SIZE = _as_int(os.getenv("RANKING_SIZE"), default=50)
+    # Likes and comments lose half their weight in the trending feed every half-life.
+    TRENDING_HALF_LIFE_HOURS = _as_int(os.getenv("TRENDING_HALF_LIFE_HOURS"), default=24)
+    # How often one worker runs the ranking decay pass, rescaling scores and expiring the week.
+    RANKING_REFRESH_SECONDS = _as_int(os.getenv("RANKING_REFRESH_SECONDS"), default=900)
+    # Rows removed per transaction when deleting users and posts, so other writers get a turn.
+    DELETE_BATCH_SIZE = _as_int(os.getenv("DELETE_BATCH_SIZE"), default=500)
+    # "auto" uses SQLite FTS5 on SQLite and an in-process index elsewhere; "fts5" or "memory" force one.
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").strip().lower()
+    # Versions of search changes kept for the in-process index to catch up from before it reloads everything.
+    SEARCH_CHANGE_LOG_SIZE = _as_int(os.getenv("SEARCH_CHANGE_LOG_SIZE"), default=10_000)
+
+    # Anonymous page cache: "memory" (per worker), "sqlite" (shared by all workers on the host) or "none".
+    RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "memory").strip().lower()
+    RESPONSE_CACHE_TTL = _as_int(os.getenv("RESPONSE_CACHE_TTL"), default=60)
+    RESPONSE_CACHE_MAX_ENTRIES = _as_int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES"), default=512)
+    RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", str(INSTANCE_DIR / "response_cache.db"))
+
+    # Per-worker cache of logged-in users; a role change reaches other workers within the TTL.
+    USER_CACHE_TTL = _as_int(os.getenv("USER_CACHE_TTL"), default=30)
+    USER_CACHE_MAX_ENTRIES = _as_int(os.getenv("USER_CACHE_MAX_ENTRIES"), default=1024)
+    # Token buckets per client for form and like POSTs: "memory" (per worker), "sqlite" (shared) or "none".
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", str(INSTANCE_DIR / "rate_limit.db"))
+    RATE_LIMIT_MAX_KEYS = _as_int(os.getenv("RATE_LIMIT_MAX_KEYS"), default=100_000)
+    # "<requests>/<second|minute|hour|day>" per IP (anonymous) or user; empty disables a rule.
+    RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/minute")
+    RATE_LIMIT_REGISTER = os.getenv("RATE_LIMIT_REGISTER", "10/hour")
+    RATE_LIMIT_COMMENT = os.getenv("RATE_LIMIT_COMMENT", "10/minute")
+    RATE_LIMIT_LIKE = os.getenv("RATE_LIMIT_LIKE", "60/minute")
+
+    # Per-worker cache of author profile summaries; 0 computes them on every view.
+    AUTHOR_SUMMARY_TTL = _as_int(os.getenv("AUTHOR_SUMMARY_TTL"), default=300)
+    AUTHOR_SUMMARY_MAX_ENTRIES = _as_int(os.getenv("AUTHOR_SUMMARY_MAX_ENTRIES"), default=4096)
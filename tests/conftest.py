@@ -0,0 +1,53 @@
+import pytest
+
+from app import create_app
+from app.extensions import db
+from app.migrations import upgrade_schema
+from config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on one throwaway SQLite file, with the schema a deploy would have."""
+    apps = []
+
+    def make(**settings):
+        uri = f"sqlite:///{(tmp_path / 'bloxy.db').as_posix()}"
+        config = type(
+            "TestConfig",
+            (Config,),
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": uri,
+                "AUTO_CREATE_DB": False,
+                "PASSWORD_HASH_WORKERS": 0,
+                "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+                "WTF_CSRF_ENABLED": False,
+                "RATE_LIMIT_BACKEND": "none",
+                **settings,
+            },
+        )
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            upgrade_schema(db.engine)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
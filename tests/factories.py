@@ -0,0 +1,32 @@
+from app.extensions import db
+from app.models import ROLE_AUTHOR, Comment, Post, User
+
+
+def make_user(username: str, role: str = ROLE_AUTHOR, password: str = "password") -> User:
+    user = User(username=username, email=f"{username}@example.com", role=role)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_post(author: User, title: str = "A post", body: str = "Some body text") -> Post:
+    post = Post(title=title, body=body, author_id=author.id)
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def make_comment(author: User, post: Post, body: str = "A comment") -> Comment:
+    comment = Comment(body=body, author_id=author.id, post_id=post.id)
+    db.session.add(comment)
+    post.comment_count = Post.comment_count + 1
+    db.session.commit()
+    return comment
+
+
+def log_in(client, user_id: int) -> None:
+    # Flask-Login reads the id from the session, so no login form round trip is needed.
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
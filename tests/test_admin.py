@@ -0,0 +1,67 @@
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import ROLE_ADMIN, ROLE_USER, Post, User
+
+from .factories import log_in, make_post, make_user
+
+
+def _admin_client(app) -> tuple:
+    with app.app_context():
+        admin_id = make_user("admin", role=ROLE_ADMIN).id
+        user_ids = [make_user(f"member{number}", role=ROLE_USER).id for number in range(5)]
+    client = app.test_client()
+    log_in(client, admin_id)
+    return client, admin_id, user_ids
+
+
+def test_user_console_pages_and_filters(make_app):
+    app = make_app(ADMIN_PAGE_SIZE=2)
+    client, _, _ = _admin_client(app)
+
+    seen, url = [], "/admin/users"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        html = response.get_data(as_text=True)
+        seen += [f"member{number}" for number in range(5) if f">member{number}<" in html]
+        marker = html.find('href="/admin/users?cursor=')
+        url = html[marker + 6 : html.index('"', marker + 6)].replace("&amp;", "&") if marker != -1 else None
+    assert sorted(seen) == [f"member{number}" for number in range(5)]
+
+    filtered = client.get("/admin/users?q=admin").get_data(as_text=True)
+    assert ">admin<" in filtered and ">member0<" not in filtered
+
+
+def test_bulk_role_change_spares_the_acting_admin(make_app):
+    app = make_app()
+    client, admin_id, user_ids = _admin_client(app)
+
+    client.post("/admin/users/bulk-role", data={"ids": [admin_id, *user_ids[:2]], "role": ROLE_USER})
+    with app.app_context():
+        roles = dict(db.session.execute(select(User.id, User.role)).all())
+    assert roles[admin_id] == ROLE_ADMIN
+    assert [roles[user_id] for user_id in user_ids[:2]] == [ROLE_USER, ROLE_USER]
+
+
+def test_bulk_delete_removes_posts_and_users(make_app):
+    app = make_app()
+    client, _, user_ids = _admin_client(app)
+    with app.app_context():
+        post_id = make_post(db.session.get(User, user_ids[0])).id
+
+    client.post("/admin/posts/bulk-delete", data={"ids": [post_id]})
+    client.post("/admin/users/bulk-delete", data={"ids": user_ids[:3]})
+    with app.app_context():
+        assert db.session.get(Post, post_id) is None
+        assert db.session.scalars(select(User.id).where(User.id.in_(user_ids))).all() == user_ids[3:]
+
+
+def test_consoles_require_an_admin(make_app):
+    app = make_app()
+    with app.app_context():
+        member_id = make_user("member", role=ROLE_USER).id
+    client = app.test_client()
+    assert client.get("/admin/users").status_code == 302
+    log_in(client, member_id)
+    assert client.get("/admin/users").status_code == 403
@@ -0,0 +1,33 @@
+import json
+import sqlite3
+
+from app.bench import seed_database
+from app.search import search
+
+
+def test_seeded_posts_and_comments_are_searchable(app):
+    seed_database(users=5, posts=20, comments=30, likes=10)
+
+    hits = search("synthetic", None, 100).items
+    assert {hit.kind for hit in hits} == {"post", "comment"}
+    assert len(hits) == 50
+
+
+def test_write_benchmarks_refuse_the_app_database(app):
+    database = app.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///")
+    for command in ("bench-delete", "bench-usernames"):
+        result = app.test_cli_runner().invoke(args=[command, "--database", database])
+        assert result.exit_code != 0
+        assert "scratch database" in result.output
+
+
+def test_username_benchmark_cleans_up_its_users(app, tmp_path):
+    scratch = tmp_path / "scratch.db"
+    args = ["bench-usernames", "--database", str(scratch), "--names", "20", "--signups", "5"]
+    result = app.test_cli_runner().invoke(args=args)
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.output)
+    assert (report["failed"], report["duplicates"]) == (0, 0)
+
+    with sqlite3.connect(scratch) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM user").fetchone() == (0,)
@@ -0,0 +1,23 @@
+from app import create_app
+from app.extensions import db
+from config import Config
+
+
+def _app(uri: str):
+    config = type("UriConfig", (Config,), {"SQLALCHEMY_DATABASE_URI": uri, "PASSWORD_HASH_WORKERS": 0})
+    return create_app(config)
+
+
+def test_in_memory_sqlite_gets_no_pool_sizes():
+    app = _app("sqlite://")
+    assert "pool_size" not in app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    with app.app_context():
+        db.create_all()
+        assert db.session.execute(db.text("SELECT 1")).scalar() == 1
+
+
+def test_file_sqlite_options_follow_the_app_uri(tmp_path):
+    app = _app(f"sqlite:///{(tmp_path / 'x.db').as_posix()}")
+    options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    assert options["pool_size"] == Config.SQLITE_POOL_SIZE
+    assert options["connect_args"]["timeout"] == Config.SQLITE_BUSY_TIMEOUT_MS / 1000
@@ -0,0 +1,37 @@
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Post
+
+from .factories import log_in, make_comment, make_post, make_user
+
+
+def test_comment_and_like_routes_update_the_counters(app, client):
+    author, reader = make_user("author"), make_user("reader")
+    post = make_post(author)
+    log_in(client, reader.id)
+
+    client.post(f"/post/{post.id}/comment", data={"body": "Nice post"})
+    client.post(f"/post/{post.id}/like")
+    db.session.expire_all()
+    post = db.session.get(Post, post.id)
+    assert (post.comment_count, post.like_count) == (1, 1)
+
+    client.post(f"/post/{post.id}/like")
+    db.session.expire_all()
+    assert db.session.get(Post, post.id).like_count == 0
+
+
+def test_recount_posts_repairs_drifted_counters(app):
+    author = make_user("author")
+    post = make_post(author)
+    make_comment(author, post)
+    make_comment(author, post)
+    db.session.execute(update(Post).values(comment_count=7, like_count=3))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["recount-posts"])
+    assert result.exit_code == 0, result.output
+    db.session.expire_all()
+    post = db.session.get(Post, post.id)
+    assert (post.comment_count, post.like_count) == (2, 0)
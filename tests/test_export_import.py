@@ -0,0 +1,79 @@
+import json
+
+from sqlalchemy import func, select
+
+from app.export import iter_ndjson
+from app.extensions import db
+from app.likes import set_like
+from app.models import Comment, Like, Post, User
+
+from .factories import make_comment, make_post, make_user
+
+
+def _snapshot() -> dict:
+    users = dict(db.session.execute(select(User.id, User.username)).all())
+    posts = {
+        post.title: (users[post.author_id], post.body, post.like_count, post.comment_count)
+        for post in db.session.scalars(select(Post))
+    }
+    comments = sorted(
+        (users[author_id], body)
+        for author_id, body in db.session.execute(select(Comment.author_id, Comment.body)).all()
+    )
+    return {"users": sorted(users.values()), "posts": posts, "comments": comments}
+
+
+def test_export_round_trips_through_import(make_app, tmp_path):
+    source = make_app()
+    with source.app_context():
+        author, reader = make_user("author"), make_user("reader")
+        first, second = make_post(author, title="First"), make_post(reader, title="Second")
+        make_comment(reader, first, "Nice one")
+        make_comment(author, second, "Thanks")
+        set_like(reader.id, first.id, True)
+        set_like(author.id, first.id, True)
+        db.session.commit()
+        expected = _snapshot()
+        dump = tmp_path / "export.ndjson"
+        dump.write_text("".join(iter_ndjson()), encoding="utf-8")
+    assert {json.loads(line)["type"] for line in dump.read_text().splitlines()} == {"user", "post", "comment", "like"}
+
+    target = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{(tmp_path / 'target.db').as_posix()}")
+    result = target.test_cli_runner().invoke(args=["import", str(dump)])
+    assert result.exit_code == 0, result.output
+    with target.app_context():
+        assert _snapshot() == expected
+        assert db.session.scalar(select(func.count(Like.id))) == 2
+
+
+def _import(app, path, *options) -> dict:
+    result = app.test_cli_runner().invoke(args=["import", str(path), *options])
+    assert result.exit_code == 0, result.output
+    return json.loads(result.output[result.output.index("{") :])
+
+
+def test_import_maps_users_by_source_id_not_username(app, tmp_path):
+    local = make_user("alice")
+    records = [
+        {"type": "user", "id": 7, "username": "alice", "email": "other-alice@example.com"},
+        {"type": "user", "id": 8, "username": "bob", "email": "alice@example.com"},
+        {"type": "post", "id": 1, "author_id": 7, "title": "Imported", "body": "From the old blog"},
+        {"type": "post", "id": 2, "author_id": 8, "title": "Existing", "body": "By the matched account"},
+        {"type": "like", "user_id": 7, "post_id": 2},
+    ]
+    dump = tmp_path / "users.ndjson"
+    dump.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+    first, again = _import(app, dump), _import(app, dump, "--restart")
+    assert (first["written"]["user"], first["matched_users"], first["renamed_users"]) == (1, 1, 1)
+    # Every source row is in import_id_map now, so a second run adds nothing.
+    assert sum(again["written"].values()) == 0
+
+    db.session.expire_all()
+    assert sorted(db.session.scalars(select(User.username))) == ["alice", "alice1"]
+    authors = dict(db.session.execute(select(Post.title, Post.author_id)).all())
+    renamed = db.session.scalar(select(User.id).where(User.username == "alice1"))
+    # The imported alice keeps her own posts; bob's email makes him the local alice.
+    assert authors == {"Imported": renamed, "Existing": local.id}
+    existing = db.session.scalar(select(Post.id).where(Post.title == "Existing"))
+    assert db.session.execute(select(Like.user_id, Like.post_id)).all() == [(renamed, existing)]
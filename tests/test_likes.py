@@ -0,0 +1,93 @@
+from sqlalchemy import func, select
+
+from app.deletion import delete_posts, delete_users
+from app.extensions import db
+from app.likes import apply_like, set_like
+from app.models import Like, Post
+
+from .factories import log_in, make_post, make_user
+
+
+def _likes() -> int:
+    return db.session.scalar(select(func.count(Like.id)))
+
+
+def test_set_like_is_idempotent(app):
+    author, reader = make_user("author"), make_user("reader")
+    post = make_post(author)
+
+    assert set_like(reader.id, post.id, True) == (True, 1)
+    assert set_like(reader.id, post.id, True) == (True, 1)
+    db.session.commit()
+    assert _likes() == 1
+
+    assert set_like(reader.id, post.id, False) == (False, 0)
+    assert set_like(reader.id, post.id, False) == (False, 0)
+    db.session.commit()
+    assert _likes() == 0
+    assert db.session.get(Post, post.id).like_count == 0
+
+
+def test_toggle_flips_and_counts(app):
+    author, reader = make_user("author"), make_user("reader")
+    post = make_post(author)
+
+    assert apply_like(reader.id, post.id) == (True, 1)
+    assert apply_like(reader.id, post.id) == (False, 0)
+    assert apply_like(reader.id, post.id) == (True, 1)
+    assert _likes() == 1
+
+
+def test_json_endpoint_retries_are_idempotent(make_app):
+    app = make_app()
+    with app.app_context():
+        author, reader = make_user("author"), make_user("reader")
+        post_id, reader_id = make_post(author).id, reader.id
+    client = app.test_client()
+    url = f"/post/{post_id}/like/toggle"
+
+    assert client.post(url, json={"liked": True}).status_code == 401
+    log_in(client, reader_id)
+    for _ in range(2):
+        assert client.post(url, json={"liked": True}).get_json() == {"liked": True, "like_count": 1}
+    assert client.post(url).get_json() == {"liked": False, "like_count": 0}
+    assert client.post(url, json={"liked": False}).get_json() == {"liked": False, "like_count": 0}
+    assert client.post("/post/999/like/toggle").status_code == 404
+
+
+def test_buffered_likes_are_written_on_flush(make_app):
+    app = make_app(LIKE_BUFFER=True)
+    with app.app_context():
+        author, reader = make_user("author"), make_user("reader")
+        post = make_post(author)
+        buffer = app.extensions["like_buffer"]
+
+        assert apply_like(reader.id, post.id) == (True, 1)
+        assert _likes() == 0
+        buffer.flush()
+        db.session.expire_all()
+        assert _likes() == 1
+        assert db.session.get(Post, post.id).like_count == 1
+
+
+def test_flush_drops_likes_for_deleted_posts_and_users(make_app):
+    app = make_app(LIKE_BUFFER=True)
+    with app.app_context():
+        author = make_user("author")
+        reader, leaver = make_user("reader").id, make_user("leaver").id
+        kept, doomed = make_post(author).id, make_post(author).id
+        buffer = app.extensions["like_buffer"]
+
+        buffer.enqueue(reader, doomed, True)
+        buffer.enqueue(leaver, kept, True)
+        buffer.enqueue(reader, kept, True)
+        delete_posts([doomed])
+        delete_users([leaver])
+        buffer.flush()
+
+        db.session.expire_all()
+        assert db.session.execute(select(Like.user_id, Like.post_id)).all() == [(reader, kept)]
+        assert db.session.get(Post, kept).like_count == 1
+        # Nothing is re-queued, so the next flush has no work left.
+        assert buffer.pending_state(reader, doomed) is None
+        assert buffer.pending_state(leaver, kept) is None
@@ -0,0 +1,33 @@
+from sqlalchemy import inspect, text
+
+from app.extensions import db
+from app.migrations import LATEST_VERSION, schema_is_current, upgrade_schema
+
+from .factories import make_comment, make_post, make_user
+
+
+def test_upgrade_brings_an_old_schema_current(app):
+    author = make_user("author")
+    post = make_post(author)
+    make_comment(author, post)
+    # Roll the database back to how it looked before the counters and the lookup indexes.
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_post_created_at"))
+        conn.execute(text("DROP INDEX ix_comment_post_created"))
+        conn.execute(text("ALTER TABLE post DROP COLUMN comment_count"))
+        conn.execute(text("ALTER TABLE post DROP COLUMN like_count"))
+        conn.execute(text("DELETE FROM schema_version"))
+    assert not schema_is_current(db.engine)
+
+    applied = upgrade_schema(db.engine)
+    assert len(applied) == LATEST_VERSION
+    assert schema_is_current(db.engine)
+    with db.engine.connect() as conn:
+        assert conn.execute(text("SELECT comment_count FROM post")).scalar() == 1
+        indexes = {index["name"] for index in inspect(conn).get_indexes("post")}
+    assert "ix_post_created_at" in indexes
+
+
+def test_upgrade_is_a_no_op_once_current(app):
+    assert schema_is_current(db.engine)
+    assert upgrade_schema(db.engine) == []
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Post
+from app.pagination import paginate_desc
+
+from .factories import make_post, make_user
+
+
+def _walk(per_page: int) -> list[list[int]]:
+    pages, cursor = [], None
+    while True:
+        page = paginate_desc(Post.query, Post.created_at, Post.id, cursor, per_page)
+        pages.append([post.id for post in page])
+        if not page.has_next:
+            return pages
+        cursor = page.next_cursor
+
+
+def test_cursors_walk_every_row_once_across_equal_timestamps(app):
+    author = make_user("author")
+    ids = [make_post(author, title=f"Post {number}").id for number in range(7)]
+    # Ties on created_at are broken by id, so no row is skipped or repeated at a page edge.
+    db.session.execute(update(Post).where(Post.id.in_(ids[2:5])).values(created_at=datetime(2024, 1, 1)))
+    db.session.commit()
+
+    pages = _walk(per_page=2)
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    walked = [post_id for page in pages for post_id in page]
+    assert sorted(walked) == sorted(ids)
+    assert walked[-3:] == sorted(ids[2:5], reverse=True)
+
+
+def test_bad_cursor_restarts_from_the_first_page(make_app):
+    app = make_app(FEED_PAGE_SIZE=2)
+    with app.app_context():
+        author = make_user("author")
+        for number in range(3):
+            make_post(author, title=f"Post number {number}")
+    client = app.test_client()
+
+    first = client.get("/").get_data(as_text=True)
+    assert "Post number 2" in first and "Post number 0" not in first
+    assert client.get("/?cursor=not-a-cursor").get_data(as_text=True) == first
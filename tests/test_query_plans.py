@@ -0,0 +1,17 @@
+"""The hot queries behind ``flask check-indexes`` must stay on indexes.
+
+Runs against the schema a deploy builds (create_all plus the migrations) and
+checks every query plan, so a model or query change that falls back to a
+full scan or a temp B-tree sort fails here.
+"""
+
+from app.commands import _hot_queries, _plan_problems
+from app.extensions import db
+
+
+def test_hot_queries_use_indexes(app):
+    with db.engine.connect() as conn:
+        for name, statement in _hot_queries().items():
+            sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+            assert _plan_problems(plan) == [], f"{name}: {'; '.join(plan)}"
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+from sqlalchemy import select
+
+from app.extensions import db
+from app.likes import set_like
+from app.models import PostRank, RankingState
+from app.rankings import STATE_ID, WEEK, _week_scores, decay_rankings, refresh_rankings
+
+from .factories import make_post, make_user
+
+
+def _ranks() -> dict:
+    return {row.post_id: (row.trending, row.week) for row in db.session.scalars(select(PostRank))}
+
+
+def test_decay_rescales_scores_and_expires_the_week(app):
+    author = make_user("author")
+    popular, quiet = make_post(author, title="Popular"), make_post(author, title="Quiet")
+    readers = [make_user(f"reader{number}") for number in range(3)]
+    for reader in readers:
+        set_like(reader.id, popular.id, True)
+    set_like(readers[0].id, quiet.id, True)
+    db.session.commit()
+    assert refresh_rankings(force=True) == 2
+    before = _ranks()
+    assert before[popular.id][1] == 3.0 and before[quiet.id][1] == 1.0
+
+    half_life = app.config["TRENDING_HALF_LIFE_HOURS"] * 3600
+    later = time.time() + WEEK
+    with db.engine.begin() as conn:
+        week = _week_scores(conn, later - WEEK, later)
+        assert decay_rankings(conn, half_life, later, week) == 2
+    db.session.expire_all()
+    after = _ranks()
+    factor = after[popular.id][0] / before[popular.id][0]
+    assert factor == pytest.approx(2 ** (-WEEK / half_life), rel=1e-3)
+    assert after[quiet.id][0] / before[quiet.id][0] == pytest.approx(factor)
+    assert after[popular.id][1] == after[quiet.id][1] == 0.0
+    assert db.session.get(RankingState, STATE_ID).epoch == later
+
+    # Once the activity decays past the rebuild horizon the posts leave the table.
+    with db.engine.begin() as conn:
+        assert decay_rankings(conn, half_life, later + 20 * half_life, {}) == 0
+
+
+def test_decay_pass_waits_for_its_interval(app):
+    db.session.execute(db.update(RankingState).values(refreshed_at=time.time()))
+    db.session.commit()
+    assert refresh_rankings() is None
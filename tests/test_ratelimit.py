@@ -0,0 +1,42 @@
+import pytest
+
+from app.ratelimit import MemoryBackend, SQLiteBackend, parse_rule
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_login_posts_are_throttled_per_client(make_app, tmp_path, backend):
+    app = make_app(
+        RATE_LIMIT_BACKEND=backend, RATE_LIMIT_PATH=str(tmp_path / "rate_limit.db"), RATE_LIMIT_LOGIN="2/minute"
+    )
+    client = app.test_client()
+    form = {"email": "nobody@example.com", "password": "wrong"}
+
+    assert client.post("/auth/login", data=form).status_code == 200
+    assert client.post("/auth/login", data=form).status_code == 200
+    throttled = client.post("/auth/login", data=form)
+    assert throttled.status_code == 429
+    assert int(throttled.headers["Retry-After"]) == 30
+    # Reading the form is not throttled, and other clients keep their own bucket.
+    assert client.get("/auth/login").status_code == 200
+    other = client.post("/auth/login", data=form, environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert other.status_code == 200
+
+
+@pytest.mark.parametrize("make_backend", [lambda path: MemoryBackend(100), SQLiteBackend])
+def test_bucket_refills_over_time(tmp_path, make_backend):
+    backend = make_backend(str(tmp_path / "rate_limit.db"))
+    rule = parse_rule("2/minute")
+
+    assert backend.hit("ip:1", rule, 0.0) == 0.0
+    assert backend.hit("ip:1", rule, 0.0) == 0.0
+    assert backend.hit("ip:1", rule, 0.0) == pytest.approx(30.0)
+    assert backend.hit("ip:1", rule, 30.0) == 0.0
+    assert backend.hit("ip:2", rule, 30.0) == 0.0
+
+
+def test_parse_rule_rejects_bad_values():
+    assert parse_rule("") is None
+    assert parse_rule("10/minute").rate == pytest.approx(10 / 60)
+    for text in ("ten/minute", "10/fortnight", "0/second"):
+        with pytest.raises(ValueError):
+            parse_rule(text)
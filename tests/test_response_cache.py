@@ -0,0 +1,51 @@
+from app.cache import FEED_TAG, CachedPage, SQLiteBackend, post_tag
+
+from .factories import log_in, make_post, make_user
+
+
+def test_writes_invalidate_cached_pages(make_app):
+    # Requests run outside a test app context, so each one gets its own session as in production.
+    app = make_app()
+    with app.app_context():
+        author = make_user("author")
+        author_id, post_id = author.id, make_post(author, title="First post").id
+    cache = app.extensions["response_cache"]
+    visitor, writer = app.test_client(), app.test_client()
+    log_in(writer, author_id)
+
+    assert "First post" in visitor.get("/").get_data(as_text=True)
+    assert cache.get("/?") is not None
+    writer.post("/post/new", data={"title": "Second post", "body": "More text for the feed"})
+    assert "Second post" in visitor.get("/").get_data(as_text=True)
+
+    assert "Great read" not in visitor.get(f"/post/{post_id}").get_data(as_text=True)
+    writer.post(f"/post/{post_id}/comment", data={"body": "Great read"})
+    assert "Great read" in visitor.get(f"/post/{post_id}").get_data(as_text=True)
+
+
+def test_logged_in_pages_are_not_cached(make_app):
+    app = make_app()
+    with app.app_context():
+        author = make_user("author")
+        make_post(author)
+        author_id = author.id
+    client = app.test_client()
+    log_in(client, author_id)
+
+    client.get("/")
+    assert app.extensions["response_cache"].get("/?") is None
+
+
+def test_sqlite_backend_shares_pages_across_instances(tmp_path):
+    path = str(tmp_path / "response_cache.db")
+    first, second = SQLiteBackend(path, ttl=60), SQLiteBackend(path, ttl=60)
+    page = CachedPage(body=b"<p>feed</p>", mimetype="text/html", etag="abc", modified=1.0, tag=FEED_TAG)
+
+    first.set("/?", page)
+    first.set("/post/1?", page._replace(tag=post_tag(1)))
+    assert second.get("/?") == page
+    second.delete_tags([FEED_TAG])
+    assert first.get("/?") is None
+    assert first.get("/post/1?") is not None
+    second.clear()
+    assert first.get("/post/1?") is None
@@ -0,0 +1,88 @@
+import pytest
+
+from app.extensions import db
+from app.models import Post
+from app.search import MemoryIndexBackend, index_post, rebuild_index, remove_documents, search
+
+from .factories import make_post, make_user
+
+
+def _titles(query: str) -> list[str]:
+    return [hit.title for hit in search(query, None, 10).items]
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Count full loads of the in-process index."""
+    calls = []
+    original = MemoryIndexBackend._load
+
+    def counting_load(self, *args, **kwargs):
+        calls.append(self)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(MemoryIndexBackend, "_load", counting_load)
+    return calls
+
+
+def test_memory_index_replays_other_workers_changes(make_app, loads):
+    first, second = make_app(SEARCH_BACKEND="memory"), make_app(SEARCH_BACKEND="memory")
+    with first.app_context():
+        author = make_user("author")
+        post = make_post(author, title="hello world")
+        index_post(post)
+        db.session.commit()
+        post_id = post.id
+        assert _titles("hello") == ["hello world"]
+    with second.app_context():
+        assert _titles("hello") == ["hello world"]
+
+    with first.app_context():
+        post = db.session.get(Post, post_id)
+        post.title = "goodbye world"
+        index_post(post)
+        db.session.commit()
+        other = make_post(post.author, title="hello again")
+        index_post(other)
+        db.session.commit()
+    with second.app_context():
+        assert _titles("goodbye") == ["goodbye world"]
+        assert _titles("hello") == ["hello again"]
+
+    with first.app_context():
+        remove_documents(post_ids=[post_id])
+        db.session.execute(db.delete(Post).where(Post.id == post_id))
+        db.session.commit()
+    with second.app_context():
+        assert _titles("world") == []
+    # One initial load per worker; everything after that came from the change log.
+    assert len(loads) == 2
+
+
+def test_memory_index_ignores_rolled_back_writes(make_app):
+    app = make_app(SEARCH_BACKEND="memory")
+    with app.app_context():
+        author = make_user("author")
+        assert _titles("draft") == []
+        post = make_post(author, title="draft")
+        post.title = "changed draft"
+        index_post(post)
+        db.session.rollback()
+        assert _titles("changed") == []
+
+
+def test_memory_index_reloads_when_the_log_is_too_short(make_app, loads):
+    app = make_app(SEARCH_BACKEND="memory", SEARCH_CHANGE_LOG_SIZE=10)
+    with app.app_context():
+        author = make_user("author")
+        assert _titles("post") == []
+        for number in range(120):
+            index_post(make_post(author, title=f"post {number}"))
+            db.session.commit()
+        assert len(search("post", None, 200).items) == 120
+        assert len(loads) == 2
+
+        rebuild_index()
+        db.session.commit()
+        assert len(search("post", None, 200).items) == 120
+        assert len(loads) == 3
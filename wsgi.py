@@ -0,0 +1,18 @@
+"""Entry point for gunicorn (``gunicorn wsgi:app``).
+
+Kept apart from ``run.py`` so the ``flask`` CLI never builds a ``LazyApp``:
+with FAST_BOOT its boot thread would run ``create_app`` next to the CLI's
+own app and race it on the schema DDL.
+"""
+
+from config import Config
+
+
+if Config.FAST_BOOT:
+    from boot import LazyApp
+
+    app = LazyApp()
+else:
+    from app import create_app
+
+    app = create_app()